@@ -0,0 +1 @@
+# Benchmarks for the inventory microservice
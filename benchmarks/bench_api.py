@@ -0,0 +1,260 @@
+"""
+Throughput and latency of the product endpoints, run in-process against a
+fake ms-product (see benchmarks/fakes.py) while a fake change stream keeps
+invalidating the cache. Reports requests per second, p50/p95/p99 latency and
+the peak memory allocated per request (tracemalloc, measured in a separate
+sequential pass so tracing does not skew the timings).
+
+Modes:
+
+    asgi     requests go through httpx.ASGITransport, no sockets involved
+    uvicorn  the app and the fake ms-product are served by uvicorn on local
+             ports and requests go over TCP
+
+The load generator, the app and the fakes share one event loop, so the
+numbers are meant to be compared between runs of the same machine, not
+read as the capacity of a deployment. Results are checked against
+benchmarks/baselines.json and the run exits with status 1 on a regression:
+
+    python -m benchmarks.bench_api --mode asgi --requests 3000 --concurrency 50
+    python -m benchmarks.bench_api --mode uvicorn --scenario products_cached
+    python -m benchmarks.bench_api --mode asgi --update-baselines
+"""
+import os
+
+# Request logging would dominate the measurements
+os.environ.setdefault("LOG_LEVEL", "warning")
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+from benchmarks.fakes import FakeChangeStream, FakeMsProduct, Server
+from src.main import app
+from src.services.products_event_services import ProductsEventServices
+from src.utils.broadcaster import ChangeBroadcaster
+from src.utils.cache import ProductCache
+from src.utils.container import Container, get_container
+from src.utils.event_bus import ChangeEventBus
+from src.utils.event_pipeline import ChangeEventPipeline
+from src.utils.http_client import UpstreamClient
+from src.utils.settings import config
+from src.utils.single_flight import SingleFlight
+
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+SCENARIOS = {
+    # Hot products served from the cache, with the change stream invalidating them
+    "products_cached": {
+        "path": "/api-inventory/products/",
+        "cache": True,
+        "ids": 50,
+        "body": lambda product_id: {"product": {"id": product_id}}
+    },
+    # Every lookup reaches ms-product
+    "products_uncached": {
+        "path": "/api-inventory/products/",
+        "cache": False,
+        "ids": 5000,
+        "body": lambda product_id: {"product": {"id": product_id}}
+    },
+    "update_product": {
+        "path": "/api-inventory/update-product/",
+        "cache": True,
+        "ids": 5000,
+        "body": lambda product_id: {"product": {"id": product_id, "name": f"Product {product_id}", "price": 1990.0}}
+    }
+}
+
+# metric: whether a higher value is better
+METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "alloc_kib": False}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_container(upstream_url, transport, cache_enabled):
+    """
+    Container wired to the fake ms-product, with its own cache and pipeline
+    so the benchmark never touches the process wide singletons or MongoDB.
+    """
+    pipeline = ChangeEventPipeline(config["event_pipeline"])
+    cache = ProductCache(enabled=cache_enabled)
+    upstream_settings = {**config["ms_product"], "base_url": upstream_url, "hedge_enabled": False}
+    return Container(
+        upstream_client=UpstreamClient(settings=upstream_settings, transport=transport),
+        cache=cache,
+        single_flight=SingleFlight(),
+        products_event_service=ProductsEventServices(cache=cache, pipeline=pipeline),
+        broadcaster=ChangeBroadcaster(pipeline=pipeline),
+        event_bus=ChangeEventBus(settings={**config["deployment"], "leader_election": False}, pipeline=pipeline)
+    )
+
+
+async def measure(client, scenario, requests, concurrency):
+    path = scenario["path"]
+    bodies = [scenario["body"](str(index)) for index in range(scenario["ids"])]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def call(index):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(path, json=bodies[index % len(bodies)])
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors
+    }
+
+
+async def measure_allocations(client, scenario, requests):
+    """
+    Mean peak of the memory allocated while serving one request, in KiB.
+    """
+    bodies = [scenario["body"](str(index)) for index in range(scenario["ids"])]
+    peaks = []
+    tracemalloc.start()
+    try:
+        for index in range(requests):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await client.post(scenario["path"], json=bodies[index % len(bodies)])
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024
+
+
+async def run_scenario(name, args):
+    scenario = SCENARIOS[name]
+    fake = FakeMsProduct(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, seed=1)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.mode == "uvicorn":
+        upstream = Server(fake.app, free_port())
+        await upstream.__aenter__()
+        container = build_container(upstream.url, None, scenario["cache"])
+    else:
+        upstream = None
+        container = build_container("http://ms-product", httpx.ASGITransport(app=fake.app), scenario["cache"])
+    app.dependency_overrides[get_container] = lambda: container
+    feed = FakeChangeStream(container.products_event_service, [str(index) for index in range(scenario["ids"])],
+                            args.change_rate)
+    feed_task = asyncio.create_task(feed.run())
+    server = None
+    try:
+        if args.mode == "uvicorn":
+            server = Server(app, free_port())
+            await server.__aenter__()
+            client = httpx.AsyncClient(base_url=server.url, limits=limits, timeout=30.0)
+        else:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://inventory",
+                                       limits=limits, timeout=30.0)
+        async with client:
+            # Warm up the pools (and the cache) before measuring
+            await measure(client, scenario, min(args.requests, scenario["ids"] + args.concurrency), args.concurrency)
+            result = await measure(client, scenario, args.requests, args.concurrency)
+            result["alloc_kib"] = await measure_allocations(client, scenario, args.alloc_requests)
+    finally:
+        feed.stopping = True
+        await feed_task
+        await feed.stop()
+        if server is not None:
+            await server.__aexit__(None, None, None)
+        await container.upstream_client.close()
+        if upstream is not None:
+            await upstream.__aexit__(None, None, None)
+        app.dependency_overrides.clear()
+    result["change_events"] = feed.events_total
+    return result
+
+
+def compare(key, result, baseline, tolerance):
+    """
+    :return: One message per metric worse than the baseline by more than tolerance.
+    """
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        expected = baseline.get(metric)
+        if expected is None:
+            continue
+        limit = expected * (1 - tolerance) if higher_is_better else expected * (1 + tolerance)
+        if (result[metric] < limit) if higher_is_better else (result[metric] > limit):
+            regressions.append(f"{key} {metric}: {result[metric]:.2f} vs baseline {expected:.2f}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="Scenario to run, may be repeated (default: all)")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--alloc-requests", type=int, default=200, help="Requests traced with tracemalloc")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Latency of the fake ms-product")
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake ms-product calls failing")
+    parser.add_argument("--change-rate", type=float, default=200.0, help="Change stream events per second")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative regression")
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as file:
+            baselines = json.load(file)
+
+    regressions = []
+    for name in args.scenario or sorted(SCENARIOS):
+        key = f"{args.mode}:{name}"
+        result = await run_scenario(name, args)
+        print(
+            f"{key:>26}: {result['rps']:8.1f} req/s  p50 {result['p50_ms']:6.2f} ms  "
+            f"p95 {result['p95_ms']:6.2f} ms  p99 {result['p99_ms']:6.2f} ms  "
+            f"alloc {result['alloc_kib']:7.1f} KiB/req  errors {result['errors']}  "
+            f"changes {result['change_events']}"
+        )
+        if args.update_baselines:
+            baselines[key] = {metric: round(result[metric], 2) for metric in METRICS}
+        elif key in baselines:
+            regressions += compare(key, result, baselines[key], args.tolerance)
+
+    if args.update_baselines:
+        with open(BASELINES, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"baselines written to {BASELINES}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
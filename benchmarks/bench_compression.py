@@ -0,0 +1,51 @@
+"""
+CPU cost against bytes saved of every installed response codec and level,
+for a product response body of the given size. Use it to choose the
+COMPRESSION_* levels and COMPRESSION_MIN_SIZE:
+
+    gzip   always available
+    br     needs brotli (extra "compression")
+    zstd   needs zstandard (extra "compression")
+
+    python -m benchmarks.bench_compression --products 1 50 500 --requests 2000
+"""
+import argparse
+import time
+
+from benchmarks.bench_serialization import build_body
+from src.utils.compression import CODECS
+from src.utils.responses import result_envelope
+
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11), "zstd": (1, 3, 9, 19)}
+
+
+def measure(codec, body, level, requests):
+    started = time.process_time()
+    for _ in range(requests):
+        compressed = codec(body, level)
+    return (time.process_time() - started) / requests, len(compressed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[1, 50, 500], help="Products in each body")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    for products in args.products:
+        body = result_envelope(build_body(products))
+        print(f"body of {products} products: {len(body)} bytes")
+        for encoding, codec in CODECS.items():
+            for level in LEVELS[encoding]:
+                requests = max(1, args.requests // (20 if level >= 11 else 1))
+                cpu, size = measure(codec, body, level, requests)
+                saved = len(body) - size
+                print(
+                    f"{encoding:>6} level {level:>2}: {cpu * 1e6:9.1f} us CPU  {size:8d} bytes  "
+                    f"ratio {len(body) / size:5.2f}  {saved / max(cpu * 1e6, 1e-9):8.1f} bytes saved/us"
+                )
+
+
+if __name__ == "__main__":
+    main()
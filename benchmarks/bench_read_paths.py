@@ -0,0 +1,85 @@
+"""
+Compare the HTTP (ms-product) and direct MongoDB read paths of GetProducts.
+
+Both paths run against the services configured in the environment
+(MS_PRODUCT_URL, URI_DB_MONGO_LOCAL, DB_NAME, COLLECTION_OWNER). The cache
+and single-flight are bypassed so every lookup reaches its backend.
+
+    python -m benchmarks.bench_read_paths --ids 68708c59422d94d1e5b72eaf --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+from src.repository.products_repository import ProductsRepository
+from src.utils.cache import ProductCache
+from src.utils.http_client import upstream_client
+from src.utils.single_flight import SingleFlight
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_path(mode, ids, requests, concurrency):
+    cache = ProductCache(enabled=False)
+    repository = ProductsRepository()
+    settings = {"mode": mode, "projection": []}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def lookup(index):
+        nonlocal errors
+        product = Product(product={"id": ids[index % len(ids)]})
+        controller = GetProducts(product, cache=cache, single_flight=SingleFlight(), repository=repository, settings=settings)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await controller.get_products()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(lookup(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "errors": errors
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", required=True, help="Comma separated product ids to look up")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    ids = args.ids.split(",")
+
+    try:
+        for mode in ("http", "mongo"):
+            # Warm up connection pools before measuring
+            await run_path(mode, ids, min(args.concurrency, args.requests), args.concurrency)
+            result = await run_path(mode, ids, args.requests, args.concurrency)
+            print(
+                f"{result['mode']:>5}: {result['rps']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  "
+                f"p99 {result['p99_ms']:6.2f} ms  errors {result['errors']}"
+            )
+    finally:
+        await upstream_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
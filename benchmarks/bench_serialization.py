@@ -0,0 +1,69 @@
+"""
+Measure the CPU cost per request of building the {"result": ...} response
+from an ms-product body, for the three ways the service can do it:
+
+    stdlib       json.loads the upstream body, json.dumps the envelope
+    fast         parse and dump with orjson/msgspec (FastJSONResponse)
+    passthrough  splice the upstream bytes into the envelope untouched
+
+    python -m benchmarks.bench_serialization --products 50 --requests 20000
+"""
+import argparse
+import json
+import time
+
+from src.utils.responses import dumps, loads, result_envelope
+
+
+def build_body(products):
+    items = [
+        {
+            "_id": f"68708c59422d94d1e5b72e{index:02x}",
+            "name": f"Product {index}",
+            "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit",
+            "price": 1999.5 + index,
+            "stock": index * 3,
+            "tags": ["inventory", "catalog", "sale"]
+        }
+        for index in range(products)
+    ]
+    return json.dumps({"data": {"products": items}}).encode("utf-8")
+
+
+def stdlib(raw):
+    return json.dumps({"result": json.loads(raw)}).encode("utf-8")
+
+
+def fast(raw):
+    return dumps({"result": loads(raw)})
+
+
+def passthrough(raw):
+    return result_envelope(raw)
+
+
+def measure(function, raw, requests):
+    started = time.process_time()
+    for _ in range(requests):
+        function(raw)
+    return (time.process_time() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50, help="Products in the upstream body")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    raw = build_body(args.products)
+
+    print(f"body size: {len(raw)} bytes")
+    baseline = None
+    for name, function in (("stdlib", stdlib), ("fast", fast), ("passthrough", passthrough)):
+        function(raw)
+        cpu = measure(function, raw, args.requests)
+        baseline = baseline or cpu
+        print(f"{name:>12}: {cpu * 1e6:9.2f} us CPU/request  ({baseline / cpu:6.1f}x vs stdlib)")
+
+
+if __name__ == "__main__":
+    main()
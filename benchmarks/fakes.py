@@ -0,0 +1,147 @@
+"""
+Local stand-ins for the dependencies of the service, used by the benchmarks:
+
+    FakeMsProduct     ms-product with injectable latency and error rate,
+                      served in-process (ASGI) or on a port with uvicorn
+    FakeChangeStream  replaces the MongoDB change stream and feeds update
+                      events for the benchmarked products into the pipeline
+
+Run the fake ms-product alone to point a real deployment at it:
+
+    python -m benchmarks.fakes --port 8000 --latency-ms 5 --jitter-ms 2 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from src.utils.responses import dumps, loads
+
+
+class FakeMsProduct:
+    """
+    ms-product answering the two endpoints the service calls. Every call
+    waits latency (plus up to jitter) seconds and fails with a 503 for the
+    given fraction of requests.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests_total = 0
+        self.errors_total = 0
+        self.app = Starlette(routes=[
+            Route("/api-products/product/", self.product, methods=["POST"]),
+            Route("/api-products/delete-product/", self.update_product, methods=["POST"]),
+            Route("/health", self.health, methods=["GET"])
+        ])
+
+    async def _delay(self):
+        self.requests_total += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors_total += 1
+            return Response(dumps({"detail": "injected error"}), status_code=503, media_type="application/json")
+        return None
+
+    async def product(self, request: Request):
+        error = await self._delay()
+        if error is not None:
+            return error
+        product_id = loads(await request.body())["product"].get("id")
+        product = {"_id": product_id, "name": f"Product {product_id}", "price": 1990.0, "stock": 10}
+        return Response(dumps({"data": {"product": product}}), media_type="application/json")
+
+    async def update_product(self, request: Request):
+        error = await self._delay()
+        if error is not None:
+            return error
+        product = loads(await request.body())["product"]
+        return Response(dumps({"data": {"product": product}}), media_type="application/json")
+
+    async def health(self, request: Request):
+        return Response(b'{"status":"ok"}', media_type="application/json")
+
+
+class FakeChangeStream:
+    """
+    Stand-in for the MongoDB change stream: emits update events for the given
+    products at rate events per second through the same path as the watcher,
+    so cache invalidation and broadcasting run while the load is measured.
+    """
+
+    def __init__(self, event_service, ids, rate):
+        self.event_service = event_service
+        self.ids = ids
+        self.rate = rate
+        self.stopping = False
+        self.events_total = 0
+
+    async def run(self):
+        await self.event_service.pipeline.start()
+        interval = 1.0 / self.rate
+        while not self.stopping:
+            product_id = self.ids[self.events_total % len(self.ids)]
+            await self.event_service.handle_change({
+                "operationType": "update",
+                "documentKey": {"_id": product_id},
+                "updateDescription": {"updatedFields": {"stock": self.events_total}, "removedFields": []}
+            })
+            self.events_total += 1
+            await asyncio.sleep(interval)
+
+    async def stop(self):
+        self.stopping = True
+        await self.event_service.pipeline.stop()
+
+
+class Server:
+    """
+    uvicorn server for an ASGI app, run as a task of the current event loop.
+    """
+
+    def __init__(self, app, port):
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, lifespan="off", log_level="warning", access_log=False))
+        self.task = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self.task.done():
+                self.task.result()
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.should_exit = True
+        await self.task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeMsProduct(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate)
+    uvicorn.run(fake.app, host="0.0.0.0", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Load test of the stock ledger: fire many concurrent reservations of the same
+sku at a running service and check that no unit was oversold.
+
+The sku is given --stock units, then --requests reservations of --quantity
+units are sent with --concurrency in flight. The run fails unless exactly
+stock // quantity reservations succeed, every other one is rejected with 409
+and the final stock adds up.
+
+    python -m benchmarks.load_reservations --url http://127.0.0.1:8001 --stock 1000 --requests 5000 --concurrency 500
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(url, sku, stock, requests, quantity, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        response = await client.put(f"/api-inventory/stock/{sku}", json={"available": stock})
+        response.raise_for_status()
+
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = {}
+        latencies = []
+
+        async def reserve():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api-inventory/reservations/", json={"sku": sku, "quantity": quantity})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(reserve() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+        final = (await client.get(f"/api-inventory/stock/{sku}")).json()["result"]
+
+    expected = min(requests, stock // quantity)
+    print(f"sku {sku}: {requests} reservations in {elapsed:.2f}s ({requests / elapsed:.1f} req/s)")
+    print(f"  p50 {percentile(latencies, 0.50) * 1000:.2f} ms  p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"  statuses {statuses}")
+    print(f"  final stock {final}")
+    ok = (
+        statuses.get(201, 0) == expected
+        and statuses.get(409, 0) == requests - expected
+        and final["reserved"] == expected * quantity
+        and final["available"] == stock - expected * quantity
+    )
+    print("  OK: no overselling" if ok else f"  FAILED: expected {expected} successful reservations")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--sku", default=None, help="Sku to use, a fresh one by default")
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+    sku = args.sku or f"load-test-{uuid.uuid4().hex[:8]}"
+    ok = asyncio.run(run(args.url, sku, args.stock, args.requests, args.quantity, args.concurrency))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+
+import asyncio
+
+from fastapi import HTTPException
+
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+from src.utils.logger_utils import Log
+from src.utils.error_handling import ErrorHandler
+from src.utils.settings import config
+
+
+log = Log()
+
+
+class GetProductsBulk:
+    """
+    This class is used to get many products by id in a single call.
+    Ids are deduplicated, cache hits are served directly and the misses are
+    fetched through GetProducts with bounded concurrency.
+    """
+    def __init__(self, ids=None, client=None, cache=None, settings=None, products=None):
+        self.ids = ids
+        self.products = products or GetProducts(client=client, cache=cache)
+        self.settings = settings or config["bulk"]
+
+    async def get_products(self, ids=None):
+        ids = ids if ids is not None else self.ids
+        if len(ids) > self.settings["max_items"]:
+            ErrorHandler.handle_validation_error(
+                ValueError(f"At most {self.settings['max_items']} ids are allowed per request"),
+                "Error fetching products in bulk"
+            )
+        unique_ids = list(dict.fromkeys(ids))
+        results = {}
+        missing = []
+        for product_id in unique_ids:
+            cached = self.products.get_cached(Product(product={"id": product_id}))
+            if cached is not None:
+                results[product_id] = cached.data
+            else:
+                missing.append(product_id)
+
+        semaphore = asyncio.Semaphore(self.settings["concurrency"])
+
+        async def fetch(product_id):
+            async with semaphore:
+                body = await self.products.fetch_products(Product(product={"id": product_id}))
+                return body.data
+
+        fetched = await asyncio.gather(*(fetch(product_id) for product_id in missing), return_exceptions=True)
+        results.update(zip(missing, fetched))
+        log.logger.info(
+            "Bulk products fetched",
+            requested=len(ids),
+            unique=len(unique_ids),
+            from_cache=len(unique_ids) - len(missing)
+        )
+        return [self._item(product_id, results[product_id]) for product_id in ids]
+
+    @staticmethod
+    def _item(product_id, result):
+        if isinstance(result, HTTPException):
+            return {"id": product_id, "status": "error", "error": result.detail}
+        if isinstance(result, Exception):
+            return {"id": product_id, "status": "error", "error": str(result)}
+        return {"id": product_id, "status": "success", "data": result}
@@ -0,0 +1,77 @@
+import asyncio
+import zlib
+
+from src.utils.logger_utils import Log
+from src.utils.responses import dumps
+from src.utils.serialization import to_json_compatible
+from src.utils.settings import config
+from src.repository.products_repository import ProductsRepository
+
+
+log = Log()
+
+
+class ExportProducts:
+    """
+    This class is used to export the whole products catalogue as NDJSON.
+    Documents are read with a batched cursor and written out one cursor batch
+    at a time, so memory use does not depend on the size of the collection.
+    An export that fails midway ends with an error line (no _id) carrying the
+    last _id sent, since the status code is already sent by then.
+    """
+    def __init__(self, repository=None, settings=None):
+        self.repository = repository or ProductsRepository()
+        self.settings = settings or config["export"]
+
+    async def export(self, after=None, fields=None, gzip=False):
+        """
+        Stream the products as NDJSON lines, one product per line.
+        :param after: _id of the last product already received, to resume an export.
+        :param fields: Fields to export instead of the configured projection.
+        :param gzip: Compress the stream with gzip.
+        :return: Async iterator of body chunks.
+        """
+        projection = fields or self.settings["projection"]
+        chunks = self._ndjson(after, projection)
+        if gzip:
+            chunks = self._gzip(chunks)
+        return chunks
+
+    async def _ndjson(self, after, projection):
+        batch_size = self.settings["batch_size"]
+        cursor = self.repository.iter_products(after, projection, batch_size)
+        lines = []
+        exported = 0
+        last_id = after
+        try:
+            async for document in cursor:
+                document = to_json_compatible(document)
+                lines.append(dumps(document))
+                last_id = document.get("_id", last_id)
+                if len(lines) >= batch_size:
+                    exported += len(lines)
+                    yield b"\n".join(lines) + b"\n"
+                    lines = []
+            if lines:
+                exported += len(lines)
+                yield b"\n".join(lines) + b"\n"
+            log.logger.info("Products exported", exported=exported, after=after)
+        except Exception as error:
+            # Headers are already sent: tell the client the export is incomplete
+            # and where to resume it from
+            log.logger.error("Error exporting products", error=error, exported=exported + len(lines), after=after)
+            lines.append(dumps({"error": "Export interrupted", "after": last_id}))
+            yield b"\n".join(lines) + b"\n"
+
+    async def _gzip(self, chunks):
+        compressor = zlib.compressobj(self.settings["gzip_level"], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        try:
+            async for chunk in chunks:
+                # Compressing a whole cursor batch takes long enough to keep it off the event loop
+                compressed = await asyncio.to_thread(compressor.compress, chunk)
+                if compressed:
+                    yield compressed
+        except Exception as error:
+            log.logger.error("Error compressing products export", error=error)
+        # Always end the gzip member, so what was sent can be decompressed
+        yield compressor.flush()
@@ -6,37 +6,149 @@ from fastapi.responses import JSONResponse
 import urllib.request
 import json
 import traceback
-import httpx
 
 from src.utils.logger_utils import Log
 from src.utils.error_handling import ErrorHandler
+from src.utils.http_client import upstream_client
+from src.utils.resilience import CircuitOpenError
+from src.utils.cache import ProductCache, product_cache
+from src.utils.single_flight import SingleFlight, upstream_single_flight
+from src.utils.serialization import to_json_compatible
+from src.utils.responses import ProductBody, loads
+from src.utils.settings import config
+from src.repository.products_repository import ProductsRepository
+
+
+log = Log()
 
 
 class GetProducts:
     """
-    This class is used to get all products
+    This class is used to get all products.
+    Products are read from ms-product over HTTP, or straight from the products
+    collection when PRODUCTS_READ_MODE is "mongo". Cache misses are answered
+    from the catalogue snapshot when one is loaded.
+    The instance holds no per-request state: the application container builds
+    one and every request passes its payload to the methods. The payload given
+    to the constructor is only the default for those calls.
     """
-    def __init__(self, product_id):
-        self.log = Log()
+    def __init__(self, product_id=None, client=None, cache=None, single_flight=None, repository=None, settings=None,
+                 snapshot=None):
         self.product_id = product_id
+        self.client = client or upstream_client
+        self.cache = cache if cache is not None else product_cache
+        self.single_flight = single_flight or upstream_single_flight
+        self.repository = repository
+        self.snapshot = snapshot
+        self.settings = settings or config["read_path"]
+        self.passthrough = config["responses"]["passthrough"]
+
+    @property
+    def cache_key(self):
+        return self.key_for(self.product_id)
+
+    @staticmethod
+    def key_for(product_id):
+        return ProductCache.key_for(product_id.product)
 
-    async def get_products(self):
+    @staticmethod
+    def primary_key(data):
+        """
+        _id of the product in a response envelope, the key change events carry.
+        :return: The _id as a string, or None when the body has none.
+        """
+        product = (data.get("data") or {}).get("product") if isinstance(data, dict) else None
+        if not isinstance(product, dict) or product.get("_id") is None:
+            return None
+        return str(product["_id"])
+
+    def get_cached(self, product_id=None):
+        """
+        Look the product up in the cache, then in the catalogue snapshot.
+        :return: The ProductBody or None on a miss.
+        """
+        cache_key = self.key_for(product_id or self.product_id)
+        body = self.cache.get(cache_key)
+        if body is None and self.snapshot is not None and cache_key is not None:
+            record = self.snapshot.lookup(cache_key)
+            if record is not None:
+                body = ProductBody(record[1])
+                self.cache.set(cache_key, body, primary=record[0])
+        return body
+
+    async def get_products(self, product_id=None):
         try:
-            self.log.logger.info("Fetching all products")
-            url="http://ms-product:8000/api-products/product/"
-            params = self.product_id.model_dump()
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    json=params,
-                    headers={"Content-Type": "application/json"}
-                )
-            resp_data = response.json()
-            self.log.logger.info(f"Products fetched successfully: {resp_data}")
+            body = await self.get_products_body(product_id)
             # Return only the data, not a JSONResponse
-            return resp_data
+            return body.data
         except Exception as error:
             raise ErrorHandler.handle_error(error, "Error fetching products")
-        
 
-    
\ No newline at end of file
+    async def get_products_body(self, product_id=None):
+        """
+        Get the product response as a ProductBody, from the cache when possible.
+        """
+        try:
+            product_id = product_id or self.product_id
+            log.logger.info("Fetching all products")
+            cached = self.get_cached(product_id)
+            if cached is not None:
+                log.logger.info("Products served from cache", product_id=self.key_for(product_id))
+                return cached
+            return await self.fetch_products(product_id)
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error fetching products")
+
+    async def fetch_products(self, product_id=None):
+        """
+        Fetch the product from ms-product and store successful responses in the cache.
+        Concurrent identical lookups share a single upstream request.
+        :return: The response as a ProductBody.
+        """
+        try:
+            product_id = product_id or self.product_id
+            cache_key = self.key_for(product_id)
+            params = product_id.model_dump()
+            key = SingleFlight.key_for(params)
+            if self.settings["mode"] == "mongo" and cache_key is not None:
+                body = await self.single_flight.do("mongo:" + key, lambda: self._read_from_mongo(cache_key))
+                if body is None:
+                    ErrorHandler.handle_not_found_error("Product", cache_key)
+                return body
+            return await self.single_flight.do(key, lambda: self._request_upstream(params, cache_key))
+        except CircuitOpenError as error:
+            ErrorHandler.handle_service_unavailable(str(error))
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error fetching products")
+
+    async def _read_from_mongo(self, cache_key):
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        generation = self.cache.generation()
+        # From the primary, so the document is not older than the generation taken above
+        document = await self.repository.find_product(cache_key, self.settings["projection"], primary=True)
+        if document is None:
+            return None
+        # Same envelope ms-product answers with
+        body = ProductBody.from_data({"data": {"product": to_json_compatible(document)}})
+        self.cache.set(cache_key, body, generation, str(document["_id"]))
+        log.logger.info("Product read from MongoDB", product_id=cache_key)
+        return body
+
+    async def _request_upstream(self, params, cache_key):
+        url="/api-products/product/"
+        # A change applied while the request is in flight makes the answer stale
+        generation = self.cache.generation()
+        response = await self.client.post(url, params, idempotent=True)
+        body = ProductBody(response.content)
+        # Decode the body right away so an invalid upstream body fails here,
+        # instead of being cached and spliced into every response; passed
+        # through bodies do not keep the decoded data
+        if self.passthrough and "json" in response.headers.get("content-type", ""):
+            data = loads(body.raw)
+        else:
+            data = body.data
+        if response.is_success:
+            self.cache.set(cache_key, body, generation, self.primary_key(data))
+        log.logger.info("Products fetched successfully", size=len(body.raw))
+        return body
@@ -0,0 +1,45 @@
+from src.utils.logger_utils import Log
+from src.utils.error_handling import ErrorHandler
+from src.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from src.utils.serialization import to_json_compatible
+from src.utils.settings import config
+from src.repository.products_repository import LISTING_SORT_KEYS, ProductsRepository
+
+
+log = Log()
+
+
+class ListProducts:
+    """
+    This class is used to browse the products collection page by page.
+    Pages are keyset paginated: the opaque cursor holds the sort value and _id
+    of the last product returned and the next page starts right after it.
+    """
+    def __init__(self, repository=None, settings=None):
+        self.repository = repository or ProductsRepository()
+        self.settings = settings or config["listing"]
+
+    async def list_products(self, name_prefix=None, min_price=None, max_price=None, sort="_id", limit=None,
+                            cursor=None, fields=None):
+        """
+        :return: The products of the page and the cursor of the next one (None on the last page).
+        """
+        try:
+            if sort not in LISTING_SORT_KEYS:
+                raise ValueError(f"sort must be one of {', '.join(LISTING_SORT_KEYS)}")
+            limit = min(limit or self.settings["default_limit"], self.settings["max_limit"])
+            after = decode_cursor(cursor, sort) if cursor else None
+            query = self.repository.listing_query(name_prefix, min_price, max_price, sort, after)
+            # One extra product tells whether there is a next page
+            documents = await self.repository.list_products(
+                query, sort, limit + 1, fields or self.settings["projection"])
+            next_cursor = None
+            if len(documents) > limit:
+                documents = documents[:limit]
+                last = documents[-1]
+                next_cursor = encode_cursor(sort, last.get(sort), last["_id"])
+            return {"items": to_json_compatible(documents), "next_cursor": next_cursor}
+        except (InvalidCursorError, ValueError) as error:
+            ErrorHandler.handle_validation_error(error, "Invalid products listing")
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error listing products")
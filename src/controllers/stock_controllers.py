@@ -0,0 +1,156 @@
+from pydantic import ValidationError
+
+from src.entities.products_entities import StockAdjustment
+from src.utils.logger_utils import Log
+from src.utils.error_handling import ErrorHandler
+from src.utils.settings import config
+from src.repository.products_repository import (ProductsRepository, INSUFFICIENT_STOCK_ERROR_CODES,
+                                                RESERVATION_COMMITTED, RESERVATION_EXPIRED,
+                                                RESERVATION_PENDING, RESERVATION_RELEASED)
+from src.utils.streaming import StreamFormatError
+
+
+log = Log()
+
+
+class StockLedger:
+    """
+    This class is used to read and change the local stock of the products.
+    Reservations take units out of the available stock atomically and are then
+    committed (the units are sold), released or left to expire.
+    """
+    def __init__(self, repository=None, settings=None):
+        self.repository = repository or ProductsRepository()
+        self.settings = settings or config["inventory"]
+
+    @staticmethod
+    def _stock(document):
+        return {
+            "sku": document["_id"],
+            "available": document.get("available", 0),
+            "reserved": document.get("reserved", 0)
+        }
+
+    @staticmethod
+    def _reservation(document):
+        return {
+            "reservation_id": str(document["_id"]),
+            "sku": document["sku"],
+            "quantity": document["quantity"],
+            "status": document["status"],
+            "expires_at": document["expires_at"].isoformat()
+        }
+
+    async def get_stock(self, sku):
+        try:
+            document = await self.repository.get_stock(sku)
+            if document is None:
+                ErrorHandler.handle_not_found_error("Stock", sku)
+            return self._stock(document)
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error fetching stock")
+
+    async def set_stock(self, sku, stock_level):
+        try:
+            document = await self.repository.set_stock(sku, stock_level.available)
+            log.logger.info("Stock set", sku=sku, available=stock_level.available)
+            return self._stock(document)
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error setting stock")
+
+    async def bulk_adjust(self, rows):
+        """
+        Validate and apply streamed stock adjustments in chunks of
+        adjust_chunk_size rows. Only the current chunk is kept in memory, and
+        only the first adjust_max_errors row errors are reported.
+        :param rows: Async iterator of rows, as JSON bytes or decoded objects.
+        :return: Counts of received, applied and failed rows and the row errors.
+        """
+        report = {"received": 0, "applied": 0, "failed": 0, "errors": [], "aborted": None}
+        operations = []
+        indexes = []
+        try:
+            async for row in rows:
+                index = report["received"]
+                report["received"] += 1
+                try:
+                    if isinstance(row, (bytes, str)):
+                        adjustment = StockAdjustment.model_validate_json(row)
+                    else:
+                        adjustment = StockAdjustment.model_validate(row)
+                except ValidationError as error:
+                    self._row_error(report, index, "; ".join(detail["msg"] for detail in error.errors()))
+                    continue
+                operations.append(
+                    self.repository.stock_adjustment(adjustment.sku, adjustment.delta, adjustment.available))
+                indexes.append(index)
+                if len(operations) >= self.settings["adjust_chunk_size"]:
+                    await self._apply_chunk(report, operations, indexes)
+                    operations, indexes = [], []
+        except StreamFormatError as error:
+            # Rows read before the broken part are still applied
+            report["aborted"] = str(error)
+        try:
+            if operations:
+                await self._apply_chunk(report, operations, indexes)
+            log.logger.info(
+                "Stock adjusted in bulk",
+                received=report["received"],
+                applied=report["applied"],
+                failed=report["failed"]
+            )
+            return report
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error adjusting stock in bulk")
+
+    async def _apply_chunk(self, report, operations, indexes):
+        errors = await self.repository.bulk_adjust_stock(operations)
+        report["applied"] += len(operations) - len(errors)
+        for chunk_index, code, message in errors:
+            if code in INSUFFICIENT_STOCK_ERROR_CODES:
+                message = "Not enough stock available"
+            self._row_error(report, indexes[chunk_index], message)
+
+    def _row_error(self, report, index, message):
+        report["failed"] += 1
+        if len(report["errors"]) < self.settings["adjust_max_errors"]:
+            report["errors"].append({"row": index, "error": message})
+
+    async def reserve(self, reservation):
+        try:
+            ttl_seconds = min(
+                reservation.ttl_seconds or self.settings["reservation_ttl_seconds"],
+                self.settings["reservation_max_ttl_seconds"]
+            )
+            document = await self.repository.reserve_stock(reservation.sku, reservation.quantity, ttl_seconds)
+            if document is None:
+                if await self.repository.get_stock(reservation.sku) is None:
+                    ErrorHandler.handle_not_found_error("Stock", reservation.sku)
+                ErrorHandler.handle_conflict_error(f"Not enough stock of {reservation.sku} to reserve {reservation.quantity}")
+            log.logger.info("Stock reserved", sku=reservation.sku, quantity=reservation.quantity)
+            return self._reservation(document)
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error reserving stock")
+
+    async def commit(self, reservation_id):
+        return await self._finish(reservation_id, RESERVATION_COMMITTED)
+
+    async def release(self, reservation_id):
+        return await self._finish(reservation_id, RESERVATION_RELEASED)
+
+    async def _finish(self, reservation_id, status):
+        try:
+            document = await self.repository.finish_reservation(reservation_id, status)
+            if document is None:
+                current = await self.repository.find_reservation(reservation_id)
+                if current is None:
+                    ErrorHandler.handle_not_found_error("Reservation", reservation_id)
+                current_status = current["status"]
+                if current_status == RESERVATION_PENDING:
+                    # Still waiting for the reaper, but past its expiry
+                    current_status = RESERVATION_EXPIRED
+                ErrorHandler.handle_conflict_error(f"Reservation {reservation_id} is {current_status}")
+            log.logger.info("Reservation finished", reservation_id=reservation_id, status=status)
+            return self._reservation(document)
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, f"Error finishing reservation as {status}")
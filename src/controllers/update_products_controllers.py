@@ -2,36 +2,130 @@
 from fastapi import Header, APIRouter, HTTPException, File, UploadFile, Depends
 from fastapi.responses import JSONResponse
 
+import asyncio
 import urllib.request
 import json
 import traceback
-import httpx
 
 from src.utils.logger_utils import Log
 from src.utils.error_handling import ErrorHandler
+from src.utils.http_client import upstream_client
+from src.utils.resilience import CircuitOpenError
+from src.utils.cache import ProductCache
+from src.utils.settings import config
+from src.repository.products_repository import ProductsRepository
+
+
+log = Log()
 
 
 class UpdateProducts:
     """
-    This class is used to update a product by id
+    This class is used to update a product by id.
+    A single instance is shared by every request, see GetProducts.
+    With write-behind enabled updates are acknowledged once stored in the
+    pending writes collection, where successive updates of a product are
+    coalesced, and WriteBehindFlusher sends them to ms-product. A synchronous
+    update claims the queued write of the product and sends it along.
     """
-    def __init__(self, product):
-        self.log = Log()
+    URL = "/api-products/delete-product/"
+
+    def __init__(self, product=None, client=None, repository=None, settings=None):
         self.product = product
+        self.client = client or upstream_client
+        self.repository = repository
+        self.settings = settings or config["write_behind"]
+        self.queued_total = 0
+        self.coalesced_total = 0
+
+    @staticmethod
+    def _params(request):
+        # The service layer already hands over a plain dict
+        return request.model_dump() if hasattr(request, "model_dump") else request
+
+    @staticmethod
+    def _product_id(params):
+        return ProductCache.key_for(params.get("product") or {})
+
+    def write_behind(self, product=None, sync=None):
+        """
+        Whether an update is queued instead of sent right away.
+        :param sync: True to send it to ms-product before answering (read-your-write),
+            False to queue it. Ignored when write-behind is disabled: nothing
+            would flush the queue, so every update is sent right away.
+        """
+        if not self.settings["enabled"]:
+            return False
+        params = self._params(product if product is not None else self.product)
+        return not sync and self._product_id(params) is not None
 
-    async def update_product(self):
+    async def enqueue_update(self, product=None):
         try:
-            request = self.product
-            url="http://ms-product:8000/api-products/delete-product/"
-            params = request.model_dump()
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    json=params,
-                    headers={"Content-Type": "application/json"}
-                )
-            resp_data = response.json()
-            self.log.logger.info(f"Products fetched successfully: {resp_data}")
+            params = self._params(product if product is not None else self.product)
+            product_id = self._product_id(params)
+            if self.repository is None:
+                self.repository = ProductsRepository()
+            pending = await self.repository.enqueue_write(
+                product_id, params["product"], self.settings["window"], self.settings["coalesce"] == "merge")
+            self.queued_total += 1
+            if pending["updates"] > 1:
+                self.coalesced_total += 1
+            log.logger.info("Product update queued", product_id=product_id, version=pending["version"])
+            return {"status": "queued", "id": product_id, "version": pending["version"]}
+        except Exception as error:
+            raise ErrorHandler.handle_error(error, "Error queueing product update")
+
+    async def update_product(self, product=None):
+        try:
+            request = product if product is not None else self.product
+            params = self._params(request)
+            pending = None
+            product_id = self._product_id(params)
+            if self.settings["enabled"] and product_id is not None:
+                if self.repository is None:
+                    self.repository = ProductsRepository()
+                # Queued updates of the product go out with this one, so they
+                # can not overwrite it when they would be flushed later
+                pending = await self.claim_pending(product_id)
+                if pending is not None and self.settings["coalesce"] == "merge":
+                    params = {**params, "product": {**pending["fields"], **params["product"]}}
+            try:
+                response = await self.client.post(self.URL, params)
+                resp_data = response.json()
+            except BaseException:
+                if pending is not None:
+                    await asyncio.shield(self.repository.release_pending_write(product_id))
+                raise
+            if pending is not None:
+                if response.is_success:
+                    await self.repository.complete_pending_write(product_id, pending["version"])
+                else:
+                    await self.repository.release_pending_write(product_id)
+            log.logger.info("Product updated successfully", response=resp_data)
             return resp_data
+        except CircuitOpenError as error:
+            ErrorHandler.handle_service_unavailable(str(error))
         except Exception as error:
-            raise ErrorHandler.handle_error(error, "Error updating product")
\ No newline at end of file
+            raise ErrorHandler.handle_error(error, "Error updating product")
+
+    async def claim_pending(self, product_id):
+        """
+        Claim the queued write of a product for a synchronous update, waiting
+        while a flush of it is in flight so that flush can not reach
+        ms-product after this update.
+        :return: The claimed pending write, or None when nothing is queued.
+        """
+        while True:
+            pending = await self.repository.claim_pending_write(product_id, self.settings["claim_timeout"])
+            if pending is not None or await self.repository.find_pending_write(product_id) is None:
+                return pending
+            # Claims lapse after claim_timeout, so this ends even if the flusher died
+            await asyncio.sleep(self.settings["flush_interval"])
+
+    async def flush(self, pending):
+        """
+        Send a queued write to ms-product.
+        :param pending: The pending write document.
+        :return: The httpx response.
+        """
+        return await self.client.post(self.URL, {"product": pending["fields"]})
@@ -1,6 +1,6 @@
 
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Dict, Any, Optional
 
 
 class Product(BaseModel):
@@ -10,4 +10,30 @@ class Product(BaseModel):
 class UpdateProduct(BaseModel):
     id: str = Field(..., description="Unique identifier for the product", example="12345")
     name: str = Field(..., description="Name of the product", example="Sample Product")
-    price: float = Field(..., description="Price of the product in cents", example=1990.0)
\ No newline at end of file
+    price: float = Field(..., description="Price of the product in cents", example=1990.0)
+
+
+class BulkProducts(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="Identifiers of the products to fetch", example=["12345", "67890"])
+
+
+class StockLevel(BaseModel):
+    available: int = Field(..., ge=0, description="Units available to reserve", example=100)
+
+
+class Reservation(BaseModel):
+    sku: str = Field(..., min_length=1, description="Identifier of the stocked product", example="12345")
+    quantity: int = Field(..., gt=0, description="Units to reserve", example=2)
+    ttl_seconds: Optional[int] = Field(None, gt=0, description="Seconds until the reservation expires", example=900)
+
+
+class StockAdjustment(BaseModel):
+    sku: str = Field(..., min_length=1, description="Identifier of the stocked product", example="12345")
+    delta: Optional[int] = Field(None, description="Units to add, or to remove when negative", example=-3)
+    available: Optional[int] = Field(None, ge=0, description="Units available, replacing the current value", example=40)
+
+    @model_validator(mode="after")
+    def check_single_change(self):
+        if (self.delta is None) == (self.available is None):
+            raise ValueError("Exactly one of delta or available is required")
+        return self
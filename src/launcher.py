@@ -0,0 +1,46 @@
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+from src.utils.settings import config
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the inventory service with several worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INVENTORY_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("INVENTORY_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("INVENTORY_PORT", "8001")))
+    return parser.parse_args(argv)
+
+
+def server_options(args):
+    """
+    uvicorn options for the given arguments. uvloop and httptools are used
+    when installed (extra "server"). The app starts draining on the signal;
+    uvicorn then waits up to SHUTDOWN_DRAIN_TIMEOUT seconds for open connections.
+    """
+    return {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "loop": "uvloop" if _installed("uvloop") else "auto",
+        "http": "httptools" if _installed("httptools") else "auto",
+        "timeout_graceful_shutdown": config["lifecycle"]["drain_timeout"]
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Read by the settings of every worker, enables leader election when > 1
+    os.environ["INVENTORY_WORKERS"] = str(args.workers)
+    uvicorn.run("src.main:app", **server_options(args))
+
+
+if __name__ == "__main__":
+    main()
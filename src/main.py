@@ -6,24 +6,39 @@ import uvicorn
 # Importing routes
 
 from src.services.products_services import router
-from src.utils.events import EventHandler
+from src.services.inventory_services import router as inventory_router
+from src.services.metrics_services import router as metrics_router
+from src.services.stream_services import router as stream_router
+from src.utils.container import Container
+from src.utils.compression import CompressionMiddleware
+from src.utils.lifecycle import DrainMiddleware
 from src.utils.logger_utils import Log
+from src.utils.responses import FastJSONResponse
 
 log = Log()
+# Shared resources and controllers, built once for the whole process
+container = Container()
 # Creating FastAPI instance
 app = FastAPI(title="Api Products", 
               description="API for Products", 
-              version="0.1.0")
+              version="0.1.0",
+              default_response_class=FastJSONResponse,
+              lifespan=container.lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"])
+app.add_middleware(CompressionMiddleware, compression=container.compression)
+app.add_middleware(DrainMiddleware, lifecycle=container.lifecycle)
 
 # Including routes
 app.include_router(router)
-app.add_event_handler("startup", EventHandler().startup_event)                    
+app.include_router(inventory_router)
+app.include_router(stream_router)
+app.include_router(metrics_router)
+app.state.container = container
 
 
 # Running server
@@ -0,0 +1,147 @@
+import threading
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, monitoring
+
+from src.utils.logger_utils import Log
+from src.utils.settings import config
+
+
+log = Log()
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST
+}
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Collects connection pool events published by pymongo.
+    Callbacks run on driver threads, so counters are updated under a lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checked_out = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pool_clears = 0
+
+    def _add(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(pool_clears=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(connections_created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(connections_closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add(checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(checkouts=1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out": self.checked_out,
+                "open_connections": self.connections_created - self.connections_closed,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "pool_clears": self.pool_clears
+            }
+
+
+class MongoClientManager:
+    """
+    Owns the single process-wide Motor client.
+    It is created on application startup (or lazily on first use) and closed
+    on shutdown, so every repository shares one pool and one set of monitors.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or config["local"]
+        self.client = None
+        self.listener = PoolMetricsListener()
+
+    @property
+    def read_preference(self):
+        return READ_PREFERENCES[self.settings["read_preference"]]
+
+    def _write_concern(self):
+        write_concern = self.settings["write_concern"]
+        return int(write_concern) if write_concern.isdigit() else write_concern
+
+    def get_client(self):
+        if self.client is None:
+            self.client = AsyncIOMotorClient(
+                self.settings["connection"],
+                maxPoolSize=self.settings["max_pool_size"],
+                minPoolSize=self.settings["min_pool_size"],
+                maxIdleTimeMS=self.settings["max_idle_time_ms"],
+                w=self._write_concern(),
+                wTimeoutMS=self.settings["write_concern_timeout_ms"],
+                event_listeners=[self.listener]
+            )
+            log.logger.info("MongoDB client created", max_pool_size=self.settings["max_pool_size"])
+        return self.client
+
+    async def start(self):
+        self.get_client()
+
+    async def ping(self):
+        """
+        Round trip to the server, used by the readiness probe and to open the
+        first pooled connection during warm-up.
+        """
+        await self.get_client().admin.command("ping")
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            log.logger.info("MongoDB client closed")
+
+    def stats(self):
+        return {
+            "started": self.client is not None,
+            "max_pool_size": self.settings["max_pool_size"],
+            "min_pool_size": self.settings["min_pool_size"],
+            "read_preference": self.settings["read_preference"],
+            **self.listener.stats()
+        }
+
+
+mongo_client = MongoClientManager()
@@ -1,14 +1,576 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+import re
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, CursorType, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
+from src.repository.mongo_client import mongo_client
 from src.utils.settings import config
 
 
+# Indexes declared on the products collection at startup
+PRODUCT_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_1", sparse=True),
+    # Keyset pagination of the listing, sorted by name or price with _id as tie breaker
+    IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1"),
+    IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_1__id_1")
+]
+
+# Fields the listing can be sorted by
+LISTING_SORT_KEYS = ("_id", "name", "price")
+
+# Indexes of the stock reservations collection. Finished reservations get a
+# purge_at date and are removed by the TTL index after the retention period;
+# pending ones have none, so they are only removed once the reaper has
+# returned their units to the stock. Finished reservations not yet applied
+# to the stock are found by the partial finished_at index.
+RESERVATION_INDEXES = [
+    IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0),
+    IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)], name="status_1_expires_at_1"),
+    IndexModel([("finished_at", ASCENDING)], name="finished_at_unsettled",
+               partialFilterExpression={"settled": False})
+]
+
+# Safety net on the stock collection: no write may leave negative units
+STOCK_VALIDATOR = {
+    "$jsonSchema": {
+        "bsonType": "object",
+        "properties": {
+            "available": {"bsonType": ["int", "long"], "minimum": 0},
+            "reserved": {"bsonType": ["int", "long"], "minimum": 0}
+        }
+    }
+}
+
+# Write errors of a stock adjustment that mean there were not enough units:
+# the conditional upsert found no matching stock and the insert hit the
+# existing _id (11000), or the write was refused by STOCK_VALIDATOR (121)
+INSUFFICIENT_STOCK_ERROR_CODES = (11000, 121)
+
+# Pending product writes are flushed to ms-product once their coalescing
+# window (not_before) is over, oldest first
+PENDING_WRITE_INDEXES = [
+    IndexModel([("not_before", ASCENDING)], name="not_before_1")
+]
+
+RESERVATION_PENDING = "pending"
+RESERVATION_COMMITTED = "committed"
+RESERVATION_RELEASED = "released"
+RESERVATION_EXPIRED = "expired"
+
+
 class ProductsRepository:
-    def __init__(self):
-        self.client = AsyncIOMotorClient(config["local"]["connection"])
-        self.db = self.client[config["local"]["db"]]
+    def __init__(self, client_manager=mongo_client):
+        # Every repository shares the process-wide client and its pool
+        self.client_manager = client_manager
         self.collection_name = config["local"]["collection_owner"]
 
+    @property
+    def client(self):
+        # Resolved on use, so a long-lived repository follows the client
+        # the manager (re)creates on startup
+        return self.client_manager.get_client()
+
+    @property
+    def db(self):
+        return self.client[config["local"]["db"]]
+
     def get_collection(self):
         return self.db[self.collection_name]
 
+    def get_read_collection(self):
+        """
+        Products collection using the configured read preference (secondaryPreferred
+        by default), for queries that tolerate slightly stale data.
+        """
+        return self.db.get_collection(self.collection_name, read_preference=self.client_manager.read_preference)
+
+    async def ensure_indexes(self):
+        """
+        Create the indexes used by the direct read path if they do not exist.
+        """
+        await self.get_collection().create_indexes(PRODUCT_INDEXES)
+        await self.get_reservations_collection().create_indexes(RESERVATION_INDEXES)
+        await self.get_pending_writes_collection().create_indexes(PENDING_WRITE_INDEXES)
+        await self.ensure_stock_validator()
+
+    async def ensure_stock_validator(self):
+        """
+        Install STOCK_VALIDATOR on the stock collection, creating it if needed.
+        """
+        name = config["inventory"]["stock_collection"]
+        try:
+            await self.db.create_collection(name, validator=STOCK_VALIDATOR)
+        except CollectionInvalid:
+            await self.db.command("collMod", name, validator=STOCK_VALIDATOR)
+
+    @staticmethod
+    def product_query(product_id):
+        """
+        Build the lookup filter of a product id: Mongo ObjectIds match _id,
+        any other identifier matches the indexed id field.
+        """
+        if ObjectId.is_valid(product_id):
+            return {"_id": ObjectId(product_id)}
+        return {"id": product_id}
+
+    async def find_product(self, product_id, projection=None, primary=False):
+        """
+        Read a single product straight from the products collection.
+        :param product_id: The product identifier.
+        :param projection: Optional list of fields to return.
+        :param primary: Read from the primary, for reads that fill the cache:
+            a lagging secondary could return a document older than the
+            change events already applied to it.
+        :return: The product document or None.
+        """
+        collection = self.get_collection() if primary else self.get_read_collection()
+        return await collection.find_one(self.product_query(product_id), projection or None)
+
+    @staticmethod
+    def id_value(value):
+        """
+        Turn an _id received as text back into the stored value.
+        """
+        return ObjectId(value) if ObjectId.is_valid(value) else value
+
+    def iter_products(self, after=None, projection=None, batch_size=1000, primary=False):
+        """
+        Iterate over the whole products collection in _id order without
+        loading it in memory.
+        :param after: Only return products with a greater _id, to resume an
+            interrupted export from the last _id received.
+        :param projection: Optional list of fields to return, _id is always included.
+        :param batch_size: Documents fetched per round trip to MongoDB.
+        :param primary: Read from the primary, for scans paired with a change
+            stream position, which a lagging secondary may not have reached.
+        :return: An async cursor of product documents.
+        """
+        query = {} if after is None else {"_id": {"$gt": self.id_value(after)}}
+        collection = self.get_collection() if primary else self.get_read_collection()
+        return collection.find(query, projection or None).sort("_id", ASCENDING).batch_size(batch_size)
+
+    @staticmethod
+    def listing_query(name_prefix=None, min_price=None, max_price=None, sort_key="_id", after=None):
+        """
+        Build the filter of a listing page.
+        :param after: (sort value, _id) of the last product of the previous page.
+            The page starts right after it, so deep pages cost the same as the
+            first one instead of skipping every previous product.
+        """
+        clauses = []
+        if name_prefix:
+            # Anchored, case sensitive regex: served by the name index
+            clauses.append({"name": {"$regex": "^" + re.escape(name_prefix)}})
+        price = {}
+        if min_price is not None:
+            price["$gte"] = min_price
+        if max_price is not None:
+            price["$lte"] = max_price
+        if price:
+            clauses.append({"price": price})
+        if sort_key != "_id":
+            # Missing and null values sort before every other one and can not be
+            # resumed from with $gt: such products are left out of sorted listings
+            clauses.append({sort_key: {"$ne": None}})
+        if after is not None:
+            last_value, last_id = after
+            if sort_key == "_id":
+                clauses.append({"_id": {"$gt": last_id}})
+            else:
+                clauses.append({"$or": [
+                    {sort_key: {"$gt": last_value}},
+                    {sort_key: last_value, "_id": {"$gt": last_id}}
+                ]})
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    async def list_products(self, query, sort_key="_id", limit=50, projection=None):
+        """
+        Read one listing page sorted by sort_key and _id.
+        :param query: Filter built with listing_query.
+        :return: Up to limit product documents.
+        """
+        sort = [("_id", ASCENDING)] if sort_key == "_id" else [(sort_key, ASCENDING), ("_id", ASCENDING)]
+        if projection:
+            projection = list(dict.fromkeys(list(projection) + [sort_key]))
+        cursor = self.get_read_collection().find(query, projection or None).sort(sort).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    def get_resume_token_collection(self):
+        return self.db[config["change_stream"]["resume_collection"]]
+
+    async def load_resume_token(self, watcher_name):
+        """
+        Read the last persisted change stream resume token of a watcher.
+        :param watcher_name: Name identifying the change stream consumer.
+        :return: The resume token or None when the watcher never ran.
+        """
+        document = await self.get_resume_token_collection().find_one({"_id": watcher_name})
+        return document["token"] if document else None
+
+    async def save_resume_token(self, watcher_name, token):
+        """
+        Persist the resume token of a watcher so it can continue after a restart.
+        :param watcher_name: Name identifying the change stream consumer.
+        :param token: The resume token of the last processed event.
+        """
+        await self.get_resume_token_collection().update_one(
+            {"_id": watcher_name},
+            {"$set": {"token": token, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+
+    def get_stock_collection(self):
+        return self.db[config["inventory"]["stock_collection"]]
+
+    def get_reservations_collection(self):
+        return self.db[config["inventory"]["reservations_collection"]]
+
+    @staticmethod
+    def reservation_query(reservation_id):
+        if not ObjectId.is_valid(reservation_id):
+            return None
+        return {"_id": ObjectId(reservation_id)}
+
+    async def get_stock(self, sku):
+        """
+        Read the stock of a product from the primary.
+        :return: The stock document or None when the sku has no stock entry.
+        """
+        return await self.get_stock_collection().find_one({"_id": sku}, {"holds": 0})
+
+    async def set_stock(self, sku, available):
+        """
+        Set the units available of a product, creating its stock entry if needed.
+        Reserved units are kept as they are.
+        :return: The updated stock document.
+        """
+        return await self.get_stock_collection().find_one_and_update(
+            {"_id": sku},
+            {"$set": {"available": available, "updated_at": datetime.now(timezone.utc)}, "$setOnInsert": {"reserved": 0}},
+            projection={"holds": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def stock_adjustment(sku, delta=None, available=None):
+        """
+        Build the write of one stock adjustment.
+        :param delta: Units to add, or to remove when negative. Removals only
+            match while enough units are available.
+        :param available: Units available, replacing the current value.
+        """
+        now = datetime.now(timezone.utc)
+        if available is not None:
+            return UpdateOne(
+                {"_id": sku},
+                {"$set": {"available": available, "updated_at": now}, "$setOnInsert": {"reserved": 0}},
+                upsert=True
+            )
+        query = {"_id": sku}
+        if delta < 0:
+            query["available"] = {"$gte": -delta}
+        return UpdateOne(
+            query,
+            {"$inc": {"available": delta}, "$set": {"updated_at": now}, "$setOnInsert": {"reserved": 0}},
+            upsert=True
+        )
+
+    async def bulk_adjust_stock(self, operations):
+        """
+        Apply a chunk of stock adjustments in a single unordered bulk write,
+        so one failing row does not stop the others.
+        :param operations: Writes built with stock_adjustment.
+        :return: List of (index in the chunk, error code, message) of the rows that failed.
+        """
+        try:
+            await self.get_stock_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as error:
+            return [
+                (write_error["index"], write_error["code"], write_error["errmsg"])
+                for write_error in error.details["writeErrors"]
+            ]
+        return []
+
+    async def reserve_stock(self, sku, quantity, ttl_seconds):
+        """
+        Record a pending reservation and take its units from the available
+        stock. The stock update is a single write that only matches while
+        enough units are available, so concurrent reservations can never
+        oversell, and it adds the reservation to the holds of the stock, so
+        finishing it later returns or consumes its units exactly once. If
+        the process stops between both writes the reservation is left pending
+        without a hold and simply expires.
+        :return: The reservation document, or None when there is not enough stock.
+        """
+        now = datetime.now(timezone.utc)
+        reservation = {
+            "_id": ObjectId(),
+            "sku": sku,
+            "quantity": quantity,
+            "status": RESERVATION_PENDING,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl_seconds)
+        }
+        await self.get_reservations_collection().insert_one(reservation)
+        stock = await self.get_stock_collection().find_one_and_update(
+            {"_id": sku, "available": {"$gte": quantity}},
+            {
+                "$inc": {"available": -quantity, "reserved": quantity},
+                "$push": {"holds": reservation["_id"]},
+                "$set": {"updated_at": now}
+            },
+            projection={"_id": 1}
+        )
+        if stock is None:
+            await self.get_reservations_collection().delete_one({"_id": reservation["_id"]})
+            return None
+        return reservation
+
+    async def find_reservation(self, reservation_id):
+        query = self.reservation_query(reservation_id)
+        if query is None:
+            return None
+        return await self.get_reservations_collection().find_one(query)
+
+    async def finish_reservation(self, reservation_id, status):
+        """
+        Move a pending reservation to its final status and apply it to the stock:
+        committed units leave the stock, released and expired ones become
+        available again. Only one caller can claim a pending reservation; the
+        claimed reservation stays unsettled until the stock has been adjusted,
+        so the reaper finishes the job if the process stops in between.
+        :param status: RESERVATION_COMMITTED, RESERVATION_RELEASED or RESERVATION_EXPIRED.
+        :return: The finished reservation, or None when it was not pending
+            (or, for commits, already expired).
+        """
+        query = self.reservation_query(reservation_id)
+        if query is None:
+            return None
+        now = datetime.now(timezone.utc)
+        retention = timedelta(seconds=config["inventory"]["reservation_retention_seconds"])
+        claim = {**query, "status": RESERVATION_PENDING}
+        if status == RESERVATION_COMMITTED:
+            claim["expires_at"] = {"$gt": now}
+        elif status == RESERVATION_EXPIRED:
+            claim["expires_at"] = {"$lte": now}
+        reservation = await self.get_reservations_collection().find_one_and_update(
+            claim,
+            {"$set": {"status": status, "finished_at": now, "purge_at": now + retention, "settled": False}},
+            return_document=ReturnDocument.AFTER
+        )
+        if reservation is None:
+            return None
+        await self.settle_reservation(reservation)
+        return reservation
+
+    async def settle_reservation(self, reservation):
+        """
+        Apply a finished reservation to the stock. The update only matches
+        while the stock still holds the reservation and removes the hold, so
+        settling the same reservation again changes nothing.
+        """
+        increment = {"reserved": -reservation["quantity"]}
+        if reservation["status"] != RESERVATION_COMMITTED:
+            increment["available"] = reservation["quantity"]
+        await self.get_stock_collection().update_one(
+            {"_id": reservation["sku"], "holds": reservation["_id"]},
+            {"$inc": increment, "$pull": {"holds": reservation["_id"]}, "$set": {"updated_at": datetime.now(timezone.utc)}}
+        )
+        await self.get_reservations_collection().update_one({"_id": reservation["_id"]}, {"$set": {"settled": True}})
+
+    async def expire_reservations(self, limit):
+        """
+        Return the units of pending reservations past their expiry to the stock.
+        :param limit: Maximum number of reservations handled in this call.
+        :return: The number of reservations expired.
+        """
+        cursor = self.get_reservations_collection().find(
+            {"status": RESERVATION_PENDING, "expires_at": {"$lte": datetime.now(timezone.utc)}},
+            {"_id": 1}
+        ).limit(limit)
+        expired = 0
+        async for reservation in cursor:
+            if await self.finish_reservation(str(reservation["_id"]), RESERVATION_EXPIRED) is not None:
+                expired += 1
+        return expired
+
+    async def settle_reservations(self, limit, grace_seconds):
+        """
+        Settle the reservations that were finished but never applied to the
+        stock, because the process finishing them stopped half way.
+        :param limit: Maximum number of reservations handled in this call.
+        :param grace_seconds: Only reservations finished at least this long
+            ago are settled, leaving the ones in flight to their caller.
+        :return: The number of reservations settled.
+        """
+        cursor = self.get_reservations_collection().find(
+            {"settled": False, "finished_at": {"$lte": datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)}}
+        ).limit(limit)
+        settled = 0
+        async for reservation in cursor:
+            await self.settle_reservation(reservation)
+            settled += 1
+        return settled
+
+    def get_pending_writes_collection(self):
+        return self.db[config["write_behind"]["collection"]]
+
+    async def enqueue_write(self, product_id, fields, window_seconds, merge=True):
+        """
+        Durably queue an update of a product for ms-product. Updates of the
+        same product arriving before it is flushed are coalesced into one
+        pending write: merged field by field, or replacing the previous
+        fields when merge is False. The version grows with every update.
+        :return: The pending write document after the update.
+        """
+        now = datetime.now(timezone.utc)
+        changes = {f"fields.{name}": value for name, value in fields.items()} if merge else {"fields": fields}
+        return await self.get_pending_writes_collection().find_one_and_update(
+            {"_id": product_id},
+            {
+                "$set": {**changes, "updated_at": now},
+                "$inc": {"version": 1, "updates": 1},
+                "$setOnInsert": {"enqueued_at": now, "not_before": now + timedelta(seconds=window_seconds)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def find_pending_write(self, product_id):
+        return await self.get_pending_writes_collection().find_one({"_id": product_id})
+
+    @staticmethod
+    def unclaimed_query(now):
+        return {"$or": [{"claimed_until": {"$exists": False}}, {"claimed_until": {"$lte": now}}]}
+
+    async def due_pending_writes(self, limit):
+        """
+        Pending writes whose coalescing window or retry delay is over, oldest
+        first, leaving out the ones being sent.
+        """
+        now = datetime.now(timezone.utc)
+        cursor = self.get_pending_writes_collection().find(
+            {"not_before": {"$lte": now}, **self.unclaimed_query(now)}
+        ).sort("not_before", ASCENDING).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def claim_pending_write(self, product_id, claim_seconds):
+        """
+        Mark a pending write as being sent, so a flush and a synchronous
+        update of the product never send it at the same time. The claim
+        lapses after claim_seconds in case its holder dies.
+        :return: The claimed write, or None when there is none or it is already claimed.
+        """
+        now = datetime.now(timezone.utc)
+        return await self.get_pending_writes_collection().find_one_and_update(
+            {"_id": product_id, **self.unclaimed_query(now)},
+            {"$set": {"claimed_until": now + timedelta(seconds=claim_seconds)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def complete_pending_write(self, product_id, version):
+        """
+        Remove a flushed write, unless it was updated again while being flushed:
+        then it stays queued with the newer fields and is released.
+        :return: Whether the write was removed.
+        """
+        result = await self.get_pending_writes_collection().delete_one({"_id": product_id, "version": version})
+        if result.deleted_count == 1:
+            return True
+        await self.release_pending_write(product_id)
+        return False
+
+    async def release_pending_write(self, product_id):
+        await self.get_pending_writes_collection().update_one({"_id": product_id}, {"$unset": {"claimed_until": ""}})
+
+    async def retry_pending_write(self, product_id, error, delay_seconds):
+        await self.get_pending_writes_collection().update_one(
+            {"_id": product_id},
+            {
+                "$set": {"not_before": datetime.now(timezone.utc) + timedelta(seconds=delay_seconds),
+                         "last_error": error},
+                "$unset": {"claimed_until": ""},
+                "$inc": {"attempts": 1}
+            }
+        )
+
+    async def count_pending_writes(self):
+        # From the collection metadata, cheap enough to read after every batch
+        return await self.get_pending_writes_collection().estimated_document_count()
+
+    def get_lease_collection(self):
+        return self.db[config["deployment"]["lease_collection"]]
+
+    async def acquire_lease(self, name, owner, ttl_seconds):
+        """
+        Take or renew a lease. It is granted when it is free, expired or
+        already held by owner; the conditional upsert makes concurrent
+        candidates race on the unique _id so only one of them wins.
+        Expiry is set and compared with the server clock ($$NOW), so workers
+        on hosts with skewed clocks agree on when a lease is free.
+        :return: When the lease ends for this process, measured from before the
+            request was sent, if owner holds it; None otherwise.
+        """
+        started = datetime.now(timezone.utc)
+        try:
+            lease = await self.get_lease_collection().find_one_and_update(
+                {"_id": name, "$or": [{"owner": owner}, {"$expr": {"$lte": ["$expires_at", "$$NOW"]}}]},
+                [{"$set": {"owner": owner, "expires_at": {"$add": ["$$NOW", int(ttl_seconds * 1000)]},
+                           "renewed_at": "$$NOW"}}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another owner holds a live lease
+            return None
+        if lease is None or lease["owner"] != owner:
+            return None
+        # The server renewed it after the request left, so this never outlives it
+        return started + timedelta(seconds=ttl_seconds)
+
+    async def release_lease(self, name, owner):
+        """
+        Give a lease up right away so another candidate can take it.
+        """
+        await self.get_lease_collection().update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {"expires_at": datetime.fromtimestamp(0, timezone.utc)}}
+        )
+
+    def get_event_bus_collection(self):
+        return self.db[config["deployment"]["bus_collection"]]
+
+    async def ensure_event_bus(self, size_bytes):
+        """
+        Create the capped collection used to fan change events out to every worker.
+        """
+        try:
+            await self.db.create_collection(config["deployment"]["bus_collection"], capped=True, size=size_bytes)
+        except CollectionInvalid:
+            pass
+
+    async def publish_events(self, origin, changes):
+        await self.get_event_bus_collection().insert_one(
+            {"origin": origin, "changes": changes, "created_at": datetime.now(timezone.utc)})
+
+    async def last_event_bus_id(self):
+        entry = await self.get_event_bus_collection().find_one({}, {"_id": 1}, sort=[("$natural", DESCENDING)])
+        return entry["_id"] if entry else None
+
+    async def has_event_bus_entry(self, entry_id):
+        return await self.get_event_bus_collection().find_one({"_id": entry_id}, {"_id": 1}) is not None
 
+    def tail_event_bus(self):
+        """
+        Tailable cursor over every event bus entry, in the order the server
+        inserted them ($natural). Entry _ids are made by the client of each
+        worker and do not follow that order, so they are not used as a filter.
+        The cursor waits for new entries until the collection wraps past its
+        position; it stays alive after an empty batch.
+        """
+        return self.get_event_bus_collection().find({}, cursor_type=CursorType.TAILABLE_AWAIT)
@@ -0,0 +1,119 @@
+from fastapi import APIRouter, Depends, Request
+
+from src.utils.logger_utils import Log
+from src.entities.products_entities import Reservation, StockLevel
+from src.controllers.stock_controllers import StockLedger
+from src.utils.error_handling import ErrorHandler
+from src.utils.metrics import InstrumentedRoute
+from src.utils.responses import FastJSONResponse
+from src.utils.container import get_stock_controller
+from src.utils.settings import config
+from src.utils.streaming import iter_json_array, iter_ndjson
+
+
+log = Log()
+router = APIRouter(prefix="/api-inventory", route_class=InstrumentedRoute)
+
+
+############################################################################################################
+# endpoints of the local stock ledger
+############################################################################################################
+
+# stock of a product
+@router.get('/stock/{sku}')
+async def get_stock(sku: str, controller: StockLedger = Depends(get_stock_controller)):
+    """
+    This function is used to get the stock of a product
+    :param sku: identifier of the product
+    :return: units available and reserved
+    """
+    try:
+        response = await controller.get_stock(sku)
+        return FastJSONResponse(content={"result": response}, status_code=200)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error fetching stock")
+
+
+# set the available units of a product
+@router.put('/stock/{sku}')
+async def set_stock(sku: str, stock_level: StockLevel, controller: StockLedger = Depends(get_stock_controller)):
+    """
+    This function is used to set the units available of a product
+    :param sku: identifier of the product
+    :param stock_level: units available to reserve
+    :return: units available and reserved
+    """
+    try:
+        response = await controller.set_stock(sku, stock_level)
+        return FastJSONResponse(content={"result": response}, status_code=200)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error setting stock")
+
+
+# apply many stock changes streamed in the body
+@router.post('/stock/bulk-adjust/')
+async def bulk_adjust_stock(request: Request, controller: StockLedger = Depends(get_stock_controller)):
+    """
+    This function is used to apply many stock adjustments at once
+    The body is read as a stream: a JSON array when the content type is
+    application/json, NDJSON (one adjustment per line) otherwise. Each row is
+    {"sku": ..., "delta": ...} or {"sku": ..., "available": ...}.
+    :return: counts of received, applied and failed rows and the row errors
+    """
+    try:
+        max_row_bytes = config["inventory"]["adjust_max_row_bytes"]
+        if request.headers.get("content-type", "").split(";")[0].strip() == "application/json":
+            rows = iter_json_array(request.stream(), max_row_bytes)
+        else:
+            rows = iter_ndjson(request.stream(), max_row_bytes)
+        response = await controller.bulk_adjust(rows)
+        # A body that could not be read to the end is reported as invalid
+        status_code = 422 if response["aborted"] else 200
+        return FastJSONResponse(content={"result": response}, status_code=status_code)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error adjusting stock in bulk")
+
+
+# reserve units of a product
+@router.post('/reservations/')
+async def reserve_stock(reservation: Reservation, controller: StockLedger = Depends(get_stock_controller)):
+    """
+    This function is used to reserve units of a product
+    :param reservation: product, quantity and optional ttl of the reservation
+    :return: the pending reservation, 409 when there is not enough stock
+    """
+    try:
+        response = await controller.reserve(reservation)
+        return FastJSONResponse(content={"result": response}, status_code=201)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error reserving stock")
+
+
+# commit a reservation, its units are sold
+@router.post('/reservations/{reservation_id}/commit')
+async def commit_reservation(reservation_id: str, controller: StockLedger = Depends(get_stock_controller)):
+    """
+    This function is used to commit a pending reservation
+    :param reservation_id: identifier of the reservation
+    :return: the committed reservation, 409 when it is no longer pending
+    """
+    try:
+        response = await controller.commit(reservation_id)
+        return FastJSONResponse(content={"result": response}, status_code=200)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error committing reservation")
+
+
+# release a reservation, its units are available again
+@router.post('/reservations/{reservation_id}/release')
+async def release_reservation(reservation_id: str, controller: StockLedger = Depends(get_stock_controller)):
+    """
+    This function is used to release a pending reservation
+    :param reservation_id: identifier of the reservation
+    :return: the released reservation, 409 when it is no longer pending
+    """
+    try:
+        response = await controller.release(reservation_id)
+        return FastJSONResponse(content={"result": response}, status_code=200)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error releasing reservation")
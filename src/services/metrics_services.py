@@ -0,0 +1,109 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.utils.metrics import registry
+from src.utils.http_client import upstream_client
+from src.utils.cache import product_cache
+from src.repository.mongo_client import mongo_client
+from src.services.products_event_services import products_event_service
+from src.services.reservation_reaper_services import reservation_reaper
+from src.utils.broadcaster import change_broadcaster
+from src.utils.event_bus import change_event_bus
+from src.services.write_behind_services import write_behind_flusher
+from src.utils.snapshot import catalogue_snapshot
+
+
+router = APIRouter()
+
+
+############################################################################################################
+# metrics read from the shared components at scrape time
+############################################################################################################
+
+registry.callback(
+    "inventory_upstream_requests_total", "Calls made to ms-product", "counter", (),
+    lambda: [((), upstream_client.requests_total)])
+registry.callback(
+    "inventory_upstream_errors_total", "Calls to ms-product that failed after retries", "counter", (),
+    lambda: [((), upstream_client.errors_total)])
+registry.callback(
+    "inventory_upstream_retries_total", "Retries sent to ms-product", "counter", (),
+    lambda: [((), upstream_client.retries_total)])
+registry.callback(
+    "inventory_upstream_connections", "Connections in the ms-product pool by state", "gauge", ("state",),
+    lambda: [(("active",), upstream_client.stats()["active_connections"]),
+             (("idle",), upstream_client.stats()["idle_connections"])])
+registry.callback(
+    "inventory_upstream_circuit_open", "1 when the circuit breaker of a ms-product path is open", "gauge", ("path",),
+    lambda: [((path,), int(state != "closed")) for path, state in upstream_client.breaker_states().items()])
+registry.callback(
+    "inventory_cache_operations_total", "Product cache lookups and removals by result", "counter", ("result",),
+    lambda: [((result,), product_cache.stats()[result]) for result in ("hits", "misses", "evictions", "expirations", "invalidations")])
+registry.callback(
+    "inventory_cache_entries", "Products currently cached", "gauge", (),
+    lambda: [((), len(product_cache))])
+registry.callback(
+    "inventory_change_events_total", "Change stream events received", "counter", (),
+    lambda: [((), products_event_service.events_total)])
+registry.callback(
+    "inventory_change_stream_reconnects_total", "Change stream reconnections", "counter", (),
+    lambda: [((), products_event_service.reconnects)])
+registry.callback(
+    "inventory_change_stream_lag_seconds", "Delay between a change and its processing", "gauge", (),
+    lambda: [((), products_event_service.lag_seconds or 0.0)])
+registry.callback(
+    "inventory_event_pipeline_queue_depth", "Change events waiting in the pipeline queue", "gauge", (),
+    lambda: [((), products_event_service.pipeline.stats()["queue_depth"])])
+registry.callback(
+    "inventory_event_pipeline_batches_total", "Batches dispatched by the pipeline", "counter", (),
+    lambda: [((), products_event_service.pipeline.batches_total)])
+registry.callback(
+    "inventory_mongo_pool_checked_out", "MongoDB connections currently checked out", "gauge", (),
+    lambda: [((), mongo_client.listener.checked_out)])
+registry.callback(
+    "inventory_mongo_pool_checkouts_total", "MongoDB connection checkouts", "counter", ("result",),
+    lambda: [(("success",), mongo_client.listener.checkouts),
+             (("failure",), mongo_client.listener.checkout_failures)])
+registry.callback(
+    "inventory_stock_reservations_expired_total", "Stock reservations expired by the reaper", "counter", (),
+    lambda: [((), reservation_reaper.expired_total)])
+registry.callback(
+    "inventory_stock_reservations_settled_total", "Finished stock reservations settled by the reaper", "counter", (),
+    lambda: [((), reservation_reaper.settled_total)])
+registry.callback(
+    "inventory_change_subscribers", "Clients subscribed to product changes", "gauge", (),
+    lambda: [((), len(change_broadcaster.subscribers))])
+registry.callback(
+    "inventory_change_messages_dropped_total", "Change messages dropped for slow subscribers", "counter", (),
+    lambda: [((), change_broadcaster.dropped_total)])
+registry.callback(
+    "inventory_event_bus_changes_total", "Change events exchanged through the worker event bus", "counter",
+    ("direction",),
+    lambda: [(("published",), change_event_bus.published_total),
+             (("received",), change_event_bus.received_total)])
+registry.callback(
+    "inventory_write_behind_queue_depth", "Product updates waiting to be flushed to ms-product", "gauge", (),
+    lambda: [((), write_behind_flusher.queue_depth)] if write_behind_flusher.queue_depth is not None else [])
+registry.callback(
+    "inventory_write_behind_flushes_total", "Queued product updates sent to ms-product by result", "counter",
+    ("result",),
+    lambda: [(("flushed",), write_behind_flusher.flushed_total),
+             (("failed",), write_behind_flusher.failed_total),
+             (("rejected",), write_behind_flusher.rejected_total)])
+registry.callback(
+    "inventory_snapshot_lookups_total", "Cache misses looked up in the catalogue snapshot by result", "counter",
+    ("result",),
+    lambda: [(("hit",), catalogue_snapshot.hits), (("miss",), catalogue_snapshot.misses)])
+registry.callback(
+    "inventory_snapshot_products", "Products in the loaded catalogue snapshot file", "gauge", (),
+    lambda: [((), catalogue_snapshot.file.products if catalogue_snapshot.file is not None else 0)])
+
+
+# endpoint scraped by Prometheus
+@router.get('/metrics')
+async def metrics():
+    """
+    This function is used to expose the service metrics
+    :return: metrics in the Prometheus text format
+    """
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
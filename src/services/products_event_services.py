@@ -1,35 +1,208 @@
 from fastapi import Header, APIRouter, HTTPException, File, UploadFile, Depends
 from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 
 import asyncio
+import random
+import time
+from datetime import datetime, timezone
 
 
 
 from src.repository.products_repository import ProductsRepository
 from src.utils.logger_utils import Log
 from src.utils.error_handling import ErrorHandler
+from src.utils.cache import product_cache
+from src.utils.event_pipeline import change_event_pipeline
+from src.utils.settings import config
+
+
+log = Log()
+
+
+# Server error codes meaning the stored resume token can no longer be used
+NON_RESUMABLE_ERROR_CODES = (260, 280, 286)
 
 
 class ProductsEventServices:
     """
     This class is used to handle events related to products.
     It listens for changes in the products collection and processes them accordingly.
+    The watcher persists its resume token and reconnects with exponential backoff,
+    so a Mongo failover does not stop event processing. Events are handed to the
+    change event pipeline, which runs the registered handlers in batches.
+    With a catalogue snapshot loaded, the stream resumes from the position the
+    snapshot was written at, so it catches up on what the file is missing;
+    a snapshot older than the stored position is discarded instead.
     """
 
-    def __init__(self):
-        self.log = Log()
+    WATCHER_NAME = "products"
+
+    def __init__(self, cache=None, repository=None, settings=None, pipeline=None, snapshot=None):
+        self.cache = cache if cache is not None else product_cache
+        self.pipeline = pipeline or change_event_pipeline
+        self.pipeline.register(self.apply_to_cache)
+        self.repository = repository
+        self.snapshot = snapshot
+        self.settings = settings or config["change_stream"]
+        self.resume_token = None
+        # Stored position to go back to if the snapshot position is rejected
+        self.fallback_token = None
+        self.saved_token = None
+        self.last_flush = 0.0
+        self.backoff = self.settings["backoff_initial"]
+        self.stopping = False
+        self.connected = False
+        self.events_total = 0
+        self.errors_total = 0
+        self.reconnects = 0
+        self.last_event_time = None
+        self.lag_seconds = None
 
     async def watch_changes(self):
+        log.logger.info("Starting to watch changes in products collection")
+        self.stopping = False
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        await self.pipeline.start()
+        try:
+            self.resume_token = await self.repository.load_resume_token(self.WATCHER_NAME)
+        except Exception as e:
+            log.logger.error("Error loading resume token", error=e)
+        self.fallback_token = None
+        if self.snapshot_enabled and self.snapshot.resume_token is not None:
+            if self.is_older(self.snapshot.resume_token, self.resume_token):
+                # The handlers already went past it: the file misses changes they saw
+                log.logger.warning("Catalogue snapshot older than the stored resume token, discarding it")
+                self.snapshot.discard()
+            else:
+                # Events after the snapshot position are replayed; handlers are idempotent
+                self.fallback_token = self.resume_token
+                self.resume_token = self.snapshot.resume_token
+        try:
+            while not self.stopping:
+                try:
+                    await self._consume()
+                except asyncio.CancelledError:
+                    raise
+                except OperationFailure as e:
+                    self.errors_total += 1
+                    if e.code in NON_RESUMABLE_ERROR_CODES and self.fallback_token is not None:
+                        # Only the snapshot position was rejected: go on from the stored one
+                        log.logger.error("Snapshot resume token no longer valid, resuming from the stored one",
+                                         error=e)
+                        self.resume_token, self.fallback_token = self.fallback_token, None
+                        self.snapshot.discard()
+                    elif e.code in NON_RESUMABLE_ERROR_CODES:
+                        # The oplog no longer holds our position: start over and
+                        # drop derived state that may have missed events
+                        log.logger.error("Resume token no longer valid, restarting stream", error=e)
+                        self.resume_token = None
+                        self.cache.clear()
+                        if self.snapshot is not None:
+                            self.snapshot.discard()
+                    else:
+                        log.logger.error("Error watching changes", error=e)
+                except Exception as e:
+                    self.errors_total += 1
+                    log.logger.error("Error watching changes", error=e)
+                self.connected = False
+                if self.stopping:
+                    break
+                await self._wait_before_reconnect()
+        finally:
+            self.connected = False
+            await self.flush_resume_token(force=True)
+
+    async def _consume(self):
+        collection = self.repository.get_collection()
+        options = {"resume_after": self.resume_token} if self.resume_token else {}
+        if self.snapshot_enabled:
+            # The snapshot keeps whole documents, not just the changed fields
+            options["full_document"] = "updateLookup"
+        async with collection.watch(**options) as stream:
+            self.connected = True
+            self.backoff = self.settings["backoff_initial"]
+            async for change in stream:
+                await self.handle_change(change, stream.resume_token)
+                self.resume_token = stream.resume_token
+                self.fallback_token = None
+                await self.flush_resume_token()
+                if self.stopping:
+                    break
+
+    @property
+    def snapshot_enabled(self):
+        return self.snapshot is not None and self.snapshot.enabled
+
+    @staticmethod
+    def is_older(token, other):
+        """
+        Whether resume token is before other in the stream. The _data strings
+        of resume tokens sort in stream order; tokens in another format are
+        not compared.
+        """
         try:
-            self.log.logger.info("Starting to watch changes in products collection")
-            collection = ProductsRepository().get_collection()
-            async with collection.watch() as stream:
-                async for change in stream:
-                    self.log.logger.info(f"Change detected: {change}")
-                    # Here you can add logic to handle the change, e.g., update a cache or notify users
+            return other is not None and token["_data"] < other["_data"]
+        except (KeyError, TypeError):
+            return False
+
+    async def handle_change(self, change, resume_token=None):
+        """
+        Record a change stream event and enqueue it in the pipeline.
+        :param change: The change document emitted by collection.watch().
+        :param resume_token: Stream position right after this event.
+        """
+        log.logger.info("Change detected", operation=change.get("operationType"), change=change)
+        self.events_total += 1
+        self.last_event_time = datetime.now(timezone.utc)
+        cluster_time = change.get("clusterTime")
+        if cluster_time is not None:
+            self.lag_seconds = (self.last_event_time - cluster_time.as_datetime()).total_seconds()
+        await self.pipeline.put(change, resume_token)
+
+    async def apply_to_cache(self, changes):
+        for change in changes:
+            self.cache.apply_change(change)
+
+    async def _wait_before_reconnect(self):
+        delay = random.uniform(0, self.backoff)
+        self.backoff = min(self.backoff * 2, self.settings["backoff_max"])
+        self.reconnects += 1
+        log.logger.info("Reconnecting change stream", delay=round(delay, 2))
+        await asyncio.sleep(delay)
+
+    async def flush_resume_token(self, force=False):
+        """
+        Persist the position of the last event every handler has finished with.
+        Events still queued in the pipeline are replayed after a restart.
+        """
+        token = self.pipeline.committed_token
+        if token is None or token == self.saved_token or self.repository is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < self.settings["token_flush_interval"]:
+            return
+        try:
+            await self.repository.save_resume_token(self.WATCHER_NAME, token)
+            self.saved_token = token
+            self.last_flush = now
         except Exception as e:
-            self.log.logger.error(f"Error watching changes: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error watching changes")
+            log.logger.error("Error saving resume token", error=e)
+
+    def stop(self):
+        self.stopping = True
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "events_total": self.events_total,
+            "errors_total": self.errors_total,
+            "reconnects": self.reconnects,
+            "last_event_time": self.last_event_time.isoformat() if self.last_event_time else None,
+            "lag_seconds": self.lag_seconds
+        }
 
 
+products_event_service = ProductsEventServices()
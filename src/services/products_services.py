@@ -1,22 +1,33 @@
-from fastapi import Header, APIRouter, HTTPException, File, UploadFile, Depends
-from fastapi.responses import JSONResponse
+from fastapi import Header, APIRouter, HTTPException, File, UploadFile, Depends, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 
 import asyncio
 import json
 import traceback
 import urllib.request
+from typing import Optional
 
 
 from src.utils.logger_utils import Log
-from src.entities.products_entities import Product, UpdateProduct
+from src.entities.products_entities import Product, UpdateProduct, BulkProducts
 from src.controllers.get_products_controllers import GetProducts
+from src.controllers.bulk_products_controllers import GetProductsBulk
 from src.controllers.update_products_controllers import UpdateProducts
+from src.controllers.export_products_controllers import ExportProducts
+from src.controllers.list_products_controllers import ListProducts
 from src.utils.error_handling import ErrorHandler
+from src.utils.metrics import InstrumentedRoute
+from src.utils.responses import FastJSONResponse, RawJSONResponse, etag_matches, result_envelope
+from src.utils.settings import config
+from src.utils.container import (Container, get_container, get_products_controller, get_products_bulk_controller,
+                                 get_update_products_controller, get_export_products_controller,
+                                 get_list_products_controller, get_lifecycle)
+from src.utils.lifecycle import Lifecycle
 
 
 log = Log()
-router = APIRouter(prefix="/api-inventory")
+router = APIRouter(prefix="/api-inventory", route_class=InstrumentedRoute)
 
 
 ############################################################################################################
@@ -26,7 +37,7 @@ router = APIRouter(prefix="/api-inventory")
 # request of ammount of products for id
 
 @router.post('/products/')
-async def get_products(product_id: Product):
+async def get_products(product_id: Product, controller: GetProducts = Depends(get_products_controller)):
     """
     This function is used to get all products
     :return: all products
@@ -34,37 +45,182 @@ async def get_products(product_id: Product):
     try:
         log.logger.info("Fetching all products")
         request = product_id
-        response_data = await GetProducts(request).get_products()
-        # Return the data directly without double serialization
-        return JSONResponse(content={"result": response_data}, status_code=200)
+        body = await controller.get_products_body(request)
+        headers = {"ETag": body.etag}
+        if config["responses"]["passthrough"]:
+            # Splice the upstream bytes into the envelope without decoding them
+            return RawJSONResponse(content=result_envelope(body.raw), status_code=200, headers=headers)
+        return FastJSONResponse(content={"result": body.data}, status_code=200, headers=headers)
     except Exception as error:
         return ErrorHandler.handle_error(error, "Error fetching products")
 
 
+# request of many products by id in a single call
+@router.post('/products/bulk/')
+async def get_products_bulk(products: BulkProducts,
+                            controller: GetProductsBulk = Depends(get_products_bulk_controller)):
+    """
+    This function is used to get many products by id
+    :param products: list of product ids, duplicates are fetched once
+    :return: one result per requested id, in request order
+    """
+    try:
+        log.logger.info("Fetching products in bulk")
+        response_data = await controller.get_products(products.ids)
+        return FastJSONResponse(content={"result": response_data}, status_code=200)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error fetching products in bulk")
+
+
+# listing of the products, page by page
+@router.get('/products/')
+async def list_products(name_prefix: Optional[str] = None, min_price: Optional[float] = None,
+                        max_price: Optional[float] = None, sort: str = "_id", limit: Optional[int] = Query(None, gt=0),
+                        cursor: Optional[str] = None, fields: Optional[str] = None,
+                        controller: ListProducts = Depends(get_list_products_controller)):
+    """
+    This function is used to browse the products with filters
+    :param name_prefix: only products whose name starts with it
+    :param min_price: only products with a price greater or equal
+    :param max_price: only products with a price lower or equal
+    :param sort: _id, name or price
+    :param limit: products per page
+    :param cursor: next_cursor of the previous page
+    :param fields: comma separated fields to return, all of them by default
+    :return: the products of the page and the cursor of the next one
+    """
+    try:
+        projection = [field for field in (fields or "").split(",") if field]
+        response = await controller.list_products(name_prefix, min_price, max_price, sort, limit, cursor, projection)
+        return FastJSONResponse(content={"result": response}, status_code=200)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error listing products")
+
+
+# export of the whole catalogue
+@router.get('/products/export/')
+async def export_products(after: Optional[str] = None, fields: Optional[str] = None, gzip: bool = False,
+                          controller: ExportProducts = Depends(get_export_products_controller)):
+    """
+    This function is used to export every product as NDJSON, one product per line
+    :param after: _id of the last product received, to resume an interrupted export
+    :param fields: comma separated fields to export, all of them by default
+    :param gzip: compress the stream with gzip (Content-Encoding: gzip)
+    :return: streamed NDJSON sorted by _id
+    """
+    try:
+        log.logger.info("Exporting products", after=after, gzip=gzip)
+        projection = [field for field in (fields or "").split(",") if field]
+        chunks = await controller.export(after=after, fields=projection, gzip=gzip)
+        headers = {"Content-Encoding": "gzip"} if gzip else None
+        return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error exporting products")
+
+
+# request of a product by id, conditional with If-None-Match
+@router.get('/products/{product_id}')
+async def get_product(product_id: str, if_none_match: Optional[str] = Header(None),
+                      controller: GetProducts = Depends(get_products_controller)):
+    """
+    This function is used to get a product by id. Polling clients send the
+    ETag they hold in If-None-Match and get a 304 while the product is
+    unchanged; a cached product is compared without calling ms-product.
+    :param product_id: id of the product
+    :param if_none_match: ETag of the copy held by the client
+    :return: the product with its ETag, or 304 Not Modified
+    """
+    try:
+        body = await controller.get_products_body(Product(product={"id": product_id}))
+        headers = {"ETag": body.etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, body.etag):
+            return Response(status_code=304, headers=headers)
+        if config["responses"]["passthrough"]:
+            return RawJSONResponse(content=result_envelope(body.raw), status_code=200, headers=headers)
+        return FastJSONResponse(content={"result": body.data}, status_code=200, headers=headers)
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error fetching product")
+
+
 # endpoint to update a product by id
 @router.post('/update-product/')
-async def update_product(product_id: Product):
+async def update_product(product_id: Product, sync: Optional[bool] = None,
+                         controller: UpdateProducts = Depends(get_update_products_controller)):
     """
     This function is used to update a product by id
     :param product: Product object containing the updated information
-    :return: Updated product information
+    :param sync: with write-behind enabled, true sends the update to ms-product before answering
+    :return: Updated product information, or 202 with the queued version when written behind
     """
     try:
         request = product_id.model_dump()
-        response = await UpdateProducts(request).update_product()
-        return JSONResponse(content={"result": response}, status_code=200)
+        if controller.write_behind(request, sync):
+            response = await controller.enqueue_update(request)
+            return FastJSONResponse(content={"result": response}, status_code=202)
+        response = await controller.update_product(request)
+        return FastJSONResponse(content={"result": response}, status_code=200)
     except Exception as error:
         return ErrorHandler.handle_error(error, "Error updating product")
     
 
 # endpoint healt check
 @router.get('/health/')
-async def health_check():
+async def health_check(container: Container = Depends(get_container)):
     """
     This function is used to check the health of the inventory service
     :return: health status
     """
-    return JSONResponse(content={"status": "success", "message": "Inventory service is running"}, status_code=200)
+    return FastJSONResponse(content={
+        "status": "success",
+        "message": "Inventory service is running",
+        "circuit_breakers": container.upstream_client.breaker_states()
+    }, status_code=200)
+
+
+# liveness probe: the process is up and serving its event loop
+@router.get('/health/live')
+async def liveness(lifecycle: Lifecycle = Depends(get_lifecycle)):
+    """
+    This function is used to check that the inventory service process is alive
+    :return: liveness status and lifecycle state
+    """
+    return FastJSONResponse(content={"status": "alive", "state": lifecycle.state}, status_code=200)
+
 
+# readiness probe: warm-up done and dependencies reachable
+@router.get('/health/ready')
+async def readiness(lifecycle: Lifecycle = Depends(get_lifecycle)):
+    """
+    This function is used to check that the inventory service can take traffic.
+    Dependency checks are cached for HEALTH_PROBE_TTL seconds.
+    :return: readiness status with the result of every dependency check, 503 when not ready
+    """
+    ready, report = await lifecycle.readiness()
+    return FastJSONResponse(content=report, status_code=200 if ready else 503)
 
 
+# endpoint with runtime stats of pooled resources
+@router.get('/stats/')
+async def stats(container: Container = Depends(get_container)):
+    """
+    This function is used to expose utilisation of the shared resources
+    :return: stats of the upstream pool, the product cache and the change events
+    """
+    return FastJSONResponse(content={
+        "upstream": container.upstream_client.stats(),
+        "mongo": container.mongo_client.stats(),
+        "cache": container.cache.stats(),
+        "single_flight": container.single_flight.stats(),
+        "change_stream": container.products_event_service.stats(),
+        "event_pipeline": container.products_event_service.pipeline.stats(),
+        "reservation_reaper": container.reservation_reaper.stats(),
+        "broadcast": container.broadcaster.stats(),
+        "leadership": container.election.stats(),
+        "event_bus": container.event_bus.stats(),
+        "lifecycle": container.lifecycle.stats(),
+        "compression": container.compression.stats(),
+        "snapshot": container.snapshot.stats(),
+        "write_behind": {**container.write_behind_flusher.stats(),
+                         "queued_total": container.update_products.queued_total,
+                         "coalesced_total": container.update_products.coalesced_total}
+    }, status_code=200)
@@ -0,0 +1,68 @@
+import asyncio
+
+from src.repository.products_repository import ProductsRepository
+from src.utils.logger_utils import Log
+from src.utils.settings import config
+
+
+log = Log()
+
+
+class ReservationReaper:
+    """
+    This class is used to expire stock reservations.
+    It periodically returns the units of pending reservations past their
+    expiry to the available stock, and settles the reservations a stopped
+    process finished without adjusting the stock. Both are conditional
+    updates, so several reapers running at once never apply the same units twice.
+    """
+
+    def __init__(self, repository=None, settings=None):
+        self.repository = repository
+        self.settings = settings or config["inventory"]
+        self.stopping = False
+        self.runs = 0
+        self.expired_total = 0
+        self.settled_total = 0
+        self.errors_total = 0
+
+    async def run(self):
+        log.logger.info("Starting stock reservations reaper")
+        self.stopping = False
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        while not self.stopping:
+            expired = 0
+            try:
+                expired = await self.repository.expire_reservations(self.settings["reaper_batch_size"])
+                self.runs += 1
+                self.expired_total += expired
+                if expired:
+                    log.logger.info("Stock reservations expired", expired=expired)
+                settled = await self.repository.settle_reservations(
+                    self.settings["reaper_batch_size"], self.settings["reaper_interval"])
+                self.settled_total += settled
+                if settled:
+                    log.logger.info("Stock reservations settled", settled=settled)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors_total += 1
+                log.logger.error("Error expiring stock reservations", error=e)
+            # A full batch means there is a backlog, keep going right away
+            if expired < self.settings["reaper_batch_size"]:
+                await asyncio.sleep(self.settings["reaper_interval"])
+
+    def stop(self):
+        self.stopping = True
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "expired_total": self.expired_total,
+            "settled_total": self.settled_total,
+            "errors_total": self.errors_total
+        }
+
+
+reservation_reaper = ReservationReaper()
@@ -0,0 +1,109 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+import asyncio
+
+from src.utils.logger_utils import Log
+from src.utils.broadcaster import CLOSE, ChangeBroadcaster
+from src.utils.container import get_broadcaster
+from src.utils.error_handling import ErrorHandler
+from src.utils.metrics import InstrumentedRoute
+
+
+log = Log()
+router = APIRouter(prefix="/api-inventory", route_class=InstrumentedRoute)
+
+HEARTBEAT = b'{"type":"heartbeat"}'
+
+
+def parse_ids(ids):
+    return [product_id for product_id in (ids or "").split(",") if product_id]
+
+
+def subscribe(broadcaster, ids):
+    subscriber = broadcaster.subscribe(parse_ids(ids))
+    if subscriber is None:
+        ErrorHandler.handle_service_unavailable("Too many change stream subscribers")
+    return subscriber
+
+
+############################################################################################################
+# push of product changes to subscribers
+############################################################################################################
+
+async def sse_events(broadcaster, subscriber):
+    heartbeat_interval = broadcaster.settings["heartbeat_interval"]
+    try:
+        # Ask clients to wait a little before reconnecting
+        yield b"retry: 3000\n\n"
+        while True:
+            message = await subscriber.next_message(heartbeat_interval)
+            if message is CLOSE:
+                break
+            if message is None:
+                yield b": heartbeat\n\n"
+                continue
+            yield b"event: change\ndata: " + message + b"\n\n"
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+# server-sent events of product changes
+@router.get('/changes/stream')
+async def stream_changes(ids: Optional[str] = None, broadcaster: ChangeBroadcaster = Depends(get_broadcaster)):
+    """
+    This function is used to push product changes as server-sent events
+    :param ids: comma separated product ids (_id) to follow, every product by default
+    :return: text/event-stream of "change" events, with heartbeat comments
+    """
+    try:
+        subscriber = subscribe(broadcaster, ids)
+        log.logger.info("Change stream subscriber connected", subscriber=subscriber.id, transport="sse")
+        return StreamingResponse(
+            sse_events(broadcaster, subscriber),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception as error:
+        return ErrorHandler.handle_error(error, "Error subscribing to product changes")
+
+
+# websocket of product changes
+@router.websocket('/changes/ws')
+async def websocket_changes(websocket: WebSocket, ids: Optional[str] = None,
+                            broadcaster: ChangeBroadcaster = Depends(get_broadcaster)):
+    """
+    This function is used to push product changes over a websocket
+    :param ids: comma separated product ids (_id) to follow, every product by default
+    """
+    subscriber = broadcaster.subscribe(parse_ids(ids))
+    if subscriber is None:
+        await websocket.close(code=1013, reason="Too many subscribers")
+        return
+    await websocket.accept()
+    log.logger.info("Change stream subscriber connected", subscriber=subscriber.id, transport="websocket")
+    # Reading is only used to notice the client going away
+    receiver = asyncio.create_task(websocket.receive())
+    heartbeat_interval = broadcaster.settings["heartbeat_interval"]
+    try:
+        while True:
+            getter = asyncio.create_task(subscriber.next_message(heartbeat_interval))
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.create_task(websocket.receive())
+                continue
+            message = getter.result()
+            if message is CLOSE:
+                await websocket.close(code=1013, reason="Subscriber too slow or server shutting down")
+                break
+            await websocket.send_bytes(HEARTBEAT if message is None else message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timezone
+
+from src.repository.products_repository import ProductsRepository
+from src.utils.logger_utils import Log
+from src.utils.metrics import WRITE_BEHIND_FLUSH_LATENCY
+from src.utils.settings import config
+
+
+log = Log()
+
+
+class WriteBehindFlusher:
+    """
+    This class is used to send the queued product updates to ms-product.
+    Pending writes whose coalescing window is over are flushed in batches
+    with at most max_concurrency calls in flight. A write is claimed while it
+    is sent, so a synchronous update of the product waits for it. A write
+    updated again while it was being flushed stays queued with the newer
+    fields; failed writes are retried after retry_delay. Only the leader runs it.
+    """
+
+    def __init__(self, updates=None, repository=None, settings=None):
+        self.updates = updates
+        self.repository = repository
+        self.settings = settings or config["write_behind"]
+        self.latency = WRITE_BEHIND_FLUSH_LATENCY.labels()
+        self.stopping = False
+        self.queue_depth = None
+        self.flushed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self.errors_total = 0
+
+    async def run(self):
+        log.logger.info("Starting write-behind flusher")
+        self.stopping = False
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        semaphore = asyncio.Semaphore(self.settings["max_concurrency"])
+        while not self.stopping:
+            due = []
+            try:
+                due = await self.repository.due_pending_writes(self.settings["batch_size"])
+                await asyncio.gather(*(self.flush(pending, semaphore) for pending in due))
+                self.queue_depth = await self.repository.count_pending_writes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors_total += 1
+                log.logger.error("Error flushing product updates", error=e)
+            # A full batch means there is a backlog, keep going right away
+            if len(due) < self.settings["batch_size"]:
+                await asyncio.sleep(self.settings["flush_interval"])
+
+    async def flush(self, pending, semaphore):
+        product_id = pending["_id"]
+        async with semaphore:
+            # A synchronous update may be sending it (or took it) meanwhile
+            pending = await self.repository.claim_pending_write(product_id, self.settings["claim_timeout"])
+            if pending is None:
+                return
+            try:
+                response = await self.updates.flush(pending)
+            except asyncio.CancelledError:
+                await asyncio.shield(self.repository.release_pending_write(product_id))
+                raise
+            except Exception as e:
+                return await self._retry(product_id, repr(e))
+        if response.status_code >= 500:
+            return await self._retry(product_id, f"ms-product answered {response.status_code}")
+        if response.status_code >= 400:
+            # ms-product would refuse it again: drop it instead of retrying forever
+            self.rejected_total += 1
+            log.logger.error("Queued product update rejected", product_id=product_id, status=response.status_code,
+                             response=response.text)
+        else:
+            self.flushed_total += 1
+            enqueued_at = pending["enqueued_at"]
+            if enqueued_at.tzinfo is None:
+                enqueued_at = enqueued_at.replace(tzinfo=timezone.utc)
+            self.latency.observe((datetime.now(timezone.utc) - enqueued_at).total_seconds())
+        await self.repository.complete_pending_write(product_id, pending["version"])
+
+    async def _retry(self, product_id, error):
+        self.failed_total += 1
+        log.logger.warning("Queued product update failed, retrying", product_id=product_id, error=error)
+        await self.repository.retry_pending_write(product_id, error, self.settings["retry_delay"])
+
+    def stop(self):
+        self.stopping = True
+
+    def stats(self):
+        return {
+            "enabled": self.settings["enabled"],
+            "queue_depth": self.queue_depth,
+            "flushed_total": self.flushed_total,
+            "failed_total": self.failed_total,
+            "rejected_total": self.rejected_total,
+            "errors_total": self.errors_total,
+            "flush_latency_seconds_sum": self.latency.sum,
+            "flush_latency_seconds_count": self.latency.count
+        }
+
+
+write_behind_flusher = WriteBehindFlusher()
@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+
+from src.utils.event_pipeline import change_event_pipeline
+from src.utils.logger_utils import Log
+from src.utils.responses import dumps
+from src.utils.serialization import to_json_compatible
+from src.utils.settings import config
+
+
+log = Log()
+
+# Put in a subscriber queue to end its stream
+CLOSE = object()
+
+
+class Subscriber:
+    """
+    One connected client. Messages wait in a bounded queue; when it is full
+    the client is too slow and, depending on the policy, the oldest message
+    is dropped or the client is disconnected.
+    """
+
+    __slots__ = ("id", "product_ids", "queue", "policy", "dropped", "closed")
+
+    def __init__(self, subscriber_id, product_ids, queue_size, policy):
+        self.id = subscriber_id
+        self.product_ids = product_ids
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, message):
+        """
+        Queue a message without waiting.
+        :return: False when the message was dropped or the subscriber closed.
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        self.dropped += 1
+        if self.policy == "disconnect":
+            self.close()
+            return False
+        self.queue.get_nowait()
+        self.queue.put_nowait(message)
+        return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Make room for the close marker, pending messages are discarded
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSE)
+
+    async def next_message(self, timeout):
+        """
+        :return: The next message, CLOSE, or None when nothing arrived within timeout.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ChangeBroadcaster:
+    """
+    Fans product change events out to the connected subscribers.
+    It is registered as a handler of the change event pipeline, so every
+    subscriber is fed by the single shared change stream consumer. Each event
+    is serialized once and the same bytes are queued to every subscriber
+    interested in the product.
+    """
+
+    def __init__(self, settings=None, pipeline=None):
+        self.settings = settings or config["broadcast"]
+        self.pipeline = pipeline or change_event_pipeline
+        self.pipeline.register(self.handle)
+        self.ids = itertools.count(1)
+        self.subscribers = {}
+        self.by_product = {}
+        self.all_products = set()
+        self.messages_total = 0
+        self.deliveries_total = 0
+        self.dropped_total = 0
+        self.disconnected_total = 0
+
+    def subscribe(self, product_ids=None):
+        """
+        Register a subscriber.
+        :param product_ids: Only receive changes of these products (documentKey _id),
+            every change when empty.
+        :return: The Subscriber, or None when max_subscribers are already connected.
+        """
+        if len(self.subscribers) >= self.settings["max_subscribers"]:
+            return None
+        product_ids = frozenset(product_ids or ())
+        subscriber = Subscriber(next(self.ids), product_ids, self.settings["queue_size"], self.settings["slow_consumer"])
+        self.subscribers[subscriber.id] = subscriber
+        if product_ids:
+            for product_id in product_ids:
+                self.by_product.setdefault(product_id, set()).add(subscriber)
+        else:
+            self.all_products.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if self.subscribers.pop(subscriber.id, None) is None:
+            return
+        self.all_products.discard(subscriber)
+        for product_id in subscriber.product_ids:
+            subscribers = self.by_product.get(product_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.by_product[product_id]
+
+    @staticmethod
+    def message_for(change):
+        document_key = change.get("documentKey") or {}
+        update = change.get("updateDescription") or {}
+        message = {
+            "operation": change.get("operationType"),
+            "id": str(document_key["_id"]) if "_id" in document_key else None,
+            "updated_fields": update.get("updatedFields"),
+            "removed_fields": update.get("removedFields"),
+            "document": change.get("fullDocument")
+        }
+        return dumps(to_json_compatible(message))
+
+    async def handle(self, changes):
+        for change in changes:
+            if not self.subscribers:
+                return
+            message = None
+            document_key = change.get("documentKey") or {}
+            targets = self.all_products
+            if "_id" in document_key:
+                interested = self.by_product.get(str(document_key["_id"]))
+                if interested:
+                    targets = targets | interested
+            else:
+                # Collection wide events (drop, rename, ...) go to everyone
+                targets = self.subscribers.values()
+            for subscriber in list(targets):
+                if message is None:
+                    message = self.message_for(change)
+                    self.messages_total += 1
+                if subscriber.offer(message):
+                    self.deliveries_total += 1
+                else:
+                    self.dropped_total += 1
+                    if subscriber.closed:
+                        self.disconnected_total += 1
+                        log.logger.warning("Slow change stream subscriber disconnected", subscriber=subscriber.id)
+                        self.unsubscribe(subscriber)
+
+    def close_all(self):
+        """
+        End every subscriber stream, used on shutdown.
+        """
+        for subscriber in list(self.subscribers.values()):
+            subscriber.close()
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "max_subscribers": self.settings["max_subscribers"],
+            "messages_total": self.messages_total,
+            "deliveries_total": self.deliveries_total,
+            "dropped_total": self.dropped_total,
+            "disconnected_total": self.disconnected_total
+        }
+
+
+change_broadcaster = ChangeBroadcaster()
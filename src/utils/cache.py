@@ -0,0 +1,155 @@
+import time
+from collections import OrderedDict
+
+from src.utils.settings import config
+
+
+class ProductCache:
+    """
+    In-process read-through cache of ms-product responses keyed by product id.
+    Entries are evicted by LRU order once max_size is reached and expire after
+    ttl_seconds; the change stream invalidates them as soon as a product changes.
+    Every invalidation bumps the generation of the key, so a value read from
+    a backend before a change and stored after it is dropped instead of cached.
+    Change events carry the _id of the product while reads are keyed by its
+    id, so a value is stored with the _id it belongs to and invalidating the
+    _id invalidates that id as well.
+    """
+
+    # Change stream operations that make every cached entry untrustworthy
+    RESET_OPERATIONS = ("drop", "dropDatabase", "rename", "invalidate")
+
+    def __init__(self, max_size=None, ttl_seconds=None, enabled=None, clock=time.monotonic):
+        settings = config["cache"]
+        self.max_size = max_size if max_size is not None else settings["max_size"]
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings["ttl_seconds"]
+        self.enabled = enabled if enabled is not None else settings["enabled"]
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+        # key -> generation of its last invalidation, the last max_size keys
+        self.generations = OrderedDict()
+        self.version = 0
+        # Generation of every key not in generations
+        self.floor = 0
+        # _id -> id of the product cached under its id, the last max_size ones
+        self.aliases = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key_for(product):
+        """
+        Extract the cache key from a product payload.
+        :param product: The dict received in Product.product.
+        :return: The product id as a string, or None when it has no id.
+        """
+        product_id = product.get("id", product.get("_id"))
+        return str(product_id) if product_id is not None else None
+
+    def get(self, key):
+        if not self.enabled or key is None:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self):
+        """
+        Take before reading a key from a backend and pass to set() with the value.
+        """
+        return self.version
+
+    def invalidated_at(self, key):
+        return self.generations.get(key, self.floor)
+
+    def set(self, key, value, generation=None, primary=None):
+        """
+        :param generation: Taken with generation() before the value was read.
+        :param primary: The _id of the product when key is another id of it.
+        """
+        if not self.enabled or key is None:
+            return
+        if primary is not None and primary != key:
+            self.aliases[primary] = key
+            self.aliases.move_to_end(primary)
+            if len(self.aliases) > self.max_size:
+                self.aliases.popitem(last=False)
+        if generation is not None and (self.invalidated_at(key) > generation or
+                                       (primary is not None and self.invalidated_at(primary) > generation)):
+            # The key changed while the value was being read
+            self.stale_fills += 1
+            return
+        self.entries[key] = (self.clock() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+        self.version += 1
+        self.generations[key] = self.version
+        self.generations.move_to_end(key)
+        if len(self.generations) > self.max_size:
+            # Forgotten keys take the newest generation dropped, so a read in
+            # flight for them is dropped too rather than kept stale
+            _, self.floor = self.generations.popitem(last=False)
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.version += 1
+        self.floor = self.version
+        self.generations.clear()
+        self.aliases.clear()
+
+    def apply_change(self, change):
+        """
+        Keep the cache coherent with a change stream event.
+        :param change: The change document emitted by collection.watch().
+        """
+        operation = change.get("operationType")
+        if operation in self.RESET_OPERATIONS:
+            self.clear()
+            return
+        document_key = change.get("documentKey") or {}
+        if "_id" in document_key:
+            primary = str(document_key["_id"])
+            self.invalidate(primary)
+            if primary in self.aliases:
+                self.invalidate(self.aliases[primary])
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_fills": self.stale_fills
+        }
+
+
+product_cache = ProductCache()
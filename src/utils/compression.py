@@ -0,0 +1,218 @@
+import asyncio
+import gzip
+
+from src.utils.cache import ProductCache
+from src.utils.responses import encoded_etag
+from src.utils.settings import config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the installed extras
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the installed extras
+    zstandard = None
+
+
+def _gzip(body, level):
+    # mtime=0 keeps the output stable, so equal bodies compress to equal bytes
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(body, level):
+    return brotli.compress(body, quality=level)
+
+
+def _zstd(body, level):
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+# Content-Encoding -> compress(body, level), for the codecs installed,
+# a subset of responses.CONTENT_ENCODINGS
+CODECS = {"gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = _brotli
+if zstandard is not None:
+    CODECS["zstd"] = _zstd
+
+# Media types worth compressing; streams (NDJSON export, SSE) are left alone
+COMPRESSIBLE_TYPES = (b"application/json", b"text/plain")
+
+
+def negotiate(accept_encoding, preference):
+    """
+    Pick the Content-Encoding for an Accept-Encoding header.
+    :param accept_encoding: Header value, e.g. "gzip;q=0.8, br".
+    :param preference: Encodings the server may use, preferred first.
+    :return: The encoding with the highest q-value (ties go to the server
+        preference), or None when no compression is acceptable.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in preference:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class ResponseCompression:
+    """
+    Compression of JSON responses with the encoding negotiated from
+    Accept-Encoding. Bodies of offload_min_size bytes or more are compressed
+    in a worker thread so the event loop keeps serving other requests.
+    Compressed bodies of responses with an ETag (cached products) are kept by
+    ETag and encoding, so hot products are only compressed once.
+    """
+
+    def __init__(self, settings=None, ttl_seconds=None):
+        self.settings = settings or config["compression"]
+        self.preference = [encoding for encoding in self.settings["encodings"] if encoding in CODECS]
+        self.levels = {"gzip": self.settings["gzip_level"], "br": self.settings["brotli_quality"],
+                       "zstd": self.settings["zstd_level"]}
+        self.variants = ProductCache(self.settings["variants_cache_size"], ttl_seconds, True)
+        self.compressed_total = 0
+        self.offloaded_total = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encoding_for(self, scope):
+        if not self.settings["enabled"]:
+            return None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                return negotiate(value.decode("latin-1"), self.preference)
+        return None
+
+    async def compress(self, body, encoding, etag=None):
+        key = (etag, encoding) if etag is not None else None
+        compressed = self.variants.get(key)
+        if compressed is None:
+            codec = CODECS[encoding]
+            if len(body) >= self.settings["offload_min_size"]:
+                self.offloaded_total += 1
+                compressed = await asyncio.to_thread(codec, body, self.levels[encoding])
+            else:
+                compressed = codec(body, self.levels[encoding])
+            self.variants.set(key, compressed)
+        self.compressed_total += 1
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+        return compressed
+
+    def stats(self):
+        return {
+            "enabled": self.settings["enabled"],
+            "encodings": self.preference,
+            "compressed_total": self.compressed_total,
+            "offloaded_total": self.offloaded_total,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "variants": self.variants.stats()
+        }
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware applying ResponseCompression. Bodies below min_size,
+    streamed bodies and responses that already have a Content-Encoding
+    (e.g. the gzip export) are sent as they are. A compressed body gets the
+    strong ETag of its encoding, which a 304 repeats when the client
+    revalidates with it.
+    """
+
+    def __init__(self, app, compression):
+        self.app = app
+        self.compression = compression
+
+    async def __call__(self, scope, receive, send):
+        encoding = self.compression.encoding_for(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        if_none_match = next((value for name, value in scope["headers"] if name == b"if-none-match"), b"")
+        await self.app(scope, receive, ResponseCompressor(self.compression, encoding, send, if_none_match))
+
+
+class ResponseCompressor:
+    """
+    send() wrapper of one response: holds the start message back until the
+    body shows whether it is worth compressing.
+    """
+
+    def __init__(self, compression, encoding, send, if_none_match=b""):
+        self.compression = compression
+        self.encoding = encoding
+        self.send = send
+        self.if_none_match = if_none_match
+        self.start = None
+        self.passthrough = False
+
+    def encoded_etag(self, etag):
+        return encoded_etag(etag.decode("latin-1"), self.encoding).encode("latin-1")
+
+    def not_modified(self, message):
+        # Repeat the ETag of the compressed body the client revalidated with
+        headers = message.get("headers", [])
+        etag = next((value for name, value in headers if name == b"etag"), None)
+        if etag is None or etag.startswith(b"W/"):
+            return message
+        encoded = self.encoded_etag(etag)
+        if encoded not in [tag.strip().removeprefix(b"W/") for tag in self.if_none_match.split(b",")]:
+            return message
+        return {**message, "headers": [(name, encoded if name == b"etag" else value) for name, value in headers]}
+
+    async def __call__(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            if message.get("status") == 304:
+                self.passthrough = True
+                await self.send(self.not_modified(message))
+                return
+            headers = dict(message.get("headers", []))
+            content_type = headers.get(b"content-type", b"")
+            if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        body = message.get("body", b"")
+        if message.get("more_body", False) or len(body) < self.compression.settings["min_size"]:
+            # Streamed or small: not worth it
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+        headers = [(name, value) for name, value in self.start.get("headers", [])
+                   if name not in (b"content-length", b"vary")]
+        vary = [value for name, value in self.start.get("headers", []) if name == b"vary"]
+        etag = next((value for name, value in headers if name == b"etag"), None)
+        if etag is not None and etag.startswith(b"W/"):
+            etag = None
+        compressed = await self.compression.compress(body, self.encoding, etag)
+        if etag is not None:
+            headers = [(name, self.encoded_etag(etag) if name == b"etag" else value) for name, value in headers]
+        headers += [
+            (b"content-encoding", self.encoding.encode("latin-1")),
+            (b"content-length", str(len(compressed)).encode("latin-1")),
+            (b"vary", b", ".join(vary + [b"Accept-Encoding"]))
+        ]
+        await self.send({**self.start, "headers": headers})
+        await self.send({"type": "http.response.body", "body": compressed})
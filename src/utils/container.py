@@ -0,0 +1,211 @@
+import asyncio
+import signal
+import threading
+from contextlib import asynccontextmanager
+
+from fastapi import Depends
+from starlette.requests import HTTPConnection
+
+from src.controllers.bulk_products_controllers import GetProductsBulk
+from src.controllers.export_products_controllers import ExportProducts
+from src.controllers.get_products_controllers import GetProducts
+from src.controllers.list_products_controllers import ListProducts
+from src.controllers.stock_controllers import StockLedger
+from src.controllers.update_products_controllers import UpdateProducts
+from src.repository.mongo_client import mongo_client as default_mongo_client
+from src.repository.products_repository import ProductsRepository
+from src.services.products_event_services import products_event_service as default_products_event_service
+from src.services.reservation_reaper_services import reservation_reaper as default_reservation_reaper
+from src.services.write_behind_services import write_behind_flusher as default_write_behind_flusher
+from src.utils.broadcaster import change_broadcaster
+from src.utils.cache import product_cache
+from src.utils.compression import ResponseCompression
+from src.utils.event_bus import change_event_bus
+from src.utils.events import EventHandler
+from src.utils.http_client import upstream_client as default_upstream_client
+from src.utils.leadership import LeaderElection
+from src.utils.lifecycle import HealthProbe, Lifecycle
+from src.utils.single_flight import upstream_single_flight
+from src.utils.snapshot import catalogue_snapshot
+from src.utils.settings import config
+
+
+class Container:
+    """
+    Application container.
+    Builds the shared resources and the controllers once, when the app is
+    created, and is kept in app.state. Routes get them through the FastAPI
+    dependencies below, so tests can pass their own pieces to the container
+    or override a dependency with app.dependency_overrides.
+    """
+
+    def __init__(self, settings=None, upstream_client=None, cache=None, single_flight=None, mongo_client=None,
+                 repository=None, products_event_service=None, reservation_reaper=None, broadcaster=None, election=None, event_bus=None, lifecycle=None,
+                 write_behind_flusher=None, compression=None, snapshot=None):
+        self.settings = settings or config
+        self.upstream_client = upstream_client or default_upstream_client
+        self.cache = cache if cache is not None else product_cache
+        self.single_flight = single_flight or upstream_single_flight
+        self.mongo_client = mongo_client or default_mongo_client
+        self.repository = repository or ProductsRepository(self.mongo_client)
+        self.products_event_service = products_event_service or default_products_event_service
+        if self.products_event_service.repository is None:
+            self.products_event_service.repository = self.repository
+        self.snapshot = snapshot or catalogue_snapshot
+        if self.snapshot.repository is None:
+            self.snapshot.repository = self.repository
+        if self.snapshot.cache is None:
+            self.snapshot.cache = self.cache
+        if self.snapshot.source is None:
+            self.snapshot.source = self.products_event_service
+        if self.products_event_service.snapshot is None:
+            self.products_event_service.snapshot = self.snapshot
+        self.reservation_reaper = reservation_reaper or default_reservation_reaper
+        if self.reservation_reaper.repository is None:
+            self.reservation_reaper.repository = self.repository
+        self.broadcaster = broadcaster or change_broadcaster
+        self.election = election or LeaderElection(self.repository, self.settings["deployment"])
+        self.event_bus = event_bus or change_event_bus
+        if self.event_bus.repository is None:
+            self.event_bus.repository = self.repository
+        # Changes watched by the leader reach the other workers through the bus
+        # The snapshot first, so the cache is not refilled from its previous body
+        self.event_bus.subscribe(self.snapshot.apply)
+        self.event_bus.subscribe(self.products_event_service.apply_to_cache)
+        self.event_bus.subscribe(self.broadcaster.handle)
+        self.update_products = UpdateProducts(client=self.upstream_client, repository=self.repository,
+                                              settings=self.settings["write_behind"])
+        self.write_behind_flusher = write_behind_flusher or default_write_behind_flusher
+        if self.write_behind_flusher.repository is None:
+            self.write_behind_flusher.repository = self.repository
+        if self.write_behind_flusher.updates is None:
+            self.write_behind_flusher.updates = self.update_products
+        self.event_handler = EventHandler(self.products_event_service, self.repository, self.reservation_reaper,
+                                          self.election, self.event_bus, self.write_behind_flusher, self.snapshot)
+
+        self.get_products = GetProducts(
+            client=self.upstream_client,
+            cache=self.cache,
+            single_flight=self.single_flight,
+            repository=self.repository,
+            settings=self.settings["read_path"],
+            snapshot=self.snapshot
+        )
+        self.get_products_bulk = GetProductsBulk(products=self.get_products, settings=self.settings["bulk"])
+        self.export_products = ExportProducts(repository=self.repository, settings=self.settings["export"])
+        self.list_products = ListProducts(repository=self.repository, settings=self.settings["listing"])
+        self.stock_ledger = StockLedger(repository=self.repository, settings=self.settings["inventory"])
+
+        lifecycle_settings = self.settings["lifecycle"]
+        self.lifecycle = lifecycle or Lifecycle(lifecycle_settings, [
+            HealthProbe("mongo", self.mongo_client.ping, lifecycle_settings["probe_ttl"],
+                        lifecycle_settings["probe_timeout"]),
+            HealthProbe("ms_product", self.upstream_client.ping, lifecycle_settings["probe_ttl"],
+                        lifecycle_settings["probe_timeout"]),
+            HealthProbe("indexes", self.event_handler.check_indexes, lifecycle_settings["probe_ttl"],
+                        lifecycle_settings["probe_timeout"])
+        ])
+
+        self.compression = compression or ResponseCompression(self.settings["compression"],
+                                                              self.settings["cache"]["ttl_seconds"])
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        await self.startup()
+        try:
+            yield
+        finally:
+            await self.shutdown()
+
+    def warm_up_steps(self):
+        """
+        Coroutines run before the service reports ready: open the first pooled
+        connections and load the configured products into the cache.
+        """
+        steps = [("mongo", self.mongo_client.ping()), ("ms_product", self.upstream_client.ping())]
+        product_ids = self.settings["lifecycle"]["warmup_product_ids"]
+        if product_ids:
+            steps.append(("cache", self.get_products_bulk.get_products(product_ids)))
+        return steps
+
+    def install_signal_handlers(self):
+        """
+        Start draining as soon as the process is asked to stop. On SIGTERM
+        uvicorn closes its listeners and waits for the open connections before
+        the lifespan shutdown runs, so readiness and the change streams must
+        not wait for it. The handler runs before the one uvicorn installed.
+        """
+        # Signals can only be handled in the main thread (not under TestClient)
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.begin_drain)
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    def begin_drain(self):
+        if self.lifecycle.draining:
+            return
+        self.lifecycle.drain()
+        # Streaming responses only end once their subscribers are closed
+        self.broadcaster.close_all()
+
+    async def startup(self):
+        self.install_signal_handlers()
+        await self.mongo_client.start()
+        await self.upstream_client.start()
+        # Before the watcher starts, so it resumes from the snapshot position
+        self.snapshot.load()
+        await self.event_handler.startup_event()
+        await self.lifecycle.warm_up(self.warm_up_steps())
+
+    async def shutdown(self):
+        self.begin_drain()
+        await self.lifecycle.wait_idle()
+        await self.event_handler.shutdown_event()
+        await self.upstream_client.close()
+        await self.mongo_client.close()
+        self.lifecycle.stopped()
+
+
+def get_container(connection: HTTPConnection):
+    # HTTPConnection so websocket routes can use the container too
+    return connection.app.state.container
+
+
+def get_products_controller(container: Container = Depends(get_container)):
+    return container.get_products
+
+
+def get_products_bulk_controller(container: Container = Depends(get_container)):
+    return container.get_products_bulk
+
+
+def get_update_products_controller(container: Container = Depends(get_container)):
+    return container.update_products
+
+
+def get_export_products_controller(container: Container = Depends(get_container)):
+    return container.export_products
+
+
+def get_list_products_controller(container: Container = Depends(get_container)):
+    return container.list_products
+
+
+def get_stock_controller(container: Container = Depends(get_container)):
+    return container.stock_ledger
+
+
+def get_broadcaster(container: Container = Depends(get_container)):
+    return container.broadcaster
+
+
+def get_lifecycle(container: Container = Depends(get_container)):
+    return container.lifecycle
@@ -14,8 +14,11 @@ class ErrorHandler:
         :param error: The exception that occurred.
         :param message: A custom message to log.
         """
-        log.logger.error(f"{message}: {str(error)}")
-        log.logger.error(f"Error trace: {traceback.format_exc()}")
+        if isinstance(error, HTTPException):
+            # Already handled further down the stack, keep its status code
+            log.logger.error(message, error=error.detail)
+            raise error
+        log.logger.error(message, error=error, trace=traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(error)) from error
     
 
@@ -26,8 +29,7 @@ class ErrorHandler:
         :param error: The validation exception that occurred.
         :param message: A custom message to log.
         """
-        log.logger.error(f"{message}: {str(error)}")
-        log.logger.error(f"Error trace: {traceback.format_exc()}")
+        log.logger.error(message, error=error, trace=traceback.format_exc())
         raise HTTPException(status_code=422, detail=str(error)) from error
     
 
@@ -39,7 +41,7 @@ class ErrorHandler:
         :param resource_id: The ID of the resource that was not found.
         :param message: A custom message to log.
         """
-        log.logger.error(f"{message}: {resource} with ID {resource_id} not found")
+        log.logger.error(message, resource=resource, resource_id=resource_id)
         raise HTTPException(status_code=404, detail=f"{resource} with ID {resource_id} not found")
     
 
@@ -61,4 +63,13 @@ class ErrorHandler:
         """
         log.logger.error(message)
         raise HTTPException(status_code=408, detail=message)
-    
+
+
+    @staticmethod
+    def handle_conflict_error(message: str = "Request conflicts with the current state"):
+        """
+        Handle conflicts with the current state of a resource by logging them and raising an HTTPException.
+        :param message: A custom message to log.
+        """
+        log.logger.error(message)
+        raise HTTPException(status_code=409, detail=message)
@@ -0,0 +1,147 @@
+import asyncio
+
+from src.repository.products_repository import ProductsRepository
+from src.utils.event_pipeline import change_event_pipeline
+from src.utils.leadership import WORKER_ID
+from src.utils.logger_utils import Log
+from src.utils.settings import config
+
+
+log = Log()
+
+# Change fields other workers need to update their caches and subscribers
+SHARED_FIELDS = ("operationType", "documentKey", "updateDescription", "fullDocument", "ns", "to")
+
+# Handled like a collection wide event by every consumer: caches and snapshots are dropped
+RESET_CHANGE = {"operationType": "invalidate"}
+
+
+class ChangeEventBus:
+    """
+    Fans change events out from the leader to every worker process.
+    Only the leader watches the change stream; its pipeline hands each batch
+    to publish(), which appends it to a capped collection. Every worker tails
+    that collection and passes the batches published by other workers to its
+    local consumers (cache invalidation, subscribers).
+    Entries are read in insertion order and the position is kept as the _id of
+    the last one read. When workers may have missed events (a batch the leader
+    could not publish, or the collection wrapped past a worker's position)
+    they receive an invalidate event and drop their derived state.
+    """
+
+    def __init__(self, repository=None, settings=None, pipeline=None, worker_id=WORKER_ID):
+        self.repository = repository
+        self.settings = settings or config["deployment"]
+        self.enabled = self.settings["leader_election"]
+        self.pipeline = pipeline or change_event_pipeline
+        self.pipeline.register(self.publish)
+        self.worker_id = worker_id
+        self.consumers = []
+        self.cursor = None
+        self.last_id = None
+        self.skipping = False
+        # A batch could not be published: the next entry starts with a reset
+        self.lost = False
+        self.stopping = False
+        self.published_total = 0
+        self.received_total = 0
+        self.resets_total = 0
+        self.errors_total = 0
+
+    def subscribe(self, consumer):
+        """
+        Add an async consumer receiving the batches published by other workers.
+        """
+        if consumer not in self.consumers:
+            self.consumers.append(consumer)
+        return consumer
+
+    async def publish(self, changes):
+        if not self.enabled:
+            return
+        shared = [{field: change[field] for field in SHARED_FIELDS if field in change} for change in changes]
+        if self.lost:
+            shared.insert(0, RESET_CHANGE)
+        try:
+            await self.repository.publish_events(self.worker_id, shared)
+        except Exception:
+            # The resume token still moves past this batch, so it is never sent again
+            self.lost = True
+            raise
+        self.lost = False
+        self.published_total += len(changes)
+
+    async def run(self):
+        self.stopping = False
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        log.logger.info("Starting change event bus", worker_id=self.worker_id)
+        opened = False
+        while not self.stopping:
+            try:
+                if not opened:
+                    await self.repository.ensure_event_bus(self.settings["bus_size_bytes"])
+                    # Only events published from now on are relevant
+                    self.last_id = await self.repository.last_event_bus_id()
+                    opened = True
+                await self.read()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors_total += 1
+                self.cursor = None
+                log.logger.error("Error reading change event bus", error=e)
+            # No new entries yet, or the cursor died (empty collection, wrapped past it)
+            await asyncio.sleep(self.settings["bus_poll_interval"])
+
+    async def read(self):
+        """
+        Deliver the entries added since the last call.
+        """
+        if self.cursor is None or not self.cursor.alive:
+            if self.last_id is not None and not await self.repository.has_event_bus_entry(self.last_id):
+                # Entries after our position may have been overwritten before we read them
+                log.logger.warning("Change event bus position lost", worker_id=self.worker_id)
+                await self.reset()
+                self.last_id = await self.repository.last_event_bus_id()
+            # A new cursor starts at the oldest entry: skip up to the last one read
+            self.cursor = self.repository.tail_event_bus()
+            self.skipping = self.last_id is not None
+        async for entry in self.cursor:
+            if self.skipping:
+                self.skipping = entry["_id"] != self.last_id
+                continue
+            self.last_id = entry["_id"]
+            if entry["origin"] != self.worker_id:
+                await self.deliver(entry["changes"])
+            if self.stopping:
+                break
+
+    async def reset(self):
+        self.resets_total += 1
+        await self.deliver([RESET_CHANGE])
+
+    async def deliver(self, changes):
+        self.received_total += len(changes)
+        for consumer in self.consumers:
+            try:
+                await consumer(changes)
+            except Exception as e:
+                self.errors_total += 1
+                log.logger.error("Error handling change events from the bus", error=e)
+
+    def stop(self):
+        self.stopping = True
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "worker_id": self.worker_id,
+            "published_total": self.published_total,
+            "received_total": self.received_total,
+            "resets_total": self.resets_total,
+            "errors_total": self.errors_total
+        }
+
+
+change_event_bus = ChangeEventBus()
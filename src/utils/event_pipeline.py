@@ -0,0 +1,204 @@
+import asyncio
+
+from src.utils.logger_utils import Log
+from src.utils.settings import config
+
+
+log = Log()
+
+
+class ChangeEventPipeline:
+    """
+    Stage between the change stream and its handlers.
+    Events go through a bounded queue (a full queue blocks the watcher, which
+    is our backpressure), are grouped in micro-batches by count or time window,
+    coalesced per documentKey and dispatched to a pool of workers. Events of the
+    same document always land on the same worker, so per-document order holds.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or config["event_pipeline"]
+        self.handlers = []
+        self.queue = None
+        self.shard_queues = []
+        self.tasks = []
+        self.next_batch_id = 0
+        self.pending_shards = {}
+        self.batch_tokens = {}
+        self.finished_batches = set()
+        self.committed_batch_id = -1
+        self.committed_token = None
+        self.events_total = 0
+        self.events_coalesced = 0
+        self.batches_total = 0
+        self.batch_size_last = 0
+        self.batch_size_max = 0
+        self.batch_size_sum = 0
+        self.handler_errors = 0
+
+    def register(self, handler):
+        """
+        Add an async handler receiving every coalesced batch of change events.
+        :param handler: Coroutine function taking a list of change documents.
+        """
+        self.handlers.append(handler)
+        return handler
+
+    @property
+    def started(self):
+        return bool(self.tasks)
+
+    async def start(self):
+        if self.started:
+            return
+        self.queue = asyncio.Queue(maxsize=self.settings["queue_size"])
+        self.shard_queues = [asyncio.Queue(maxsize=2) for _ in range(self.settings["workers"])]
+        self.tasks = [asyncio.create_task(self._batcher())]
+        self.tasks += [asyncio.create_task(self._worker(shard)) for shard in self.shard_queues]
+
+    async def put(self, change, resume_token=None):
+        """
+        Enqueue a change event, waiting while the queue is full.
+        :param change: The change document emitted by collection.watch().
+        :param resume_token: Stream position right after this event.
+        """
+        await self.queue.put((change, resume_token))
+
+    async def stop(self, timeout=10.0):
+        """
+        Drain queued events (up to timeout seconds) and stop the workers.
+        """
+        if not self.started:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            log.logger.warning("Event pipeline stopped before draining", queue_depth=self.queue.qsize())
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _drain(self):
+        await self.queue.join()
+        for shard in self.shard_queues:
+            await shard.join()
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.settings["batch_window"]
+            while len(batch) < self.settings["batch_size"]:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._dispatch(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    @staticmethod
+    def document_key(change):
+        document_key = change.get("documentKey") or {}
+        return str(document_key["_id"]) if "_id" in document_key else None
+
+    def coalesce(self, batch):
+        """
+        Keep one event per document, merging consecutive update descriptions.
+        :param batch: List of (change, resume_token) tuples in stream order.
+        :return: Coalesced list of change documents in order of last occurrence.
+        """
+        latest = {}
+        for position, (change, _) in enumerate(batch):
+            key = self.document_key(change)
+            if key is None:
+                latest[("event", position)] = change
+                continue
+            previous = latest.pop(key, None)
+            if previous is not None and previous.get("operationType") == "update" and change.get("operationType") == "update":
+                change = self._merge_updates(previous, change)
+            latest[key] = change
+        return list(latest.values())
+
+    @staticmethod
+    def _merge_updates(previous, change):
+        before = previous.get("updateDescription") or {}
+        after = change.get("updateDescription") or {}
+        updated = {**before.get("updatedFields", {}), **after.get("updatedFields", {})}
+        removed = [field for field in before.get("removedFields", []) if field not in updated]
+        removed += [field for field in after.get("removedFields", []) if field not in removed]
+        for field in removed:
+            updated.pop(field, None)
+        merged = dict(change)
+        merged["updateDescription"] = {**after, "updatedFields": updated, "removedFields": removed}
+        return merged
+
+    async def _dispatch(self, batch):
+        events = self.coalesce(batch)
+        batch_id = self.next_batch_id
+        self.next_batch_id += 1
+        self.events_total += len(batch)
+        self.events_coalesced += len(batch) - len(events)
+        self.batches_total += 1
+        self.batch_size_last = len(batch)
+        self.batch_size_max = max(self.batch_size_max, len(batch))
+        self.batch_size_sum += len(batch)
+        self.batch_tokens[batch_id] = batch[-1][1]
+
+        shards = {}
+        for change in events:
+            key = self.document_key(change)
+            index = hash(key) % len(self.shard_queues) if key is not None else 0
+            shards.setdefault(index, []).append(change)
+        self.pending_shards[batch_id] = len(shards)
+        for index, shard_events in shards.items():
+            await self.shard_queues[index].put((batch_id, shard_events))
+
+    async def _worker(self, shard):
+        while True:
+            batch_id, events = await shard.get()
+            try:
+                for handler in self.handlers:
+                    try:
+                        await handler(events)
+                    except Exception as e:
+                        self.handler_errors += 1
+                        log.logger.error("Error handling change events", error=e)
+            finally:
+                self._complete(batch_id)
+                shard.task_done()
+
+    def _complete(self, batch_id):
+        self.pending_shards[batch_id] -= 1
+        if self.pending_shards[batch_id] > 0:
+            return
+        del self.pending_shards[batch_id]
+        self.finished_batches.add(batch_id)
+        # Only advance the committed position over a contiguous run of batches
+        while self.committed_batch_id + 1 in self.finished_batches:
+            self.committed_batch_id += 1
+            self.finished_batches.remove(self.committed_batch_id)
+            token = self.batch_tokens.pop(self.committed_batch_id)
+            if token is not None:
+                self.committed_token = token
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.settings["queue_size"],
+            "worker_queue_depths": [shard.qsize() for shard in self.shard_queues],
+            "events_total": self.events_total,
+            "events_coalesced": self.events_coalesced,
+            "batches_total": self.batches_total,
+            "batch_size_last": self.batch_size_last,
+            "batch_size_max": self.batch_size_max,
+            "batch_size_avg": self.batch_size_sum / self.batches_total if self.batches_total else 0,
+            "handler_errors": self.handler_errors
+        }
+
+
+change_event_pipeline = ChangeEventPipeline()
@@ -1,15 +1,143 @@
 import asyncio
-from src.services.products_event_services import ProductsEventServices
+from src.services.products_event_services import products_event_service
+from src.services.reservation_reaper_services import reservation_reaper
+from src.services.write_behind_services import write_behind_flusher
+from src.repository.products_repository import ProductsRepository
 from src.utils.logger_utils import Log
+from src.utils.settings import config
+
+
+log = Log()
+
+# Wait between attempts to create the indexes and the stock validator
+INDEX_RETRY_SECONDS = 5.0
 
 
 class EventHandler:
-    def __init__(self):
-        self.log = Log()
-        self.products_event_service = ProductsEventServices()
+    """
+    Starts and stops the background tasks of the app.
+    With a single worker the change stream watcher, the reservation reaper
+    and the write-behind flusher run in the process. With leader election only the elected worker runs
+    them, while every worker reads the change events from the event bus.
+    The catalogue snapshot is written by the same worker as the watcher and
+    mapped again by the other workers each time it is rewritten.
+    Indexes and the stock validator are created before startup finishes;
+    when MongoDB refuses, they are retried and the process is not ready
+    until they exist.
+    """
+
+    def __init__(self, products_event_service=products_event_service, repository=None, reaper=reservation_reaper,
+                 election=None, event_bus=None, flusher=write_behind_flusher, snapshot=None):
+        self.products_event_service = products_event_service
+        self.repository = repository
+        self.reaper = reaper
+        self.election = election
+        self.event_bus = event_bus
+        self.flusher = flusher
+        self.snapshot = snapshot
+        self.watcher_task = None
+        self.reaper_task = None
+        self.flusher_task = None
+        self.snapshot_task = None
+        self.snapshot_follow_task = None
+        self.election_task = None
+        self.bus_task = None
+        self.indexes_task = None
+        self.indexes_ready = False
+        if self.leader_election:
+            self.election.on_elected.append(self.start_leader_tasks)
+            self.election.on_demoted.append(self.stop_leader_tasks)
+
+    @property
+    def leader_election(self):
+        return self.election is not None and self.event_bus is not None and self.event_bus.enabled
 
     async def startup_event(self):
-        self.log.logger.info("App iniciada, lanzando watcher de MongoDB")
-        asyncio.create_task(self.products_event_service.watch_changes())
+        log.logger.info("App iniciada, lanzando watcher de MongoDB")
+        # The stock guard relies on STOCK_VALIDATOR being in place
+        if not await self.ensure_indexes(config["lifecycle"]["warmup_timeout"]):
+            self.indexes_task = asyncio.create_task(self.retry_indexes())
+        if self.leader_election:
+            self.bus_task = asyncio.create_task(self.event_bus.run())
+            self.election_task = asyncio.create_task(self.election.run())
+            if self.snapshot is not None and self.snapshot.enabled:
+                self.snapshot_follow_task = asyncio.create_task(self.snapshot.follow())
+        else:
+            await self.start_leader_tasks()
+
+    async def start_leader_tasks(self):
+        self.watcher_task = asyncio.create_task(self.products_event_service.watch_changes())
+        self.reaper_task = asyncio.create_task(self.reaper.run())
+        if self.flusher is not None and self.flusher.settings["enabled"]:
+            self.flusher_task = asyncio.create_task(self.flusher.run())
+        if self.snapshot is not None and self.snapshot.enabled:
+            self.snapshot_task = asyncio.create_task(self.snapshot.run())
+
+    async def stop_leader_tasks(self):
+        self.products_event_service.stop()
+        self.reaper.stop()
+        await self._cancel(self.reaper_task)
+        self.reaper_task = None
+        if self.flusher is not None:
+            # Writes being flushed stay queued and are sent again by the next leader
+            self.flusher.stop()
+            await self._cancel(self.flusher_task)
+            self.flusher_task = None
+        snapshot_writer = self.snapshot_task is not None
+        if snapshot_writer:
+            self.snapshot.stop()
+            await self._cancel(self.snapshot_task)
+            self.snapshot_task = None
+        await self._cancel(self.watcher_task)
+        self.watcher_task = None
+        await self.products_event_service.pipeline.stop()
+        await self.products_event_service.flush_resume_token(force=True)
+        if snapshot_writer:
+            # Once the pipeline is drained, so the next leader resumes from the last event
+            await self.snapshot.flush()
+
+    async def ensure_indexes(self, timeout=None):
+        """
+        :return: Whether the indexes and the stock validator are in place.
+        """
+        try:
+            await asyncio.wait_for((self.repository or ProductsRepository()).ensure_indexes(), timeout)
+        except Exception as e:
+            log.logger.error("Error creating indexes", error=e)
+            return False
+        self.indexes_ready = True
+        return True
+
+    async def retry_indexes(self):
+        while not await self.ensure_indexes():
+            await asyncio.sleep(INDEX_RETRY_SECONDS)
+
+    async def check_indexes(self):
+        # Readiness probe
+        return self.indexes_ready
 
+    async def shutdown_event(self):
+        log.logger.info("App detenida, deteniendo watcher de MongoDB")
+        await self._cancel(self.indexes_task)
+        self.indexes_task = None
+        if self.leader_election:
+            await self._cancel(self.election_task)
+            self.election_task = None
+            # Hands the lease over and stops the leader tasks if this worker led
+            await self.election.stop()
+            self.event_bus.stop()
+            await self._cancel(self.bus_task)
+            self.bus_task = None
+            await self._cancel(self.snapshot_follow_task)
+            self.snapshot_follow_task = None
+        await self.stop_leader_tasks()
 
+    @staticmethod
+    async def _cancel(task):
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,251 @@
+import asyncio
+import random
+import time
+
+import httpx
+
+from src.utils.logger_utils import Log
+from src.utils.metrics import UPSTREAM_LATENCY
+from src.utils.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, RetryBudget
+from src.utils.settings import config
+
+
+log = Log()
+
+
+class UpstreamClient:
+    """
+    Application scoped HTTP client used for every call to ms-product.
+    A single connection pool is kept for the whole process so keep-alive
+    connections are reused between requests instead of opened per call.
+    Calls go through a per-endpoint circuit breaker, jittered retries limited
+    by a retry budget and, for idempotent reads, an optional hedged request.
+    """
+
+    def __init__(self, settings=None, transport=None):
+        self.settings = settings or config["ms_product"]
+        self.transport = transport
+        self.client = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.retries_total = 0
+        self.hedges_total = 0
+        self.breakers = {}
+        self.latencies = {}
+        self.latency_metrics = {}
+        self.retry_budget = RetryBudget(
+            ratio=self.settings["retry_budget_ratio"],
+            min_per_second=self.settings["retry_budget_min_per_second"]
+        )
+
+    def _http2_enabled(self):
+        if not self.settings["http2"]:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            log.logger.warning("HTTP/2 requested for ms-product but 'h2' is not installed, using HTTP/1.1")
+            return False
+        return True
+
+    def _build_client(self):
+        limits = httpx.Limits(
+            max_connections=self.settings["max_connections"],
+            max_keepalive_connections=self.settings["max_keepalive_connections"],
+            keepalive_expiry=self.settings["keepalive_expiry"]
+        )
+        timeout = httpx.Timeout(
+            self.settings["timeout"],
+            connect=self.settings["connect_timeout"],
+            read=self.settings["read_timeout"]
+        )
+        return httpx.AsyncClient(
+            base_url=self.settings["base_url"],
+            timeout=timeout,
+            limits=limits,
+            http2=self._http2_enabled(),
+            transport=self.transport,
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def start(self):
+        """
+        Create the pooled client. Called on application startup, and lazily
+        on first use when the startup hook did not run (e.g. in tests).
+        """
+        if self.client is None:
+            self.client = self._build_client()
+            log.logger.info("Upstream client started", base_url=self.settings["base_url"])
+        return self.client
+
+    async def close(self):
+        """
+        Close the pooled client and release every open connection.
+        """
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            log.logger.info("Upstream client closed")
+
+    async def ping(self):
+        """
+        GET the ms-product health path through the shared pool. It bypasses
+        the circuit breakers and retries so probes never change their state.
+        :return: True when ms-product answered with a status below 500.
+        """
+        client = await self.start()
+        response = await client.get(self.settings["health_path"])
+        return response.status_code < 500
+
+    def breaker_for(self, path):
+        breaker = self.breakers.get(path)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                path,
+                failure_threshold=self.settings["breaker_failure_threshold"],
+                reset_timeout=self.settings["breaker_reset_timeout"],
+                half_open_max_calls=self.settings["breaker_half_open_max_calls"]
+            )
+            self.breakers[path] = breaker
+        return breaker
+
+    def latency_for(self, path):
+        tracker = self.latencies.get(path)
+        if tracker is None:
+            tracker = LatencyTracker(min_samples=self.settings["hedge_min_samples"])
+            self.latencies[path] = tracker
+        return tracker
+
+    async def post(self, path, payload, idempotent=False):
+        """
+        Send a JSON POST to ms-product through the shared pool.
+        :param path: Path relative to the ms-product base url.
+        :param payload: JSON serializable body.
+        :param idempotent: Whether the call may be retried after it reached
+            ms-product (timeouts, 5xx) and hedged. Connection errors are always
+            retried since the request was never sent.
+        :return: The httpx response.
+        """
+        client = await self.start()
+        breaker = self.breaker_for(path)
+        if not breaker.allow():
+            raise CircuitOpenError(path)
+        self.requests_total += 1
+        self.retry_budget.deposit()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            attempt = 0
+            while True:
+                error = None
+                response = None
+                try:
+                    if idempotent and self.settings["hedge_enabled"]:
+                        response = await self._send_hedged(client, path, payload)
+                    else:
+                        response = await self._send(client, path, payload)
+                except httpx.TransportError as transport_error:
+                    error = transport_error
+                except asyncio.CancelledError:
+                    # Says nothing about ms-product, but must not keep the probe slot
+                    breaker.release()
+                    raise
+                except Exception:
+                    breaker.record_failure()
+                    raise
+                if error is None and response.status_code < 500:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                retryable = idempotent or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt >= self.settings["max_retries"] or not retryable or not self.retry_budget.can_retry():
+                    if error is not None:
+                        raise error
+                    return response
+                attempt += 1
+                self.retries_total += 1
+                await asyncio.sleep(self._backoff(attempt))
+                if not breaker.allow():
+                    raise CircuitOpenError(path)
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def _backoff(self, attempt):
+        ceiling = min(self.settings["retry_backoff_max"], self.settings["retry_backoff_base"] * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def _send(self, client, path, payload):
+        histogram = self.latency_metrics.get(path)
+        if histogram is None:
+            histogram = self.latency_metrics[path] = UPSTREAM_LATENCY.labels(path)
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+        finally:
+            elapsed = time.perf_counter() - started
+            histogram.observe(elapsed)
+        self.latency_for(path).record(elapsed)
+        return response
+
+    async def _send_hedged(self, client, path, payload):
+        """
+        Send the request and, if it is slower than the endpoint's recent latency
+        percentile, a second identical one; the first to succeed wins.
+        """
+        delay = self.latency_for(path).percentile(self.settings["hedge_percentile"])
+        first = asyncio.ensure_future(self._send(client, path, payload))
+        if delay is None:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not self.retry_budget.can_retry():
+            return await first
+        self.hedges_total += 1
+        second = asyncio.ensure_future(self._send(client, path, payload))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        return task.result()
+            return await first
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def breaker_states(self):
+        return {path: breaker.state for path, breaker in self.breakers.items()}
+
+    def stats(self):
+        """
+        Pool utilisation snapshot used to size the connection limits.
+        """
+        connections = []
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        if pool is not None:
+            connections = list(pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "started": self.client is not None,
+            "max_connections": self.settings["max_connections"],
+            "max_keepalive_connections": self.settings["max_keepalive_connections"],
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "retries_total": self.retries_total,
+            "hedges_total": self.hedges_total,
+            "retry_budget": self.retry_budget.stats(),
+            "circuit_breakers": {path: breaker.stats() for path, breaker in self.breakers.items()}
+        }
+
+
+upstream_client = UpstreamClient()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+
+from src.repository.products_repository import ProductsRepository
+from src.utils.logger_utils import Log
+from src.utils.settings import config
+
+
+log = Log()
+
+# Identifies this worker process in leases and event bus entries
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderElection:
+    """
+    Elects one worker among all the processes sharing the database through a
+    lease document. The leader renews its lease every lease_renew_interval;
+    when it stops doing so (crash, network split) the lease expires after
+    lease_ttl and another worker takes over. on_elected and on_demoted
+    callbacks start and stop the work only the leader must do.
+    """
+
+    LEASE_NAME = "products-change-stream"
+
+    def __init__(self, repository=None, settings=None, worker_id=WORKER_ID):
+        self.repository = repository
+        self.settings = settings or config["deployment"]
+        self.worker_id = worker_id
+        self.on_elected = []
+        self.on_demoted = []
+        self.is_leader = False
+        self.expires_at = None
+        self.stopping = False
+        self.elections_total = 0
+        self.errors_total = 0
+
+    async def run(self):
+        self.stopping = False
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        log.logger.info("Starting leader election", worker_id=self.worker_id)
+        while not self.stopping:
+            await self.campaign()
+            await asyncio.sleep(self.settings["lease_renew_interval"])
+
+    async def campaign(self):
+        """
+        Take or renew the lease once and switch role if it changed.
+        """
+        try:
+            expires_at = await self.repository.acquire_lease(self.LEASE_NAME, self.worker_id, self.settings["lease_ttl"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors_total += 1
+            log.logger.error("Error renewing leader lease", error=e)
+            # Keep leading only while the lease we hold is still valid
+            if self.is_leader and datetime.now(timezone.utc) >= self.expires_at:
+                await self._demote()
+            return
+        if expires_at is not None:
+            self.expires_at = expires_at
+            if not self.is_leader:
+                await self._elect()
+        elif self.is_leader:
+            await self._demote()
+
+    async def _elect(self):
+        self.is_leader = True
+        self.elections_total += 1
+        log.logger.info("Elected leader", worker_id=self.worker_id)
+        for callback in self.on_elected:
+            await callback()
+
+    async def _demote(self):
+        self.is_leader = False
+        log.logger.warning("Lost leadership", worker_id=self.worker_id)
+        for callback in self.on_demoted:
+            await callback()
+
+    async def stop(self):
+        """
+        Stop campaigning and hand the lease over right away.
+        """
+        self.stopping = True
+        if self.is_leader:
+            await self._demote()
+            try:
+                await self.repository.release_lease(self.LEASE_NAME, self.worker_id)
+            except Exception as e:
+                log.logger.error("Error releasing leader lease", error=e)
+
+    def stats(self):
+        return {
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "lease_expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "elections_total": self.elections_total,
+            "errors_total": self.errors_total
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from src.utils.logger_utils import Log
+from src.utils.responses import dumps
+from src.utils.settings import config
+
+
+log = Log()
+
+STARTING = "starting"
+READY = "ready"
+DRAINING = "draining"
+STOPPED = "stopped"
+
+
+class HealthProbe:
+    """
+    Checks one dependency and caches the result for ttl seconds, so frequent
+    health checks from the orchestrator do not add load on it. Concurrent
+    callers share the check in progress.
+    """
+
+    def __init__(self, name, check, ttl=5.0, timeout=2.0):
+        self.name = name
+        self.check = check
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lock = asyncio.Lock()
+        self.last = None
+        self.checked_at = None
+        self.checks_total = 0
+
+    def _fresh(self):
+        return self.checked_at is not None and time.monotonic() - self.checked_at < self.ttl
+
+    async def result(self):
+        if self._fresh():
+            return self.last
+        async with self.lock:
+            if not self._fresh():
+                self.last = await self._run()
+                self.checked_at = time.monotonic()
+        return self.last
+
+    async def _run(self):
+        self.checks_total += 1
+        started = time.perf_counter()
+        error = None
+        try:
+            if await asyncio.wait_for(self.check(), self.timeout) is False:
+                error = "unhealthy response"
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        return {
+            "status": "up" if error is None else "down",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "error": error
+        }
+
+
+class Lifecycle:
+    """
+    Tracks the state of the process (starting, ready, draining, stopped) and
+    the HTTP requests in flight. Readiness is only reported once warm-up is
+    done and while every dependency probe is up; on shutdown the process
+    stops being ready and waits for the requests in flight to finish.
+    """
+
+    def __init__(self, settings=None, probes=()):
+        self.settings = settings or config["lifecycle"]
+        self.probes = list(probes)
+        self.state = STARTING
+        self.in_flight = 0
+        self.rejected_total = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    @property
+    def draining(self):
+        return self.state in (DRAINING, STOPPED)
+
+    def request_started(self):
+        self.in_flight += 1
+        self.idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self.idle.set()
+
+    async def warm_up(self, steps):
+        """
+        Run the warm-up coroutines concurrently within warmup_timeout and mark
+        the process ready. A failed step is logged but does not block startup:
+        the readiness probes report the dependency that is still down.
+        """
+        self.state = STARTING
+        names = [name for name, _ in steps]
+        results = []
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(step for _, step in steps), return_exceptions=True),
+                self.settings["warmup_timeout"]
+            )
+        except asyncio.TimeoutError:
+            log.logger.warning("Warm-up timed out", timeout=self.settings["warmup_timeout"])
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                log.logger.warning("Warm-up step failed", step=name, error=result)
+        self.state = READY
+        log.logger.info("Service ready")
+
+    async def readiness(self):
+        """
+        :return: (ready, report) with the state and the cached probe results.
+        """
+        results = await asyncio.gather(*(probe.result() for probe in self.probes))
+        checks = {probe.name: result for probe, result in zip(self.probes, results)}
+        ready = self.ready and all(result["status"] == "up" for result in results)
+        return ready, {"status": "ready" if ready else "not_ready", "state": self.state, "checks": checks}
+
+    def drain(self):
+        """
+        Stop being ready: new requests are rejected from now on.
+        """
+        self.state = DRAINING
+        log.logger.info("Draining requests", in_flight=self.in_flight)
+
+    async def wait_idle(self):
+        """
+        Wait up to drain_timeout for the requests in flight to finish.
+        """
+        try:
+            await asyncio.wait_for(self.idle.wait(), self.settings["drain_timeout"])
+        except asyncio.TimeoutError:
+            log.logger.warning("Shutting down with requests in flight", in_flight=self.in_flight)
+
+    def stopped(self):
+        self.state = STOPPED
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "rejected_total": self.rejected_total,
+            "probes": {probe.name: probe.last for probe in self.probes}
+        }
+
+
+class DrainMiddleware:
+    """
+    ASGI middleware counting the HTTP requests in flight for the lifecycle.
+    While draining, new requests are answered with 503 and Connection: close
+    so load balancers and clients move to another instance.
+    """
+
+    REJECTED_BODY = dumps({"detail": "Service is shutting down"})
+
+    def __init__(self, app, lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.lifecycle.draining:
+            self.lifecycle.rejected_total += 1
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(self.REJECTED_BODY)).encode()),
+                    (b"connection", b"close"),
+                    (b"retry-after", b"1")
+                ]
+            })
+            await send({"type": "http.response.body", "body": self.REJECTED_BODY})
+            return
+        self.lifecycle.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.request_finished()
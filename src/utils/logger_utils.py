@@ -1,9 +1,161 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+
 import structlog
 
+from src.utils.settings import config
+
+
+class QueueLogger:
+    """
+    structlog logger that hands rendered lines to a background writer thread,
+    so writing to stdout never blocks the event loop. When the queue is full
+    the line is dropped and counted instead of waiting.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        self.stream = stream or sys.stdout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def msg(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    debug = info = warning = warn = error = critical = exception = fatal = failure = msg
+
+    def _write_loop(self):
+        while True:
+            message = self.queue.get()
+            try:
+                if message is None:
+                    break
+                self.stream.write(message + "\n")
+                if self.queue.empty():
+                    self.stream.flush()
+            except (OSError, ValueError):
+                # The stream was closed under us (e.g. at interpreter exit)
+                self.dropped += 1
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """
+        Block until every queued line has been written.
+        """
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def close(self, timeout=2.0):
+        """
+        Write the pending lines and stop the writer thread.
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+
+class EventSampler:
+    """
+    Processor keeping only a fraction of the high-volume info events listed in
+    the settings. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rate=1.0, events=(), rand=random.random):
+        self.rate = rate
+        self.events = frozenset(events)
+        self.rand = rand
+
+    def __call__(self, logger, method_name, event_dict):
+        if method_name in ("debug", "info") and event_dict.get("event") in self.events and self.rand() >= self.rate:
+            raise structlog.DropEvent
+        return event_dict
+
+
+class ValueTruncator:
+    """
+    Processor rendering key-value payloads only once the event is going to be
+    written, truncated to max_length characters. Tracebacks are kept whole:
+    the exception they end with is the line that matters.
+    """
+
+    KEEP = (bool, int, float, type(None))
+    UNTRUNCATED = ("trace", "exception")
+
+    def __init__(self, max_length=512):
+        self.max_length = max_length
+
+    def __call__(self, logger, method_name, event_dict):
+        for key, value in event_dict.items():
+            if isinstance(value, self.KEEP):
+                continue
+            text = value if isinstance(value, str) else repr(value)
+            if len(text) > self.max_length and key not in self.UNTRUNCATED:
+                text = f"{text[:self.max_length]}...({len(text)} chars)"
+            event_dict[key] = text
+        return event_dict
+
+
+_output = None
+
+
+def configure_logging(settings=None, stream=None):
+    """
+    Configure the process wide structlog pipeline. Events below the configured
+    level are filtered before any processor runs, so their key-value payloads
+    are never rendered.
+    :return: The QueueLogger lines are written to.
+    """
+    global _output
+    settings = settings or config["logging"]
+    if _output is None:
+        _output = QueueLogger(stream, settings["queue_size"])
+    else:
+        # Loggers already bound keep writing through the same queue
+        _output.stream = stream or sys.stdout
+    renderer = structlog.processors.JSONRenderer(serializer=json.dumps, default=str)
+    if settings["format"] == "console":
+        renderer = structlog.dev.ConsoleRenderer(colors=False)
+    structlog.configure(
+        processors=[
+            EventSampler(settings["sample_rate"], settings["sampled_events"]),
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            ValueTruncator(settings["max_value_length"]),
+            renderer
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(logging.getLevelName(settings["level"].upper())),
+        logger_factory=lambda *args: _output,
+        cache_logger_on_first_use=True
+    )
+    return _output
+
+
+def _close_output():
+    if _output is not None:
+        _output.close()
+
+
+atexit.register(_close_output)
+
 
 class Log:
-    
+    """
+    Access point to the shared structlog logger. Modules keep one instance
+    at module level; the pipeline is configured once per process.
+    """
+
     def __init__(self):
+        if _output is None:
+            configure_logging()
         self.structlog = structlog.get_logger()
         self.logger = self.structlog
-        
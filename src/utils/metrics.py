@@ -0,0 +1,224 @@
+import time
+from bisect import bisect_left
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        self.value += amount
+
+
+class GaugeChild(CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """
+    A metric family. Children are created once per label combination with
+    labels() and should be kept by the caller, so the hot path only touches
+    pre-bound objects and never builds label dicts.
+    """
+
+    kind = None
+    child_class = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.children = {}
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def samples(self):
+        for values, child in self.children.items():
+            yield self.name, values, child.value
+
+
+class Counter(Metric):
+    kind = "counter"
+    child_class = CounterChild
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    child_class = GaugeChild
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def samples(self):
+        for values, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                yield self.name + "_bucket", values + (bound,), cumulative
+            yield self.name + "_bucket", values + ("+Inf",), child.count
+            yield self.name + "_sum", values, child.sum
+            yield self.name + "_count", values, child.count
+
+
+class CallbackMetric:
+    """
+    Metric whose samples are read at scrape time from existing stats, so
+    components keep their plain counters and pay nothing per request.
+    """
+
+    def __init__(self, name, documentation, kind, label_names, callback):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.callback = callback
+
+    def samples(self):
+        for values, value in self.callback():
+            yield self.name, tuple(values), value
+
+
+class MetricsRegistry:
+    """
+    Holds every metric family and renders them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def callback(self, name, documentation, kind, label_names, callback):
+        return self._register(CallbackMetric(name, documentation, kind, label_names, callback))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, values, value in metric.samples():
+                label_names = metric.label_names
+                if name.endswith("_bucket"):
+                    label_names = label_names + ("le",)
+                lines.append(f"{name}{_format_labels(label_names, values)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "inventory_http_requests_total", "HTTP requests handled per route and status", ("method", "route", "status"))
+HTTP_LATENCY = registry.histogram(
+    "inventory_http_request_duration_seconds", "HTTP request latency per route", ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "inventory_http_requests_in_flight", "HTTP requests currently being handled per route", ("method", "route"))
+UPSTREAM_LATENCY = registry.histogram(
+    "inventory_upstream_request_duration_seconds", "Latency of ms-product calls per path", ("path",))
+WRITE_BEHIND_FLUSH_LATENCY = registry.histogram(
+    "inventory_write_behind_flush_latency_seconds", "Time from queueing a product update to its flush",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute recording count, latency and in-flight requests per route.
+    Metric children are bound once when the route handler is built.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        method = ",".join(sorted(self.methods))
+        latency = HTTP_LATENCY.labels(method, self.path)
+        in_flight = HTTP_IN_FLIGHT.labels(method, self.path)
+        by_status = {}
+
+        async def instrumented_handler(request):
+            in_flight.inc()
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as error:
+                status = error.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+                in_flight.dec()
+                counter = by_status.get(status)
+                if counter is None:
+                    counter = by_status[status] = HTTP_REQUESTS.labels(method, self.path, status)
+                counter.inc()
+
+        return instrumented_handler
@@ -0,0 +1,34 @@
+import base64
+
+import bson
+from bson.errors import BSONError
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised when a pagination cursor can not be decoded or belongs to another sort.
+    """
+
+
+def encode_cursor(sort_key, last_value, last_id):
+    """
+    Build the opaque cursor pointing right after a product.
+    Values are BSON encoded so ObjectIds, dates and decimals keep their type.
+    :return: URL safe base64 text.
+    """
+    raw = bson.encode({"s": sort_key, "v": last_value, "i": last_id})
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort_key):
+    """
+    Read a cursor built by encode_cursor.
+    :return: (last sort value, last _id).
+    """
+    try:
+        document = bson.decode(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (BSONError, ValueError) as error:
+        raise InvalidCursorError("Invalid cursor") from error
+    if document.get("s") != sort_key or "i" not in document:
+        raise InvalidCursorError(f"Cursor does not belong to a listing sorted by {sort_key}")
+    return document.get("v"), document["i"]
@@ -0,0 +1,144 @@
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is short-circuited because its endpoint breaker is open.
+    """
+
+    def __init__(self, name):
+        super().__init__(f"Circuit breaker open for {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for reset_timeout seconds, then lets half_open_max_calls probes through:
+    a successful probe closes it again, a failed one re-opens it. A probe that
+    ends without an answer (e.g. cancelled) gives its slot back with release().
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+        self.opened_total = 0
+
+    def allow(self):
+        """
+        Tell whether a call may go through, moving open breakers to half-open
+        once the reset timeout elapsed.
+        """
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.half_open_calls = 0
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and self.half_open_calls < self.half_open_max_calls:
+            self.half_open_calls += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def release(self):
+        """
+        Give back the half-open slot of a call that ended without an outcome.
+        """
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.opened_total += 1
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened_total": self.opened_total
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries (and hedged requests) to a fraction of the traffic.
+    Each request deposits `ratio` tokens, each retry spends one, and a floor of
+    min_per_second tokens keeps low-traffic services able to retry.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=5.0, clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.clock = clock
+        self.max_tokens = max(min_per_second * 10, 1.0)
+        self.tokens = self.max_tokens
+        self.updated_at = clock()
+        self.exhausted = 0
+
+    def _refill(self, amount):
+        now = self.clock()
+        amount += (now - self.updated_at) * self.min_per_second
+        self.updated_at = now
+        self.tokens = min(self.max_tokens, self.tokens + amount)
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def can_retry(self):
+        self._refill(0.0)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+    def stats(self):
+        return {"tokens": round(self.tokens, 2), "exhausted": self.exhausted}
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent latencies, used to pick the hedging delay.
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        """
+        :return: The latency at the given fraction, or None with too few samples.
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,134 @@
+import hashlib
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installed extras
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - depends on the installed extras
+    msgspec = None
+
+
+def dumps(content):
+    """
+    Serialize content to JSON bytes with the fastest available encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    if msgspec is not None:
+        return msgspec.json.encode(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw):
+    """
+    Parse JSON bytes with the fastest available decoder.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    if msgspec is not None:
+        return msgspec.json.decode(raw)
+    return json.loads(raw)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson (or msgspec) when installed, stdlib json otherwise.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """
+    Response for bodies that are already encoded JSON bytes.
+    """
+    media_type = "application/json"
+
+
+class ProductBody:
+    """
+    JSON body of a product response kept as the raw upstream bytes.
+    It is only decoded when a caller needs the data, so responses can be
+    passed through without a parse-then-dump cycle.
+    """
+
+    __slots__ = ("raw", "_data", "_etag")
+
+    _MISSING = object()
+
+    def __init__(self, raw, data=_MISSING):
+        self.raw = raw
+        self._data = data
+        self._etag = None
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(dumps(data), data)
+
+    @property
+    def data(self):
+        if self._data is ProductBody._MISSING:
+            self._data = loads(self.raw)
+        return self._data
+
+    def validate(self):
+        """
+        Check that the raw bytes are one JSON document before they are cached
+        or spliced into a response. The decoded data is not kept.
+        :raises ValueError: When the bytes are empty or not valid JSON.
+        """
+        if self._data is ProductBody._MISSING:
+            loads(self.raw)
+        return self
+
+    @property
+    def etag(self):
+        """
+        Strong ETag from a hash of the body. It is computed once and kept with
+        the cached body, which the change stream drops when the product changes.
+        """
+        if self._etag is None:
+            self._etag = '"' + hashlib.blake2b(self.raw, digest_size=16).hexdigest() + '"'
+        return self._etag
+
+
+# Content-Encodings the compression middleware may apply to a response
+CONTENT_ENCODINGS = ("gzip", "br", "zstd")
+
+
+def encoded_etag(etag, encoding):
+    """
+    Strong ETag of a body compressed with encoding. It must differ from the
+    ETag of the identity body (RFC 9110, 8.8.3), so the encoding is appended.
+    """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header matches the ETag (weak comparison). The
+    ETags of the compressed representations of the body match as well.
+    :param if_none_match: Header value, "*" or a comma separated list of tags.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == "*" or tag == etag or any(tag == encoded_etag(etag, encoding) for encoding in CONTENT_ENCODINGS):
+            return True
+    return False
+
+
+def result_envelope(raw):
+    """
+    Splice already encoded JSON into the {"result": ...} envelope of the API.
+    :param raw: JSON bytes of the result.
+    """
+    return b'{"result":' + raw + b'}'
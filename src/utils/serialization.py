@@ -0,0 +1,25 @@
+from datetime import datetime
+from decimal import Decimal
+
+from bson import ObjectId, Decimal128
+
+
+def to_json_compatible(value):
+    """
+    Convert a Mongo document (or any nested value) into JSON serializable types.
+    :param value: Document, list or scalar read through Motor.
+    :return: The same structure with ObjectId, datetime and decimals as strings.
+    """
+    if isinstance(value, dict):
+        return {key: to_json_compatible(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_compatible(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
@@ -3,6 +3,11 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_bool(name, default="false"):
+  return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 # Configuración de entorno
 config = {
   "local": {
@@ -15,12 +20,160 @@ config = {
     "jwt_secret_key": os.getenv("JWT_SECRET_KEY"),
     "jwt_refresh_secret_key": os.getenv("JWT_REFRESH_SECRET_KEY"),
     "access_token_expire_minutes": os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"),
-    "refresh_token_expire_minutes": os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES")
+    "refresh_token_expire_minutes": os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES"),
+    "max_pool_size": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "min_pool_size": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "max_idle_time_ms": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+    "read_preference": os.getenv("MONGO_READ_PREFERENCE", "secondaryPreferred"),
+    "write_concern": os.getenv("MONGO_WRITE_CONCERN", "majority"),
+    "write_concern_timeout_ms": int(os.getenv("MONGO_WRITE_CONCERN_TIMEOUT_MS", "5000"))
   },
   "development": {
     "connection": os.getenv("URI_DB_MONGO_DEV")
   },
   "test": {
     "connection" : os.getenv("URI_DB_MONGO_TEST")
+  },
+  "ms_product": {
+    "base_url": os.getenv("MS_PRODUCT_URL", "http://ms-product:8000"),
+    "timeout": float(os.getenv("MS_PRODUCT_TIMEOUT", "30.0")),
+    "max_connections": int(os.getenv("MS_PRODUCT_MAX_CONNECTIONS", "100")),
+    "max_keepalive_connections": int(os.getenv("MS_PRODUCT_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    "keepalive_expiry": float(os.getenv("MS_PRODUCT_KEEPALIVE_EXPIRY", "30.0")),
+    "http2": _env_bool("MS_PRODUCT_HTTP2"),
+    "connect_timeout": float(os.getenv("MS_PRODUCT_CONNECT_TIMEOUT", "2.0")),
+    "read_timeout": float(os.getenv("MS_PRODUCT_READ_TIMEOUT", "10.0")),
+    "max_retries": int(os.getenv("MS_PRODUCT_MAX_RETRIES", "2")),
+    "retry_backoff_base": float(os.getenv("MS_PRODUCT_RETRY_BACKOFF_BASE", "0.05")),
+    "retry_backoff_max": float(os.getenv("MS_PRODUCT_RETRY_BACKOFF_MAX", "1.0")),
+    "retry_budget_ratio": float(os.getenv("MS_PRODUCT_RETRY_BUDGET_RATIO", "0.2")),
+    "retry_budget_min_per_second": float(os.getenv("MS_PRODUCT_RETRY_BUDGET_MIN_PER_SECOND", "5")),
+    "breaker_failure_threshold": int(os.getenv("MS_PRODUCT_BREAKER_FAILURE_THRESHOLD", "5")),
+    "breaker_reset_timeout": float(os.getenv("MS_PRODUCT_BREAKER_RESET_TIMEOUT", "30.0")),
+    "breaker_half_open_max_calls": int(os.getenv("MS_PRODUCT_BREAKER_HALF_OPEN_MAX_CALLS", "1")),
+    "hedge_enabled": _env_bool("MS_PRODUCT_HEDGE_ENABLED"),
+    "hedge_percentile": float(os.getenv("MS_PRODUCT_HEDGE_PERCENTILE", "0.95")),
+    "hedge_min_samples": int(os.getenv("MS_PRODUCT_HEDGE_MIN_SAMPLES", "20")),
+    # Probed with a GET by the readiness check, any status below 500 is healthy
+    "health_path": os.getenv("MS_PRODUCT_HEALTH_PATH", "/health")
+  },
+  "cache": {
+    "enabled": _env_bool("PRODUCT_CACHE_ENABLED", "true"),
+    "max_size": int(os.getenv("PRODUCT_CACHE_MAX_SIZE", "10000")),
+    "ttl_seconds": float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "300"))
+  },
+  "deployment": {
+    "workers": int(os.getenv("INVENTORY_WORKERS", "1")),
+    "host": os.getenv("INVENTORY_HOST", "0.0.0.0"),
+    "port": int(os.getenv("INVENTORY_PORT", "8001")),
+    # Leader election is needed as soon as more than one worker runs
+    "leader_election": _env_bool("LEADER_ELECTION", "true" if int(os.getenv("INVENTORY_WORKERS", "1")) > 1 else "false"),
+    "lease_collection": os.getenv("LEADER_LEASE_COLLECTION", "leader_leases"),
+    "lease_ttl": float(os.getenv("LEADER_LEASE_TTL", "15.0")),
+    "lease_renew_interval": float(os.getenv("LEADER_LEASE_RENEW_INTERVAL", "5.0")),
+    "bus_collection": os.getenv("EVENT_BUS_COLLECTION", "change_events_bus"),
+    "bus_size_bytes": int(os.getenv("EVENT_BUS_SIZE_BYTES", str(64 * 1024 * 1024))),
+    "bus_poll_interval": float(os.getenv("EVENT_BUS_POLL_INTERVAL", "0.5"))
+  },
+  "change_stream": {
+    "resume_collection": os.getenv("CHANGE_STREAM_RESUME_COLLECTION", "change_stream_resume_tokens"),
+    "token_flush_interval": float(os.getenv("CHANGE_STREAM_TOKEN_FLUSH_INTERVAL", "1.0")),
+    "backoff_initial": float(os.getenv("CHANGE_STREAM_BACKOFF_INITIAL", "0.5")),
+    "backoff_max": float(os.getenv("CHANGE_STREAM_BACKOFF_MAX", "30.0"))
+  },
+  "event_pipeline": {
+    "queue_size": int(os.getenv("EVENT_PIPELINE_QUEUE_SIZE", "10000")),
+    "batch_size": int(os.getenv("EVENT_PIPELINE_BATCH_SIZE", "500")),
+    "batch_window": float(os.getenv("EVENT_PIPELINE_BATCH_WINDOW", "0.05")),
+    "workers": int(os.getenv("EVENT_PIPELINE_WORKERS", "4"))
+  },
+  "broadcast": {
+    "queue_size": int(os.getenv("BROADCAST_QUEUE_SIZE", "100")),
+    "slow_consumer": os.getenv("BROADCAST_SLOW_CONSUMER", "drop"),
+    "heartbeat_interval": float(os.getenv("BROADCAST_HEARTBEAT_INTERVAL", "15.0")),
+    "max_subscribers": int(os.getenv("BROADCAST_MAX_SUBSCRIBERS", "10000"))
+  },
+  "bulk": {
+    "concurrency": int(os.getenv("BULK_PRODUCTS_CONCURRENCY", "10")),
+    "max_items": int(os.getenv("BULK_PRODUCTS_MAX_ITEMS", "500"))
+  },
+  "export": {
+    "batch_size": int(os.getenv("EXPORT_BATCH_SIZE", "1000")),
+    "gzip_level": int(os.getenv("EXPORT_GZIP_LEVEL", "6")),
+    "projection": [field for field in os.getenv("EXPORT_PROJECTION", "").split(",") if field]
+  },
+  "listing": {
+    "default_limit": int(os.getenv("LISTING_DEFAULT_LIMIT", "50")),
+    "max_limit": int(os.getenv("LISTING_MAX_LIMIT", "500")),
+    "projection": [field for field in os.getenv("LISTING_PROJECTION", "").split(",") if field]
+  },
+  "read_path": {
+    "mode": os.getenv("PRODUCTS_READ_MODE", "http"),
+    "projection": [field for field in os.getenv("PRODUCTS_READ_PROJECTION", "").split(",") if field]
+  },
+  "inventory": {
+    "stock_collection": os.getenv("STOCK_COLLECTION", "stock"),
+    "reservations_collection": os.getenv("STOCK_RESERVATIONS_COLLECTION", "stock_reservations"),
+    "reservation_ttl_seconds": int(os.getenv("STOCK_RESERVATION_TTL_SECONDS", "900")),
+    "reservation_max_ttl_seconds": int(os.getenv("STOCK_RESERVATION_MAX_TTL_SECONDS", "86400")),
+    "reservation_retention_seconds": int(os.getenv("STOCK_RESERVATION_RETENTION_SECONDS", "86400")),
+    "reaper_interval": float(os.getenv("STOCK_REAPER_INTERVAL", "5.0")),
+    "reaper_batch_size": int(os.getenv("STOCK_REAPER_BATCH_SIZE", "500")),
+    "adjust_chunk_size": int(os.getenv("STOCK_ADJUST_CHUNK_SIZE", "1000")),
+    "adjust_max_errors": int(os.getenv("STOCK_ADJUST_MAX_ERRORS", "1000")),
+    "adjust_max_row_bytes": int(os.getenv("STOCK_ADJUST_MAX_ROW_BYTES", "65536"))
+  },
+  "write_behind": {
+    "enabled": _env_bool("WRITE_BEHIND_ENABLED"),
+    "collection": os.getenv("WRITE_BEHIND_COLLECTION", "pending_product_writes"),
+    # merge: later updates of a product only replace the fields they send; replace: last write wins
+    "coalesce": os.getenv("WRITE_BEHIND_COALESCE", "merge"),
+    "window": float(os.getenv("WRITE_BEHIND_WINDOW", "0.5")),
+    "batch_size": int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100")),
+    "max_concurrency": int(os.getenv("WRITE_BEHIND_MAX_CONCURRENCY", "8")),
+    "flush_interval": float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.2")),
+    "retry_delay": float(os.getenv("WRITE_BEHIND_RETRY_DELAY", "5.0")),
+    # Longest a write stays claimed by a flush or a sync update that never finished
+    "claim_timeout": float(os.getenv("WRITE_BEHIND_CLAIM_TIMEOUT", "30.0"))
+  },
+  "lifecycle": {
+    "warmup_timeout": float(os.getenv("WARMUP_TIMEOUT", "10.0")),
+    "warmup_product_ids": [product_id for product_id in os.getenv("WARMUP_PRODUCT_IDS", "").split(",") if product_id],
+    "probe_ttl": float(os.getenv("HEALTH_PROBE_TTL", "5.0")),
+    "probe_timeout": float(os.getenv("HEALTH_PROBE_TIMEOUT", "2.0")),
+    "drain_timeout": float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20.0"))
+  },
+  "compression": {
+    "enabled": _env_bool("COMPRESSION_ENABLED", "true"),
+    # Preferred first; brotli and zstd are only used when installed (extra "compression")
+    "encodings": [encoding.strip() for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if encoding.strip()],
+    "min_size": int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    "offload_min_size": int(os.getenv("COMPRESSION_OFFLOAD_MIN_SIZE", "65536")),
+    "gzip_level": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    "brotli_quality": int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+    "zstd_level": int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3")),
+    "variants_cache_size": int(os.getenv("COMPRESSION_VARIANTS_CACHE_SIZE", "10000"))
+  },
+  "snapshot": {
+    "enabled": _env_bool("SNAPSHOT_ENABLED", "false"),
+    "path": os.getenv("SNAPSHOT_PATH", "data/catalogue.snapshot"),
+    "interval": float(os.getenv("SNAPSHOT_INTERVAL", "30.0")),
+    "scan_batch_size": int(os.getenv("SNAPSHOT_SCAN_BATCH_SIZE", "1000")),
+    "watcher_timeout": float(os.getenv("SNAPSHOT_WATCHER_TIMEOUT", "10.0")),
+    "max_changes": int(os.getenv("SNAPSHOT_MAX_CHANGES", "10000"))
+  },
+  "responses": {
+    "passthrough": _env_bool("RESPONSE_PASSTHROUGH", "true")
+  },
+  "logging": {
+    "level": os.getenv("LOG_LEVEL", "info"),
+    "format": os.getenv("LOG_FORMAT", "json"),
+    "max_value_length": int(os.getenv("LOG_MAX_VALUE_LENGTH", "512")),
+    "sample_rate": float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+    "sampled_events": [event for event in os.getenv(
+      "LOG_SAMPLED_EVENTS",
+      "Fetching all products,Products served from cache,Products fetched successfully,Change detected"
+    ).split(",") if event],
+    "queue_size": int(os.getenv("LOG_QUEUE_SIZE", "10000"))
   }
 }
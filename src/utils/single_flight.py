@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls: while a call for a key is in flight,
+    later callers await the same task instead of starting their own.
+    The shared task is shielded, so a cancelled caller never cancels it for the rest.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    @staticmethod
+    def key_for(payload):
+        """
+        Build a normalised key so equal payloads map to the same call.
+        :param payload: JSON serializable request payload.
+        """
+        return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+
+    async def do(self, key, function):
+        """
+        Run function() once per key among concurrent callers.
+        :param key: Key identifying identical calls.
+        :param function: Coroutine function producing the result.
+        :return: The result (or raises the error) of the shared call.
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # Mark the error as retrieved when every caller went away
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self.calls),
+            "leaders": self.leaders,
+            "shared": self.shared
+        }
+
+
+upstream_single_flight = SingleFlight()
@@ -0,0 +1,525 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+import bson
+
+from src.repository.products_repository import ProductsRepository
+from src.utils.cache import ProductCache
+from src.utils.event_pipeline import change_event_pipeline
+from src.utils.logger_utils import Log
+from src.utils.responses import dumps
+from src.utils.serialization import to_json_compatible
+from src.utils.settings import config
+
+
+log = Log()
+
+MAGIC = b"INVCAT01"
+# magic, product count, index entries, index offset, created at (ms), resume token length
+HEADER = struct.Struct("<8sIIQQI")
+# key hash, key offset, key length, body length, body offset, primary key offset, primary key length
+ENTRY = struct.Struct("<QQIIQQI4x")
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def product_keys(document):
+    """
+    Keys a product is looked up by: its _id and, when it has one, its id field.
+    :return: (primary key, list of alias keys) as strings.
+    """
+    primary = str(document["_id"])
+    aliases = [str(document["id"])] if document.get("id") is not None and str(document["id"]) != primary else []
+    return primary, aliases
+
+
+def product_body(document):
+    # Same envelope ms-product answers with, see GetProducts._read_from_mongo
+    return dumps({"data": {"product": to_json_compatible(document)}})
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot file: header, resume token, keys and bodies, then an
+    index of fixed size entries sorted by key hash. The file is written next
+    to its final path and renamed over it, so readers never see half of it.
+    """
+
+    FLUSH_SIZE = 1 << 20
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(self.temp_path, "wb")
+        self.file.write(b"\0" * HEADER.size)
+        self.offset = HEADER.size
+        self.buffer = bytearray()
+        self.entries = []
+        self.products = 0
+
+    def _append(self, data):
+        offset = self.offset + len(self.buffer)
+        self.buffer += data
+        return offset
+
+    def add(self, primary, aliases, body):
+        primary = primary.encode("utf-8")
+        primary_offset = self._append(primary)
+        body_offset = self._append(body)
+        self.entries.append((key_hash(primary), primary_offset, len(primary), len(body), body_offset,
+                             primary_offset, len(primary)))
+        for alias in aliases:
+            alias = alias.encode("utf-8")
+            alias_offset = self._append(alias)
+            self.entries.append((key_hash(alias), alias_offset, len(alias), len(body), body_offset,
+                                 primary_offset, len(primary)))
+        self.products += 1
+
+    @property
+    def should_flush(self):
+        return len(self.buffer) >= self.FLUSH_SIZE
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.offset += len(self.buffer)
+        self.buffer = bytearray()
+
+    def finish(self, resume_token=None):
+        token = bson.encode({"token": resume_token}) if resume_token is not None else b""
+        token_offset = self._append(token)
+        self.flush()
+        self.entries.sort()
+        index_offset = self.offset
+        self.file.write(b"".join(ENTRY.pack(*entry) for entry in self.entries))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.products, len(self.entries), index_offset,
+                                    int(time.time() * 1000), len(token)))
+        # The token is found right before the index
+        assert token_offset + len(token) == index_offset
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class SnapshotFile:
+    """
+    Read-only memory map of a snapshot file. Opening it only reads the
+    header; lookups binary search the index in the map, so a restarted
+    process serves reads right away and the OS pages bodies in on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self.products, self.count, self.index_offset, self.created_at, token_length = \
+                HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or self.index_offset + self.count * ENTRY.size > len(self.map):
+                raise ValueError(f"{path} is not a catalogue snapshot")
+            self.resume_token = None
+            if token_length:
+                token_offset = self.index_offset - token_length
+                self.resume_token = bson.decode(self.map[token_offset:self.index_offset])["token"]
+        except Exception:
+            self.map.close()
+            raise
+
+    def _entry(self, position):
+        return ENTRY.unpack_from(self.map, self.index_offset + position * ENTRY.size)
+
+    def find(self, key):
+        """
+        :return: (primary key, body bytes) of the product stored under key, or None.
+        """
+        key = key.encode("utf-8")
+        wanted = key_hash(key)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self.count:
+            hashed, key_offset, key_length, body_length, body_offset, primary_offset, primary_length = self._entry(low)
+            if hashed != wanted:
+                return None
+            if self.map[key_offset:key_offset + key_length] == key:
+                primary = self.map[primary_offset:primary_offset + primary_length].decode("utf-8")
+                return primary, self.map[body_offset:body_offset + body_length]
+            low += 1
+        return None
+
+    def _key(self, offset, length):
+        return self.map[offset:offset + length].decode("utf-8")
+
+    def records(self):
+        """
+        Every product as (primary key, aliases, body bytes). A first pass over
+        the index only keeps the offsets of the alias keys; the second one
+        slices each body from the map as its product is yielded, so the
+        catalogue is never held in memory.
+        """
+        aliases = {}
+        for position in range(self.count):
+            _, key_offset, key_length, _, _, primary_offset, _ = self._entry(position)
+            if key_offset != primary_offset:
+                aliases.setdefault(primary_offset, []).append((key_offset, key_length))
+        for position in range(self.count):
+            _, key_offset, key_length, body_length, body_offset, primary_offset, _ = self._entry(position)
+            if key_offset == primary_offset:
+                yield (self._key(key_offset, key_length),
+                       [self._key(offset, length) for offset, length in aliases.get(key_offset, ())],
+                       self.map[body_offset:body_offset + body_length])
+
+    @property
+    def size(self):
+        return len(self.map)
+
+    def close(self):
+        self.map.close()
+
+
+class CatalogueSnapshot:
+    """
+    Local copy of the products collection, so a restarted process serves
+    warm reads straight away instead of sending every first read to ms-product.
+    It is a memory mapped file written by the leader (an initial scan of the
+    collection, then rewritten every interval seconds) together with the
+    resume token of the last change it includes. Changes received since the
+    file was written are kept in memory on top of it; a product changed
+    without its full document is left out and read from the backends.
+    Cache misses are filled from the snapshot, so a change also invalidates
+    the cache entry once the snapshot holds the new body: whatever order the
+    handlers run in, the cache never keeps a body older than the snapshot.
+    """
+
+    def __init__(self, settings=None, pipeline=None, repository=None, cache=None):
+        self.settings = settings or config["snapshot"]
+        self.enabled = self.settings["enabled"]
+        self.pipeline = pipeline or change_event_pipeline
+        self.pipeline.register(self.apply)
+        self.repository = repository
+        self.cache = cache
+        self.source = None
+        self.file = None
+        # (inode, mtime, size) of the mapped file, to notice when the leader rewrote it
+        self.signature = None
+        # True while this process is the one writing the file
+        self.writing = False
+        # File a rewrite is reading in a worker thread; it is closed by save() instead
+        self.reading = None
+        # primary key -> body of the products changed since the file was written, None when unknown
+        self.changed = {}
+        # alias key -> primary key of the changed products
+        self.aliases = {}
+        self.stopping = False
+        self.last_save = None
+        self.builds_total = 0
+        self.saves_total = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors_total = 0
+        self.reloads_total = 0
+
+    @property
+    def resume_token(self):
+        return self.file.resume_token if self.file is not None else None
+
+    def load(self):
+        """
+        Map the snapshot file left by a previous run, if there is a valid one.
+        """
+        if not self.enabled or not os.path.exists(self.settings["path"]):
+            return False
+        started = time.perf_counter()
+        try:
+            self._open()
+        except Exception as e:
+            self.errors_total += 1
+            log.logger.error("Error loading catalogue snapshot", path=self.settings["path"], error=e)
+            return False
+        log.logger.info("Catalogue snapshot loaded", products=self.file.products,
+                        elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+        return True
+
+    def _open(self):
+        signature = self._stat()
+        self._swap(SnapshotFile(self.settings["path"]))
+        self.signature = signature
+
+    def _stat(self):
+        stat = os.stat(self.settings["path"])
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _swap(self, snapshot_file):
+        previous, self.file = self.file, snapshot_file
+        if previous is not None and previous is not self.reading:
+            previous.close()
+
+    def get(self, key):
+        """
+        Body of a product from the snapshot.
+        :return: The JSON bytes or None when the snapshot can not answer.
+        """
+        record = self.lookup(key)
+        return record[1] if record is not None else None
+
+    def lookup(self, key):
+        """
+        :return: (primary key, JSON bytes) of the product stored under key, or
+            None when the snapshot can not answer.
+        """
+        if not self.enabled:
+            return None
+        primary = self.aliases.get(key, key)
+        if primary in self.changed:
+            body = self.changed[primary]
+        else:
+            record = self.file.find(key) if self.file is not None else None
+            # A product changed since the file was written may be under another id now
+            body = None if record is None or record[0] in self.changed else bytes(record[1])
+            if record is not None:
+                primary = record[0]
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return primary, body
+
+    async def apply(self, changes):
+        # A worker not writing the file has nothing to keep changes on top of
+        if not self.enabled or (self.file is None and not self.writing):
+            return
+        for change in changes:
+            operation = change.get("operationType")
+            if operation in ProductCache.RESET_OPERATIONS:
+                self.discard()
+                continue
+            document_key = change.get("documentKey") or {}
+            if "_id" not in document_key:
+                continue
+            primary = str(document_key["_id"])
+            document = change.get("fullDocument") if operation != "delete" else None
+            if document is None:
+                self.changed[primary] = None
+                continue
+            primary, aliases = product_keys(document)
+            self.changed[primary] = product_body(document)
+            for alias in aliases:
+                self.aliases[alias] = primary
+        if self.cache is not None:
+            # Drop what was filled from the previous body while other handlers ran
+            for change in changes:
+                self.cache.apply_change(change)
+        if not self.writing and len(self.changed) > self.settings["max_changes"]:
+            # The file is not being rewritten here (another host leads): stop using it
+            log.logger.warning("Too many changes since the catalogue snapshot was written",
+                               changed=len(self.changed))
+            self.discard()
+
+    def discard(self):
+        """
+        Stop answering from a snapshot that missed changes; the leader rebuilds it.
+        """
+        if self.file is not None:
+            log.logger.warning("Catalogue snapshot discarded")
+            self._swap(None)
+        self.changed.clear()
+        self.aliases.clear()
+
+    async def run(self):
+        """
+        Leader task: build the snapshot when there is none and rewrite it
+        every interval seconds while products change.
+        """
+        log.logger.info("Starting catalogue snapshot writer")
+        self.stopping = False
+        self.writing = True
+        if self.repository is None:
+            self.repository = ProductsRepository()
+        try:
+            while not self.stopping:
+                try:
+                    if self.file is None:
+                        await self.build()
+                    elif self.changed:
+                        await self.save()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors_total += 1
+                    log.logger.error("Error writing catalogue snapshot", error=e)
+                await asyncio.sleep(self.settings["interval"])
+        finally:
+            self.writing = False
+
+    async def follow(self):
+        """
+        Task of every worker: while another one writes the file, map it again
+        each time it is rewritten, so the changes it now holds are dropped
+        from memory instead of piling up.
+        """
+        while True:
+            await asyncio.sleep(self.settings["interval"])
+            if self.writing:
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                self.errors_total += 1
+                log.logger.error("Error reloading catalogue snapshot", error=e)
+
+    def reload(self):
+        """
+        Map the file again if it changed since it was mapped.
+        :return: True when a new file was mapped.
+        """
+        if not self.enabled or not os.path.exists(self.settings["path"]) or self._stat() == self.signature:
+            return False
+        self._open()
+        # Forget the changes the new file already holds
+        for primary, body in list(self.changed.items()):
+            record = self.file.find(primary)
+            stored = bytes(record[1]) if record is not None and record[0] == primary else None
+            if stored == body:
+                del self.changed[primary]
+        self.aliases = {alias: primary for alias, primary in self.aliases.items() if primary in self.changed}
+        self.reloads_total += 1
+        log.logger.info("Catalogue snapshot reloaded", products=self.file.products, changed=len(self.changed))
+        return True
+
+    async def _wait_for_watcher(self):
+        # Changes made during the scan must reach apply(), so the stream has to be open first
+        deadline = time.monotonic() + self.settings["watcher_timeout"]
+        while self.source is not None and not self.source.connected and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    def _committed_token(self):
+        return self.source.pipeline.committed_token if self.source is not None else None
+
+    async def build(self):
+        """
+        Write a new snapshot from a scan of the products collection.
+        Changes received during the scan win over the scanned documents.
+        """
+        await self._wait_for_watcher()
+        started = time.perf_counter()
+        token = self._committed_token()
+        changed = dict(self.changed)
+        writer = await asyncio.to_thread(SnapshotWriter, self.settings["path"])
+        try:
+            # From the primary: the scan must include every change up to the stream position
+            scan = self.repository.iter_products(batch_size=self.settings["scan_batch_size"], primary=True)
+            async for document in scan:
+                primary, aliases = product_keys(document)
+                if primary not in changed:
+                    writer.add(primary, aliases, product_body(document))
+                if writer.should_flush:
+                    await asyncio.to_thread(writer.flush)
+            await asyncio.to_thread(self._finish, writer, changed, token)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+        self.builds_total += 1
+        self._saved(changed)
+        log.logger.info("Catalogue snapshot built", products=self.file.products,
+                        elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+    async def save(self):
+        """
+        Rewrite the snapshot with the changes received since the last one.
+        """
+        token = self._committed_token()
+        changed = dict(self.changed)
+        current = self.reading = self.file
+        try:
+            await asyncio.to_thread(self._rewrite, current, changed, token)
+        finally:
+            self.reading = None
+            if current is not self.file:
+                current.close()
+        if current is not self.file:
+            # Discarded during the rewrite: the new file missed changes, the next run builds it again
+            return
+        self._saved(changed)
+
+    def _rewrite(self, current, changed, token):
+        writer = SnapshotWriter(self.settings["path"])
+        try:
+            for primary, aliases, body in current.records():
+                if primary not in changed:
+                    writer.add(primary, aliases, body)
+                if writer.should_flush:
+                    writer.flush()
+            self._finish(writer, changed, token)
+        except BaseException:
+            writer.abort()
+            raise
+
+    def _finish(self, writer, changed, token):
+        aliases = {}
+        for alias, primary in list(self.aliases.items()):
+            aliases.setdefault(primary, []).append(alias)
+        for primary, body in changed.items():
+            if body is not None:
+                writer.add(primary, aliases.get(primary, []), body)
+        writer.finish(token)
+
+    def _saved(self, changed):
+        self._open()
+        # Keep what changed again while the file was being written
+        for primary, body in changed.items():
+            if primary in self.changed and self.changed[primary] is body:
+                del self.changed[primary]
+        self.aliases = {alias: primary for alias, primary in self.aliases.items() if primary in self.changed}
+        self.saves_total += 1
+        self.last_save = time.time()
+
+    async def flush(self):
+        """
+        Write the pending changes on shutdown, so the next start is warm.
+        """
+        if self.enabled and self.file is not None and self.changed:
+            try:
+                await self.save()
+            except Exception as e:
+                self.errors_total += 1
+                log.logger.error("Error writing catalogue snapshot", error=e)
+
+    def stop(self):
+        self.stopping = True
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "loaded": self.file is not None,
+            "products": self.file.products if self.file is not None else 0,
+            "size_bytes": self.file.size if self.file is not None else 0,
+            "changed": len(self.changed),
+            "has_resume_token": self.resume_token is not None,
+            "last_save": self.last_save,
+            "builds_total": self.builds_total,
+            "saves_total": self.saves_total,
+            "reloads_total": self.reloads_total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors_total": self.errors_total
+        }
+
+
+catalogue_snapshot = CatalogueSnapshot()
@@ -0,0 +1,76 @@
+import codecs
+import json
+
+
+class StreamFormatError(ValueError):
+    """
+    Raised when a streamed body can not be split into rows.
+    """
+
+
+async def iter_ndjson(chunks, max_row_bytes):
+    """
+    Split a streamed NDJSON body into its lines without reading it whole.
+    Blank lines are skipped; each line is yielded undecoded.
+    :param chunks: Async iterator of body bytes.
+    :param max_row_bytes: Longest line accepted, bounding the buffered bytes.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" not in chunk:
+            if len(buffer) > max_row_bytes:
+                raise StreamFormatError(f"Row longer than {max_row_bytes} bytes")
+            continue
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > max_row_bytes:
+            raise StreamFormatError(f"Row longer than {max_row_bytes} bytes")
+    if buffer.strip():
+        yield buffer
+
+
+async def iter_json_array(chunks, max_row_bytes):
+    """
+    Yield the items of a streamed JSON array one at a time, keeping only the
+    item being decoded in memory.
+    :param chunks: Async iterator of body bytes.
+    :param max_row_bytes: Longest item accepted, bounding the buffered text.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    json_decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    async for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                if buffer[position] == "," and not started:
+                    break
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise StreamFormatError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                if buffer[position + 1:].strip():
+                    raise StreamFormatError("Unexpected data after the JSON array")
+                return
+            try:
+                item, position = json_decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Item not complete yet, wait for the next chunk
+                break
+            yield item
+        buffer = buffer[position:]
+        if len(buffer) > max_row_bytes:
+            raise StreamFormatError(f"Row longer than {max_row_bytes} bytes or invalid JSON")
+    raise StreamFormatError("Invalid or unterminated JSON array")
@@ -1,22 +1,56 @@
 import sys
 import os
+import re
+import copy
+import json
+import asyncio
 import pytest
+import httpx
 from fastapi.testclient import TestClient
+from pymongo import ReturnDocument
 from unittest.mock import Mock, patch
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from src.main import app
+from src.utils.settings import config
+from src.utils.http_client import UpstreamClient, upstream_client
+from src.utils.cache import ProductCache, product_cache
+from src.utils.container import Container, get_container
+from src.utils.single_flight import SingleFlight
 
 # Configure pytest-asyncio
 pytest_plugins = ('pytest_asyncio',)
 
+@pytest.fixture(autouse=True)
+def reset_shared_state():
+    """Start every test with closed circuit breakers and an empty product cache"""
+    upstream_client.breakers.clear()
+    product_cache.entries.clear()
+    yield
+
 @pytest.fixture
 def client():
     """Test client for FastAPI app"""
     return TestClient(app)
 
+@pytest.fixture
+def upstream_settings():
+    """Settings for an UpstreamClient pointing to a mocked ms-product"""
+    return {
+        **config["ms_product"],
+        "base_url": "http://ms-product:8000",
+        "timeout": 5.0,
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "keepalive_expiry": 30.0,
+        "http2": False,
+        "retry_backoff_base": 0.001,
+        "retry_backoff_max": 0.002,
+        "hedge_enabled": False
+    }
+
 @pytest.fixture
 def mock_product_data():
     """Sample product data for testing"""
@@ -67,4 +101,140 @@ def mock_update_response():
                 }
             }
         }
-    } 
\ No newline at end of file
+    }
+
+@pytest.fixture
+def container(upstream_settings):
+    """Application container using a mocked ms-product, installed in the app for the test"""
+    calls = []
+    products = {"1": {"id": "1", "price": 100}}
+
+    def handler(request):
+        product_id = json.loads(request.content)["product"]["id"]
+        calls.append(product_id)
+        return httpx.Response(200, json={"data": {"product": products[product_id]}})
+
+    client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+    container = Container(upstream_client=client, cache=ProductCache(10, 60, True), single_flight=SingleFlight())
+    container.calls = calls
+    container.products = products
+    app.dependency_overrides[get_container] = lambda: container
+    yield container
+    app.dependency_overrides.clear()
+
+
+def matches(document, query):
+    """Whether a document matches the subset of the MongoDB query language the repository uses"""
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+            continue
+        value = document.get(field)
+        if not isinstance(condition, dict):
+            if value != condition and not (isinstance(value, list) and condition in value):
+                return False
+            continue
+        for operator, operand in condition.items():
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$regex" and (value is None or not re.match(operand, value)):
+                return False
+            if operator == "$gt" and (value is None or not value > operand):
+                return False
+            if operator == "$gte" and (value is None or not value >= operand):
+                return False
+            if operator == "$lte" and (value is None or not value <= operand):
+                return False
+    return True
+
+
+class FakeCursor:
+    """find() result supporting sort, limit, to_list and async iteration"""
+
+    def __init__(self, documents, projection=None):
+        self.documents = documents
+        self.projection = projection
+        self.sort_spec = []
+        self.limit_value = 0
+
+    def sort(self, spec):
+        self.sort_spec = spec
+        return self
+
+    def limit(self, value):
+        self.limit_value = value
+        return self
+
+    def _results(self):
+        documents = list(self.documents)
+        for field, direction in reversed(self.sort_spec):
+            # Missing and null values sort first, as in MongoDB
+            documents.sort(key=lambda document: (document.get(field) is not None, document.get(field)),
+                           reverse=direction < 0)
+        documents = documents[:self.limit_value] if self.limit_value else documents
+        if isinstance(self.projection, list) and self.projection:
+            fields = set(self.projection) | {"_id"}
+            documents = [{key: value for key, value in document.items() if key in fields} for document in documents]
+        return documents
+
+    async def to_list(self, length=None):
+        return self._results()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._results():
+            yield document
+
+
+class FakeCollection:
+    """In memory collection keyed by _id; each operation is atomic like a single document write in MongoDB"""
+
+    def __init__(self, documents=()):
+        self.documents = {document["_id"]: document for document in documents}
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append((query, projection))
+        return FakeCursor([copy.deepcopy(d) for d in self.documents.values() if matches(d, query)], projection)
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(0)
+        return next((copy.deepcopy(d) for d in self.documents.values() if matches(d, query)), None)
+
+    async def insert_one(self, document):
+        await asyncio.sleep(0)
+        self.documents[document["_id"]] = copy.deepcopy(document)
+
+    async def delete_one(self, query):
+        await asyncio.sleep(0)
+        document = next((d for d in self.documents.values() if matches(d, query)), None)
+        if document is not None:
+            del self.documents[document["_id"]]
+
+    async def update_one(self, query, update):
+        await self.find_one_and_update(query, update)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        await asyncio.sleep(0)
+        document = next((d for d in self.documents.values() if matches(d, query)), None)
+        if document is None:
+            if not upsert:
+                return None
+            document = {"_id": query["_id"], **update.get("$setOnInsert", {})}
+            self.documents[document["_id"]] = document
+        for field, amount in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + amount
+        for field, value in update.get("$push", {}).items():
+            document.setdefault(field, []).append(value)
+        for field, value in update.get("$pull", {}).items():
+            document[field] = [item for item in document.get(field, []) if item != value]
+        document.update(update.get("$set", {}))
+        return copy.deepcopy(document)
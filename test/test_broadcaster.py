@@ -0,0 +1,131 @@
+import sys
+import os
+import json
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+from src.services.stream_services import sse_events
+from src.utils.broadcaster import CLOSE, ChangeBroadcaster
+from src.utils.container import get_broadcaster
+from src.utils.event_pipeline import ChangeEventPipeline
+
+
+SETTINGS = {"queue_size": 2, "slow_consumer": "drop", "heartbeat_interval": 0.01, "max_subscribers": 3}
+
+PIPELINE_SETTINGS = {"queue_size": 10, "batch_size": 10, "batch_window": 0.01, "workers": 2}
+
+
+def change(document_id, price=1):
+    return {
+        "operationType": "update",
+        "documentKey": {"_id": document_id},
+        "updateDescription": {"updatedFields": {"price": price}, "removedFields": []}
+    }
+
+
+def broadcaster(**settings):
+    return ChangeBroadcaster({**SETTINGS, **settings}, ChangeEventPipeline(PIPELINE_SETTINGS))
+
+
+def drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        message = subscriber.queue.get_nowait()
+        messages.append(message if message is CLOSE else json.loads(message))
+    return messages
+
+
+class TestChangeBroadcaster:
+    """Test cases for the fan-out of change events to subscribers"""
+
+    @pytest.mark.asyncio
+    async def test_subscribers_only_receive_their_products(self):
+        """Test that id filters select the events queued to each subscriber"""
+        fan_out = broadcaster()
+        everything = fan_out.subscribe()
+        only_a = fan_out.subscribe(["a"])
+
+        await fan_out.handle([change("a"), change("b")])
+
+        assert [message["id"] for message in drain(everything)] == ["a", "b"]
+        assert drain(only_a) == [{"operation": "update", "id": "a", "updated_fields": {"price": 1},
+                                  "removed_fields": [], "document": None}]
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_drops_oldest(self):
+        """Test that a full buffer keeps the latest events with the drop policy"""
+        fan_out = broadcaster()
+        subscriber = fan_out.subscribe(["a"])
+
+        await fan_out.handle([change("a", price) for price in range(5)])
+
+        assert [message["updated_fields"]["price"] for message in drain(subscriber)] == [3, 4]
+        assert subscriber.dropped == 3
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_disconnected(self):
+        """Test that the disconnect policy closes and unsubscribes slow clients"""
+        fan_out = broadcaster(slow_consumer="disconnect")
+        subscriber = fan_out.subscribe()
+
+        await fan_out.handle([change("a", price) for price in range(3)])
+
+        assert drain(subscriber) == [CLOSE]
+        assert fan_out.stats()["subscribers"] == 0
+        assert fan_out.stats()["disconnected_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_pipeline_feeds_subscribers(self):
+        """Test that the broadcaster is fed by the change event pipeline"""
+        fan_out = broadcaster()
+        subscriber = fan_out.subscribe()
+        await fan_out.pipeline.start()
+
+        await fan_out.pipeline.put(change("a"))
+        await fan_out.pipeline.stop()
+
+        assert [message["id"] for message in drain(subscriber)] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_sse_stream_heartbeats_and_events(self):
+        """Test the server-sent events framing, heartbeats and the end of the stream"""
+        fan_out = broadcaster()
+        subscriber = fan_out.subscribe()
+        events = sse_events(fan_out, subscriber)
+
+        assert await events.__anext__() == b"retry: 3000\n\n"
+        assert await events.__anext__() == b": heartbeat\n\n"
+        await fan_out.handle([change("a")])
+        assert (await events.__anext__()).startswith(b"event: change\ndata: {")
+        fan_out.close_all()
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        assert fan_out.stats()["subscribers"] == 0
+
+    def test_websocket_rejected_over_limit(self):
+        """Test that websocket clients over max_subscribers are turned away"""
+        app.dependency_overrides[get_broadcaster] = lambda: broadcaster(max_subscribers=0)
+        try:
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                with TestClient(app).websocket_connect("/api-inventory/changes/ws"):
+                    pass
+        finally:
+            app.dependency_overrides.clear()
+
+        assert exc_info.value.code == 1013
+
+    def test_websocket_heartbeat(self):
+        """Test that idle websocket subscribers receive heartbeats and are removed on disconnect"""
+        fan_out = broadcaster()
+        app.dependency_overrides[get_broadcaster] = lambda: fan_out
+        try:
+            with TestClient(app).websocket_connect("/api-inventory/changes/ws?ids=a,b") as websocket:
+                assert json.loads(websocket.receive_bytes()) == {"type": "heartbeat"}
+                assert fan_out.stats()["subscribers"] == 1
+        finally:
+            app.dependency_overrides.clear()
@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import pytest
+import httpx
+from fastapi import HTTPException
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.controllers.bulk_products_controllers import GetProductsBulk
+from src.utils.cache import ProductCache
+from src.utils.http_client import UpstreamClient
+from src.utils.responses import ProductBody
+
+
+BULK_SETTINGS = {"concurrency": 2, "max_items": 5}
+
+
+def product_handler(calls):
+    def handler(request):
+        product_id = json.loads(request.content)["product"]["id"]
+        calls.append(product_id)
+        if product_id == "broken":
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(200, json={"id": product_id})
+    return handler
+
+
+class TestGetProductsBulk:
+    """Test cases for the bulk products controller"""
+
+    @pytest.mark.asyncio
+    async def test_results_follow_input_order_and_dedupe(self, upstream_settings):
+        """Test that duplicates are fetched once and results keep the request order"""
+        calls = []
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(product_handler(calls)))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+
+        result = await GetProductsBulk(["b", "a", "b"], client=client, cache=cache, settings=BULK_SETTINGS).get_products()
+
+        assert [item["id"] for item in result] == ["b", "a", "b"]
+        assert [item["data"] for item in result] == [{"id": "b"}, {"id": "a"}, {"id": "b"}]
+        assert sorted(calls) == ["a", "b"]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_cached_products_skip_upstream(self, upstream_settings):
+        """Test that cached ids are served without calling ms-product"""
+        calls = []
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(product_handler(calls)))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        cache.set("a", ProductBody.from_data({"id": "a", "cached": True}))
+
+        result = await GetProductsBulk(["a", "b"], client=client, cache=cache, settings=BULK_SETTINGS).get_products()
+
+        assert result[0]["data"] == {"id": "a", "cached": True}
+        assert calls == ["b"]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_errors_are_reported_per_item(self, upstream_settings):
+        """Test that a failing id does not fail the whole request"""
+        calls = []
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(product_handler(calls)))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+
+        result = await GetProductsBulk(["a", "broken"], client=client, cache=cache, settings=BULK_SETTINGS).get_products()
+
+        assert result[0]["status"] == "success"
+        assert result[1]["status"] == "error"
+        assert "connection refused" in result[1]["error"]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_too_many_ids_is_a_validation_error(self):
+        """Test that requests above the configured limit are rejected"""
+        with pytest.raises(HTTPException) as exc_info:
+            await GetProductsBulk(["1", "2", "3", "4", "5", "6"], settings=BULK_SETTINGS).get_products()
+
+        assert exc_info.value.status_code == 422
+
+    def test_bulk_endpoint_requires_ids(self, client):
+        """Test that an empty id list is rejected by the entity"""
+        response = client.post("/api-inventory/products/bulk/", json={"ids": []})
+
+        assert response.status_code == 422
@@ -0,0 +1,200 @@
+import sys
+import os
+import pytest
+import httpx
+from bson import ObjectId
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.cache import ProductCache
+from src.utils.http_client import UpstreamClient
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProductCache:
+    """Test cases for the product cache"""
+
+    def test_hit_and_miss_counters(self):
+        """Test that hits and misses are counted"""
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        assert cache.get("1") is None
+        cache.set("1", {"id": "1"})
+
+        assert cache.get("1") == {"id": "1"}
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ProductCache(max_size=2, ttl_seconds=60, enabled=True)
+        cache.set("1", "a")
+        cache.set("2", "b")
+        cache.get("1")
+        cache.set("3", "c")
+
+        assert cache.get("2") is None
+        assert cache.get("1") == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiration(self):
+        """Test that entries expire after the ttl"""
+        clock = FakeClock()
+        cache = ProductCache(max_size=10, ttl_seconds=5, enabled=True, clock=clock)
+        cache.set("1", "a")
+        clock.now = 6
+
+        assert cache.get("1") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_disabled_cache_stores_nothing(self):
+        """Test that a disabled cache never serves entries"""
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=False)
+        cache.set("1", "a")
+
+        assert cache.get("1") is None
+        assert len(cache) == 0
+
+    def test_change_event_invalidates_entry(self):
+        """Test that an update event drops the cached product"""
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        object_id = ObjectId()
+        cache.set(str(object_id), "a")
+        cache.apply_change({"operationType": "update", "documentKey": {"_id": object_id}})
+
+        assert cache.get(str(object_id)) is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_drop_event_clears_cache(self):
+        """Test that a collection drop clears every entry"""
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        cache.set("1", "a")
+        cache.set("2", "b")
+        cache.apply_change({"operationType": "drop"})
+
+        assert len(cache) == 0
+
+    def test_fill_started_before_a_change_is_dropped(self):
+        """Test that a value read before the key was invalidated is not stored"""
+        cache = ProductCache(max_size=2, ttl_seconds=60, enabled=True)
+        generation = cache.generation()
+        other = cache.generation()
+        cache.apply_change({"operationType": "update", "documentKey": {"_id": "1"}})
+        cache.set("1", "stale", generation)
+        cache.set("2", "b", other)
+
+        assert cache.get("1") is None
+        assert cache.get("2") == "b"
+        assert cache.stats()["stale_fills"] == 1
+
+        # Keys forgotten past max_size, and a clear, still drop the fills in flight
+        generation = cache.generation()
+        cache.invalidate("1")
+        cache.invalidate("3")
+        cache.invalidate("4")
+        cache.set("1", "stale", generation)
+        generation = cache.generation()
+        cache.clear()
+        cache.set("5", "stale", generation)
+
+        assert cache.get("1") is None
+        assert cache.get("5") is None
+        assert len(cache.generations) == 0
+
+    def test_change_of_the_id_invalidates_the_alias(self):
+        """Test that a value cached under the product id is dropped by a change of its _id"""
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        generation = cache.generation()
+        cache.apply_change({"operationType": "update", "documentKey": {"_id": "64b0"}})
+        cache.set("sku-1", "stale", generation, primary="64b0")
+
+        assert cache.get("sku-1") is None
+
+        cache.set("sku-1", "a", cache.generation(), primary="64b0")
+        cache.apply_change({"operationType": "update", "documentKey": {"_id": "64b0"}})
+
+        assert cache.get("sku-1") is None
+        assert cache.stats()["stale_fills"] == 1
+
+
+class TestGetProductsReadThrough:
+    """Test cases for the read-through cache in GetProducts"""
+
+    @pytest.mark.asyncio
+    async def test_second_read_is_served_from_cache(self, upstream_settings):
+        """Test that only the first lookup reaches ms-product"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"products": []})
+
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        product_id = Product(product={"id": "test-product-id-123"})
+
+        first = await GetProducts(product_id, client=client, cache=cache).get_products()
+        second = await GetProducts(product_id, client=client, cache=cache).get_products()
+
+        assert first == second == {"products": []}
+        assert len(calls) == 1
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_change_during_the_request_is_not_overwritten(self, upstream_settings):
+        """Test that an answer fetched while the product changed is returned but not cached"""
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+
+        def handler(request):
+            cache.apply_change({"operationType": "update", "documentKey": {"_id": "test-product-id-123"}})
+            return httpx.Response(200, json={"products": []})
+
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+        product_id = Product(product={"id": "test-product-id-123"})
+
+        data = await GetProducts(product_id, client=client, cache=cache).get_products()
+
+        assert data == {"products": []}
+        assert len(cache) == 0
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_change_of_the_id_invalidates_the_read(self, upstream_settings):
+        """Test that a product read by id stops being served once a change of its _id arrives"""
+        names = iter(["old", "new"])
+
+        def handler(request):
+            return httpx.Response(200, json={"data": {"product": {"_id": "64b0", "id": "sku-1", "name": next(names)}}})
+
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        product_id = Product(product={"id": "sku-1"})
+
+        first = await GetProducts(product_id, client=client, cache=cache).get_products()
+        cache.apply_change({"operationType": "update", "documentKey": {"_id": "64b0"}})
+        second = await GetProducts(product_id, client=client, cache=cache).get_products()
+
+        assert first["data"]["product"]["name"] == "old"
+        assert second["data"]["product"]["name"] == "new"
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_error_responses_are_not_cached(self, upstream_settings):
+        """Test that upstream errors are not stored in the cache"""
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(lambda request: httpx.Response(500, json={"detail": "boom"})))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+        product_id = Product(product={"id": "test-product-id-123"})
+
+        await GetProducts(product_id, client=client, cache=cache).get_products()
+
+        assert len(cache) == 0
+        await client.close()
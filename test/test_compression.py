@@ -0,0 +1,130 @@
+import sys
+import os
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.compression import CompressionMiddleware, ResponseCompression, negotiate
+from src.utils.responses import RawJSONResponse
+
+
+SETTINGS = {"enabled": True, "encodings": ["zstd", "br", "gzip"], "min_size": 100, "offload_min_size": 1000,
+            "gzip_level": 6, "brotli_quality": 4, "zstd_level": 3, "variants_cache_size": 10}
+
+LARGE = b'{"result":[' + b",".join(b'{"id":"%d","name":"Product"}' % index for index in range(100)) + b"]}"
+
+
+def build_app(compression):
+    test_app = FastAPI()
+    test_app.add_middleware(CompressionMiddleware, compression=compression)
+
+    @test_app.get("/large")
+    async def large():
+        return RawJSONResponse(LARGE, headers={"ETag": '"v1"', "Vary": "Origin"})
+
+    @test_app.get("/not-modified")
+    async def not_modified():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    @test_app.get("/small")
+    async def small():
+        return RawJSONResponse(b'{"result":1}')
+
+    @test_app.get("/encoded")
+    async def encoded():
+        return Response(gzip.compress(LARGE), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @test_app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield LARGE
+            yield LARGE
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    return test_app
+
+
+class TestNegotiation:
+    """Test cases for the Accept-Encoding negotiation"""
+
+    def test_negotiate(self):
+        """Test that q-values win and ties go to the server preference"""
+        preference = ["br", "gzip"]
+
+        assert negotiate("gzip, br", preference) == "br"
+        assert negotiate("gzip;q=1.0, br;q=0.5", preference) == "gzip"
+        assert negotiate("br;q=0, gzip", preference) == "gzip"
+        assert negotiate("*", preference) == "br"
+        assert negotiate("identity", preference) is None
+        assert negotiate(None, preference) is None
+
+
+class TestCompressionMiddleware:
+    """Test cases for the response compression middleware"""
+
+    def test_large_body_is_compressed(self):
+        """Test that a large JSON body is gzipped with the right headers"""
+        compression = ResponseCompression({**SETTINGS, "encodings": ["gzip"]}, 60)
+        client = TestClient(build_app(compression))
+
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Origin, Accept-Encoding"
+        assert int(response.headers["Content-Length"]) < len(LARGE)
+        assert response.content == LARGE
+        assert compression.bytes_in == len(LARGE)
+        assert compression.offloaded_total == 1
+
+    def test_compressed_variant_is_reused_by_etag(self):
+        """Test that a body with the same ETag is only compressed once"""
+        compression = ResponseCompression({**SETTINGS, "encodings": ["gzip"]}, 60)
+        client = TestClient(build_app(compression))
+
+        first = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        second = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert first.content == second.content == LARGE
+        assert compression.compressed_total == 2
+        assert compression.variants.stats()["hits"] == 1
+
+    def test_compressed_body_has_its_own_etag(self):
+        """Test that the ETag of a compressed body names its encoding and a 304 repeats it"""
+        compression = ResponseCompression({**SETTINGS, "encodings": ["gzip"]}, 60)
+        client = TestClient(build_app(compression))
+
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        revalidated = client.get("/not-modified", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1-gzip"'})
+        identity = client.get("/not-modified", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1"'})
+
+        assert response.headers["ETag"] == '"v1-gzip"'
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == '"v1-gzip"'
+        assert identity.headers["ETag"] == '"v1"'
+        assert client.get("/large", headers={"Accept-Encoding": "identity"}).headers["ETag"] == '"v1"'
+
+    @pytest.mark.parametrize("path", ["/small", "/encoded", "/stream"])
+    def test_responses_left_alone(self, path):
+        """Test that small, already encoded and streamed bodies are not compressed again"""
+        compression = ResponseCompression(SETTINGS, 60)
+        client = TestClient(build_app(compression))
+
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers.get("Content-Encoding") == ("gzip" if path == "/encoded" else None)
+        assert compression.compressed_total == 0
+
+    def test_without_accept_encoding(self):
+        """Test that clients not asking for compression get the plain body"""
+        compression = ResponseCompression(SETTINGS, 60)
+        client = TestClient(build_app(compression))
+
+        response = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+        assert "Content-Encoding" not in response.headers
+        assert response.content == LARGE
@@ -0,0 +1,56 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+
+
+class TestConditionalGet:
+    """Test cases for ETags and If-None-Match on product reads"""
+
+    def test_get_product_returns_etag(self, container):
+        """Test that a product is returned with its ETag"""
+        response = TestClient(app).get("/api-inventory/products/1")
+
+        assert response.status_code == 200
+        assert response.json() == {"result": {"data": {"product": {"id": "1", "price": 100}}}}
+        assert response.headers["ETag"].startswith('"')
+        assert response.headers["Cache-Control"] == "no-cache"
+
+    def test_matching_etag_is_not_modified_without_upstream_call(self, container):
+        """Test that a cached product answers 304 to a matching If-None-Match"""
+        client = TestClient(app)
+        etag = client.get("/api-inventory/products/1").headers["ETag"]
+
+        response = client.get("/api-inventory/products/1", headers={"If-None-Match": f'W/{etag}, "other"'})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        assert container.calls == ["1"]
+
+    def test_change_event_bumps_the_etag(self, container):
+        """Test that a product changed in MongoDB gets a new ETag"""
+        client = TestClient(app)
+        etag = client.get("/api-inventory/products/1").headers["ETag"]
+        container.products["1"] = {"id": "1", "price": 120}
+        container.cache.apply_change({"operationType": "update", "documentKey": {"_id": "1"}})
+
+        response = client.get("/api-inventory/products/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["result"]["data"]["product"]["price"] == 120
+        assert container.calls == ["1", "1"]
+
+    def test_post_products_has_the_same_etag(self, container):
+        """Test that the POST lookup exposes the ETag used by the GET endpoint"""
+        client = TestClient(app)
+
+        posted = client.post("/api-inventory/products/", json={"product": {"id": "1"}})
+        fetched = client.get("/api-inventory/products/1")
+
+        assert posted.headers["ETag"] == fetched.headers["ETag"]
@@ -0,0 +1,52 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+from src.utils.container import get_products_controller
+from src.utils.responses import ProductBody
+
+
+class TestContainer:
+    """Test cases for the application container"""
+
+    def test_controllers_are_built_once(self):
+        """Test that the app serves every request with the same controller instances"""
+        container = app.state.container
+
+        assert container.get_products_bulk.products is container.get_products
+        assert container.get_products.client is container.upstream_client
+        assert container.event_handler.products_event_service is container.products_event_service
+
+    def test_routes_use_overridden_container(self, container):
+        """Test that an overridden container is used by the routes"""
+        client = TestClient(app)
+
+        first = client.post("/api-inventory/products/", json={"product": {"id": "1"}})
+        second = client.post("/api-inventory/products/", json={"product": {"id": "1"}})
+
+        assert first.status_code == 200
+        assert first.json() == {"result": {"data": {"product": {"id": "1", "price": 100}}}}
+        assert second.json() == first.json()
+        # The second request is served from the container's cache
+        assert container.calls == ["1"]
+
+    def test_controller_dependency_override(self):
+        """Test that a single controller can be replaced in tests"""
+        class FakeController:
+            async def get_products_body(self, product_id):
+                return ProductBody.from_data({"fake": product_id.product["id"]})
+
+            async def get_products(self, product_id):
+                return {"fake": product_id.product["id"]}
+
+        app.dependency_overrides[get_products_controller] = lambda: FakeController()
+        try:
+            response = TestClient(app).post("/api-inventory/products/", json={"product": {"id": "9"}})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.json() == {"result": {"fake": "9"}}
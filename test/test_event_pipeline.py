@@ -0,0 +1,120 @@
+import sys
+import os
+import asyncio
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.event_pipeline import ChangeEventPipeline
+
+
+SETTINGS = {
+    "queue_size": 100,
+    "batch_size": 50,
+    "batch_window": 0.05,
+    "workers": 3
+}
+
+
+def update(document_id, fields, token=None):
+    return {
+        "_id": token,
+        "operationType": "update",
+        "documentKey": {"_id": document_id},
+        "updateDescription": {"updatedFields": fields, "removedFields": []}
+    }
+
+
+class TestChangeEventPipeline:
+    """Test cases for the batched change event pipeline"""
+
+    def test_coalesce_merges_updates_of_same_document(self):
+        """Test that successive updates of one document become a single event"""
+        pipeline = ChangeEventPipeline(SETTINGS)
+        batch = [
+            (update("1", {"price": 10}), None),
+            (update("2", {"price": 5}), None),
+            (update("1", {"stock": 3}), None)
+        ]
+
+        events = pipeline.coalesce(batch)
+
+        assert [event["documentKey"]["_id"] for event in events] == ["2", "1"]
+        assert events[1]["updateDescription"]["updatedFields"] == {"price": 10, "stock": 3}
+
+    def test_coalesce_keeps_delete_after_update(self):
+        """Test that the last operation of a document wins"""
+        pipeline = ChangeEventPipeline(SETTINGS)
+        delete = {"operationType": "delete", "documentKey": {"_id": "1"}}
+
+        events = pipeline.coalesce([(update("1", {"price": 10}), None), (delete, None)])
+
+        assert events == [delete]
+
+    @pytest.mark.asyncio
+    async def test_handlers_receive_batches_and_commit_token(self):
+        """Test that handlers see every document and the last token is committed"""
+        pipeline = ChangeEventPipeline(SETTINGS)
+        seen = []
+
+        async def handler(events):
+            seen.extend(event["documentKey"]["_id"] for event in events)
+
+        pipeline.register(handler)
+        await pipeline.start()
+        for index in range(20):
+            await pipeline.put(update(str(index % 5), {"n": index}), resume_token=index)
+        await pipeline.stop()
+
+        assert sorted(set(seen)) == ["0", "1", "2", "3", "4"]
+        assert pipeline.committed_token == 19
+        stats = pipeline.stats()
+        assert stats["events_total"] == 20
+        assert stats["events_coalesced"] > 0
+        assert stats["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_handler_errors_do_not_stop_pipeline(self):
+        """Test that a failing handler is counted and processing continues"""
+        pipeline = ChangeEventPipeline(SETTINGS)
+        seen = []
+
+        async def failing(events):
+            raise RuntimeError("boom")
+
+        async def handler(events):
+            seen.extend(events)
+
+        pipeline.register(failing)
+        pipeline.register(handler)
+        await pipeline.start()
+        await pipeline.put(update("1", {}), resume_token="a")
+        await pipeline.stop()
+
+        assert len(seen) == 1
+        assert pipeline.handler_errors == 1
+        assert pipeline.committed_token == "a"
+
+    @pytest.mark.asyncio
+    async def test_full_queue_applies_backpressure(self):
+        """Test that put waits while the queue is full"""
+        pipeline = ChangeEventPipeline({**SETTINGS, "queue_size": 1, "batch_size": 1})
+        release = asyncio.Event()
+
+        async def slow(events):
+            await release.wait()
+
+        pipeline.register(slow)
+        await pipeline.start()
+        blocked = None
+        for index in range(50):
+            try:
+                await asyncio.wait_for(pipeline.put(update(str(index), {})), timeout=0.2)
+            except asyncio.TimeoutError:
+                blocked = index
+                break
+        release.set()
+        await pipeline.stop()
+
+        assert blocked is not None
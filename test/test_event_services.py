@@ -0,0 +1,168 @@
+import sys
+import os
+import asyncio
+import pytest
+from pymongo.errors import OperationFailure, AutoReconnect
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.services.products_event_services import ProductsEventServices
+from src.utils.cache import ProductCache
+from src.utils.event_pipeline import ChangeEventPipeline
+
+
+SETTINGS = {
+    "resume_collection": "change_stream_resume_tokens",
+    "token_flush_interval": 0.0,
+    "backoff_initial": 0.001,
+    "backoff_max": 0.002
+}
+
+PIPELINE_SETTINGS = {
+    "queue_size": 100,
+    "batch_size": 10,
+    "batch_window": 0.01,
+    "workers": 2
+}
+
+
+class FakeStream:
+    """Change stream yielding scripted events and then an optional error"""
+
+    def __init__(self, events, error=None):
+        self.events = list(events)
+        self.error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.events:
+            change = self.events.pop(0)
+            self.resume_token = change["_id"]
+            return change
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, streams, service):
+        self.streams = streams
+        self.service = service
+        self.watch_calls = []
+
+    def watch(self, **options):
+        self.watch_calls.append(options)
+        if not self.streams:
+            self.service.stop()
+            return FakeStream([])
+        return self.streams.pop(0)
+
+
+class FakeRepository:
+    def __init__(self, token=None):
+        self.token = token
+        self.saved = []
+        self.collection = None
+
+    def get_collection(self):
+        return self.collection
+
+    async def load_resume_token(self, watcher_name):
+        return self.token
+
+    async def save_resume_token(self, watcher_name, token):
+        self.saved.append(token)
+        self.token = token
+
+
+def change(token, document_id="1", operation="update"):
+    return {"_id": {"_data": token}, "operationType": operation, "documentKey": {"_id": document_id}}
+
+
+def build_service(repository, cache=None):
+    return ProductsEventServices(
+        cache=cache if cache is not None else ProductCache(10, 60, True),
+        repository=repository,
+        settings=SETTINGS,
+        pipeline=ChangeEventPipeline(PIPELINE_SETTINGS)
+    )
+
+
+async def run_until_drained(service):
+    await asyncio.wait_for(service.watch_changes(), timeout=2)
+    await service.pipeline.stop()
+    await service.flush_resume_token(force=True)
+
+
+class TestProductsEventServices:
+    """Test cases for the resumable change stream watcher"""
+
+    @pytest.mark.asyncio
+    async def test_reconnects_and_resumes_from_last_token(self):
+        """Test that the watcher resumes after an error from the last processed event"""
+        repository = FakeRepository()
+        service = build_service(repository)
+        repository.collection = FakeCollection([
+            FakeStream([change("a"), change("b")], error=AutoReconnect("primary stepped down")),
+            FakeStream([change("c")])
+        ], service)
+
+        await run_until_drained(service)
+
+        watch_calls = repository.collection.watch_calls
+        assert watch_calls[0] == {}
+        assert watch_calls[1] == {"resume_after": {"_data": "b"}}
+        assert service.events_total == 3
+        assert service.reconnects >= 1
+        assert repository.token == {"_data": "c"}
+
+    @pytest.mark.asyncio
+    async def test_starts_from_persisted_token(self):
+        """Test that a stored resume token is used on the first connection"""
+        repository = FakeRepository(token={"_data": "stored"})
+        service = build_service(repository)
+        repository.collection = FakeCollection([], service)
+
+        await run_until_drained(service)
+
+        assert repository.collection.watch_calls[0] == {"resume_after": {"_data": "stored"}}
+
+    @pytest.mark.asyncio
+    async def test_lost_history_drops_token_and_cache(self):
+        """Test that an expired resume token restarts the stream from now"""
+        repository = FakeRepository(token={"_data": "expired"})
+        cache = ProductCache(10, 60, True)
+        cache.set("9", "stale")
+        service = build_service(repository, cache)
+        repository.collection = FakeCollection([
+            FakeStream([], error=OperationFailure("history lost", code=286))
+        ], service)
+
+        await run_until_drained(service)
+
+        assert repository.collection.watch_calls[1] == {}
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_events_invalidate_cache(self):
+        """Test that processed events invalidate cached products"""
+        repository = FakeRepository()
+        cache = ProductCache(10, 60, True)
+        cache.set("1", "stale")
+        service = build_service(repository, cache)
+        repository.collection = FakeCollection([FakeStream([change("a", document_id="1")])], service)
+
+        await run_until_drained(service)
+
+        assert cache.get("1") is None
+        assert service.stats()["last_event_time"] is not None
@@ -0,0 +1,128 @@
+import sys
+import os
+import gzip
+import json
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+from src.controllers.export_products_controllers import ExportProducts
+from src.repository.products_repository import ProductsRepository
+from src.utils.container import get_export_products_controller
+
+
+SETTINGS = {"batch_size": 2, "gzip_level": 6, "projection": []}
+
+
+class FakeCursor:
+    def __init__(self, documents, error=None):
+        self.documents = list(documents)
+        self.error = error
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.documents:
+            return self.documents.pop(0)
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+
+class FakeRepository:
+    def __init__(self, documents, error=None):
+        self.documents = documents
+        self.error = error
+        self.calls = []
+
+    def iter_products(self, after=None, projection=None, batch_size=1000):
+        self.calls.append((after, projection, batch_size))
+        documents = [document for document in self.documents if after is None or str(document["_id"]) > after]
+        return FakeCursor(documents, self.error)
+
+
+async def read(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+def products(count):
+    return [{"_id": ObjectId(), "name": f"product {index}", "price": index} for index in range(count)]
+
+
+class TestExportProducts:
+    """Test cases for the NDJSON catalogue export"""
+
+    @pytest.mark.asyncio
+    async def test_exports_one_line_per_product(self):
+        """Test that every product is written as one JSON line in cursor batches"""
+        documents = products(5)
+        repository = FakeRepository(documents)
+
+        body = await read(await ExportProducts(repository, SETTINGS).export(fields=["name"]))
+
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert [line["_id"] for line in lines] == [str(document["_id"]) for document in documents]
+        assert repository.calls == [(None, ["name"], 2)]
+
+    @pytest.mark.asyncio
+    async def test_gzip_and_resume(self):
+        """Test that the gzip stream decompresses and resumes after the given id"""
+        documents = products(4)
+        repository = FakeRepository(documents)
+
+        body = await read(await ExportProducts(repository, SETTINGS).export(after=str(documents[1]["_id"]), gzip=True))
+
+        lines = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+        assert [line["_id"] for line in lines] == [str(document["_id"]) for document in documents[2:]]
+
+    @pytest.mark.asyncio
+    async def test_cursor_error_ends_with_an_error_line(self):
+        """Test that a failing cursor ends the stream with the products read and an error line"""
+        documents = products(3)
+        repository = FakeRepository(documents, error=RuntimeError("cursor killed"))
+
+        body = await read(await ExportProducts(repository, SETTINGS).export())
+
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert [line["_id"] for line in lines[:-1]] == [str(document["_id"]) for document in documents]
+        assert lines[-1] == {"error": "Export interrupted", "after": str(documents[2]["_id"])}
+
+    @pytest.mark.asyncio
+    async def test_gzip_stream_is_finished_after_an_error(self):
+        """Test that a failed gzip export still decompresses, ending with the error line"""
+        documents = products(1)
+        repository = FakeRepository(documents, error=RuntimeError("cursor killed"))
+
+        body = await read(await ExportProducts(repository, SETTINGS).export(gzip=True))
+
+        lines = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+        assert lines[-1] == {"error": "Export interrupted", "after": str(documents[0]["_id"])}
+
+    def test_id_value_keeps_object_ids(self):
+        """Test that resume ids are matched against the stored _id type"""
+        object_id = ObjectId()
+
+        assert ProductsRepository.id_value(str(object_id)) == object_id
+        assert ProductsRepository.id_value("sku-1") == "sku-1"
+
+    def test_export_endpoint(self):
+        """Test that the endpoint streams NDJSON, gzip encoded on request"""
+        documents = products(3)
+        app.dependency_overrides[get_export_products_controller] = lambda: ExportProducts(
+            FakeRepository(documents), SETTINGS)
+        try:
+            client = TestClient(app)
+            plain = client.get("/api-inventory/products/export/")
+            compressed = client.get("/api-inventory/products/export/", params={"gzip": "true"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert plain.headers["content-type"] == "application/x-ndjson"
+        assert len(plain.text.splitlines()) == 3
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert compressed.text == plain.text
@@ -0,0 +1,117 @@
+import sys
+import os
+import json
+import pytest
+import httpx
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.http_client import UpstreamClient
+from src.utils.cache import ProductCache
+from src.controllers.get_products_controllers import GetProducts
+from src.controllers.update_products_controllers import UpdateProducts
+from src.entities.products_entities import Product
+from src.utils.settings import config
+
+
+SETTINGS = {
+    **config["ms_product"],
+    "base_url": "http://ms-product:8000",
+    "timeout": 5.0,
+    "max_connections": 10,
+    "max_keepalive_connections": 5,
+    "keepalive_expiry": 30.0,
+    "http2": False,
+    "retry_backoff_base": 0.001,
+    "retry_backoff_max": 0.002,
+    "hedge_enabled": False
+}
+
+
+def build_client(handler):
+    return UpstreamClient(settings=SETTINGS, transport=httpx.MockTransport(handler))
+
+
+class TestUpstreamClient:
+    """Test cases for the shared upstream client"""
+
+    @pytest.mark.asyncio
+    async def test_client_is_reused_between_calls(self):
+        """Test that every call goes through the same pooled client"""
+        client = build_client(lambda request: httpx.Response(200, json={}))
+        await client.post("/api-products/product/", {})
+        first = client.client
+        await client.post("/api-products/product/", {})
+
+        assert client.client is first
+        assert client.stats()["requests_total"] == 2
+        await client.close()
+        assert client.client is None
+
+    @pytest.mark.asyncio
+    async def test_post_uses_base_url_and_json_body(self):
+        """Test that requests are sent relative to the ms-product base url"""
+        seen = {}
+
+        def handler(request):
+            seen["url"] = str(request.url)
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, json={"ok": True})
+
+        client = build_client(handler)
+        response = await client.post("/api-products/product/", {"product": {"id": "1"}})
+
+        assert response.json() == {"ok": True}
+        assert seen["url"] == "http://ms-product:8000/api-products/product/"
+        assert seen["body"] == {"product": {"id": "1"}}
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_errors_are_counted(self):
+        """Test that transport errors are reported in the stats"""
+        def handler(request):
+            raise httpx.ConnectError("connection refused")
+
+        client = build_client(handler)
+        with pytest.raises(httpx.ConnectError):
+            await client.post("/api-products/product/", {})
+
+        stats = client.stats()
+        assert stats["errors_total"] == 1
+        assert stats["in_flight"] == 0
+        await client.close()
+
+
+class TestControllersWithUpstreamClient:
+    """Test cases for controllers using an injected upstream client"""
+
+    @pytest.mark.asyncio
+    async def test_get_products_uses_injected_client(self):
+        """Test that GetProducts sends the product payload through the client"""
+        client = build_client(lambda request: httpx.Response(200, json={"products": []}))
+        product_id = Product(product={"id": "test-product-id-123"})
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=True)
+
+        result = await GetProducts(product_id, client=client, cache=cache).get_products()
+
+        assert result == {"products": []}
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_update_product_accepts_plain_dict(self):
+        """Test that UpdateProducts forwards the dict built by the service layer"""
+        seen = {}
+
+        def handler(request):
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, json={"result": "success"})
+
+        client = build_client(handler)
+        product_data = {"product": {"id": "test-product-id-123"}}
+
+        result = await UpdateProducts(product_data, client=client).update_product()
+
+        assert result == {"result": "success"}
+        assert seen["body"] == product_data
+        await client.close()
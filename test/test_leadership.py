@@ -0,0 +1,328 @@
+import sys
+import os
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.launcher import parse_args, server_options
+from src.repository.products_repository import ProductsRepository
+from src.utils.event_bus import ChangeEventBus
+from src.utils.event_pipeline import ChangeEventPipeline
+from src.utils.leadership import LeaderElection
+
+
+SETTINGS = {
+    "leader_election": True,
+    "lease_ttl": 15.0,
+    "lease_renew_interval": 0.01,
+    "bus_size_bytes": 1024,
+    "bus_poll_interval": 0.01
+}
+
+PIPELINE_SETTINGS = {"queue_size": 10, "batch_size": 10, "batch_window": 0.01, "workers": 1}
+
+
+class InMemoryLeaseRepository(ProductsRepository):
+    """Lease and event bus storage shared by several fake workers"""
+
+    def __init__(self):
+        super().__init__(client_manager=None)
+        self.leases = {}
+        self.bus = []
+        self.fail = False
+
+    async def acquire_lease(self, name, owner, ttl_seconds):
+        if self.fail:
+            raise ConnectionError("mongo down")
+        now = datetime.now(timezone.utc)
+        lease = self.leases.get(name)
+        if lease is not None and lease["owner"] != owner and lease["expires_at"] > now:
+            return None
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        self.leases[name] = {"owner": owner, "expires_at": expires_at}
+        return expires_at
+
+    async def release_lease(self, name, owner):
+        lease = self.leases.get(name)
+        if lease is not None and lease["owner"] == owner:
+            lease["expires_at"] = datetime.fromtimestamp(0, timezone.utc)
+
+    async def ensure_event_bus(self, size_bytes):
+        pass
+
+    async def publish_events(self, origin, changes):
+        if self.fail:
+            raise ConnectionError("mongo down")
+        # Client generated ids do not follow the insertion order
+        self.bus.append({"_id": f"entry-{len(self.bus) % 3}-{len(self.bus)}", "origin": origin, "changes": changes})
+
+    async def last_event_bus_id(self):
+        return self.bus[-1]["_id"] if self.bus else None
+
+    async def has_event_bus_entry(self, entry_id):
+        return any(entry["_id"] == entry_id for entry in self.bus)
+
+    def tail_event_bus(self):
+        self.cursor = TailCursor(self.bus)
+        return self.cursor
+
+
+class TailCursor:
+    """Tailable cursor over a list: an empty batch ends the iteration but not the cursor"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.position = 0
+        self.alive = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.alive or self.position >= len(self.entries):
+            raise StopAsyncIteration
+        self.position += 1
+        return self.entries[self.position - 1]
+
+
+class RecordingLeases:
+    """Lease collection answering with a fixed document and recording the request"""
+
+    def __init__(self, lease):
+        self.lease = lease
+        self.calls = []
+
+    async def find_one_and_update(self, query, update, **options):
+        self.calls.append((query, update))
+        return self.lease
+
+
+class LeaseCollectionRepository(ProductsRepository):
+    def __init__(self, collection):
+        super().__init__(client_manager=None)
+        self.collection = collection
+
+    def get_lease_collection(self):
+        return self.collection
+
+
+def change(document_id):
+    return {
+        "_id": {"_data": "token"},
+        "operationType": "update",
+        "documentKey": {"_id": document_id},
+        "updateDescription": {"updatedFields": {"price": 1}, "removedFields": []}
+    }
+
+
+class TestLeaderElection:
+    """Test cases for the lease based leader election"""
+
+    def election(self, repository, worker_id):
+        election = LeaderElection(repository, SETTINGS, worker_id=worker_id)
+        election.roles = []
+
+        async def elected():
+            election.roles.append("leader")
+
+        async def demoted():
+            election.roles.append("follower")
+
+        election.on_elected.append(elected)
+        election.on_demoted.append(demoted)
+        return election
+
+    @pytest.mark.asyncio
+    async def test_only_one_worker_is_elected(self):
+        """Test that a live lease keeps every other candidate as a follower"""
+        repository = InMemoryLeaseRepository()
+        first = self.election(repository, "worker-1")
+        second = self.election(repository, "worker-2")
+
+        await first.campaign()
+        await second.campaign()
+        await first.campaign()
+
+        assert first.is_leader is True
+        assert second.is_leader is False
+        assert first.roles == ["leader"]
+        assert second.roles == []
+
+    @pytest.mark.asyncio
+    async def test_stop_hands_the_lease_over(self):
+        """Test that a stopping leader releases the lease for the next candidate"""
+        repository = InMemoryLeaseRepository()
+        first = self.election(repository, "worker-1")
+        second = self.election(repository, "worker-2")
+        await first.campaign()
+
+        await first.stop()
+        await second.campaign()
+
+        assert first.roles == ["leader", "follower"]
+        assert second.is_leader is True
+        assert repository.leases[LeaderElection.LEASE_NAME]["owner"] == "worker-2"
+
+    @pytest.mark.asyncio
+    async def test_lease_lost_to_another_worker_demotes(self):
+        """Test that a leader whose lease was taken over steps down"""
+        repository = InMemoryLeaseRepository()
+        first = self.election(repository, "worker-1")
+        await first.campaign()
+        repository.leases[LeaderElection.LEASE_NAME] = {
+            "owner": "worker-2", "expires_at": datetime.now(timezone.utc) + timedelta(seconds=15)}
+
+        await first.campaign()
+
+        assert first.is_leader is False
+        assert first.roles == ["leader", "follower"]
+
+    @pytest.mark.asyncio
+    async def test_renewal_errors_keep_leading_until_the_lease_expires(self):
+        """Test that a failed renewal only demotes once the held lease has expired"""
+        repository = InMemoryLeaseRepository()
+        first = self.election(repository, "worker-1")
+        await first.campaign()
+        repository.fail = True
+
+        await first.campaign()
+        assert first.is_leader is True
+
+        first.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await first.campaign()
+        assert first.is_leader is False
+        assert first.errors_total == 2
+
+
+    @pytest.mark.asyncio
+    async def test_lease_expiry_uses_the_server_clock(self):
+        """Test that the lease is granted and extended with $$NOW, not the worker clock"""
+        server_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        leases = RecordingLeases({"_id": "lease", "owner": "worker-1", "expires_at": server_time})
+        started = datetime.now(timezone.utc)
+
+        expires_at = await LeaseCollectionRepository(leases).acquire_lease("lease", "worker-1", 15.0)
+
+        query, update = leases.calls[0]
+        assert query["$or"][1] == {"$expr": {"$lte": ["$expires_at", "$$NOW"]}}
+        assert update[0]["$set"]["expires_at"] == {"$add": ["$$NOW", 15000]}
+        # Measured from before the request, whatever time the server keeps
+        assert started <= expires_at - timedelta(seconds=15) <= datetime.now(timezone.utc)
+
+        leases.lease = {"_id": "lease", "owner": "worker-2", "expires_at": server_time}
+        assert await LeaseCollectionRepository(leases).acquire_lease("lease", "worker-1", 15.0) is None
+
+
+class TestChangeEventBus:
+    """Test cases for the event bus shared by the workers"""
+
+    @pytest.mark.asyncio
+    async def test_publish_strips_the_resume_token(self):
+        """Test that published changes keep only the fields other workers need"""
+        repository = InMemoryLeaseRepository()
+        bus = ChangeEventBus(repository, SETTINGS, ChangeEventPipeline(PIPELINE_SETTINGS), worker_id="worker-1")
+
+        await bus.publish([change("a")])
+
+        entry = repository.bus[0]
+        assert entry["origin"] == "worker-1"
+        assert "_id" not in entry["changes"][0]
+        assert entry["changes"][0]["documentKey"] == {"_id": "a"}
+        assert bus.published_total == 1
+
+    @pytest.mark.asyncio
+    async def test_publish_is_disabled_without_leader_election(self):
+        """Test that a single worker does not write to the bus"""
+        repository = InMemoryLeaseRepository()
+        bus = ChangeEventBus(repository, {**SETTINGS, "leader_election": False},
+                             ChangeEventPipeline(PIPELINE_SETTINGS), worker_id="worker-1")
+
+        await bus.publish([change("a")])
+
+        assert repository.bus == []
+
+    @pytest.mark.asyncio
+    async def test_tailer_delivers_changes_from_other_workers(self):
+        """Test that every worker receives the changes published by the others, but not its own"""
+        repository = InMemoryLeaseRepository()
+        await repository.publish_events("worker-1", [{"documentKey": {"_id": "old"}}])
+        bus = ChangeEventBus(repository, SETTINGS, ChangeEventPipeline(PIPELINE_SETTINGS), worker_id="worker-2")
+        received = []
+
+        async def consumer(changes):
+            received.extend(changes)
+
+        bus.subscribe(consumer)
+        bus.subscribe(consumer)
+        task = asyncio.create_task(bus.run())
+        await asyncio.sleep(0.03)
+        await repository.publish_events("worker-2", [{"documentKey": {"_id": "own"}}])
+        await repository.publish_events("worker-1", [{"documentKey": {"_id": "b"}}])
+        await asyncio.sleep(0.05)
+        bus.stop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert received == [{"documentKey": {"_id": "b"}}]
+        assert bus.received_total == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_resets_the_other_workers(self):
+        """Test that the entry after a batch that could not be published starts with a reset"""
+        repository = InMemoryLeaseRepository()
+        bus = ChangeEventBus(repository, SETTINGS, ChangeEventPipeline(PIPELINE_SETTINGS), worker_id="worker-1")
+
+        repository.fail = True
+        with pytest.raises(ConnectionError):
+            await bus.publish([change("a")])
+        repository.fail = False
+        await bus.publish([change("b")])
+        await bus.publish([change("c")])
+
+        assert [c.get("operationType") for c in repository.bus[0]["changes"]] == ["invalidate", "update"]
+        assert repository.bus[0]["changes"][1]["documentKey"] == {"_id": "b"}
+        assert len(repository.bus[1]["changes"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_lost_position_resets_the_consumers(self):
+        """Test that a worker whose last entry was overwritten drops its state and goes on from the newest one"""
+        repository = InMemoryLeaseRepository()
+        await repository.publish_events("worker-1", [{"documentKey": {"_id": "a"}}])
+        bus = ChangeEventBus(repository, SETTINGS, ChangeEventPipeline(PIPELINE_SETTINGS), worker_id="worker-2")
+        received = []
+
+        async def consumer(changes):
+            received.extend(changes)
+
+        bus.subscribe(consumer)
+        bus.last_id = await repository.last_event_bus_id()
+        await bus.read()
+        await repository.publish_events("worker-1", [{"documentKey": {"_id": "b"}}])
+        await bus.read()
+        # The capped collection wraps past the position and the cursor dies
+        await repository.publish_events("worker-1", [{"documentKey": {"_id": "c"}}])
+        del repository.bus[:3]
+        repository.cursor.alive = False
+        await bus.read()
+        await repository.publish_events("worker-1", [{"documentKey": {"_id": "d"}}])
+        await bus.read()
+
+        assert received == [{"documentKey": {"_id": "b"}}, {"operationType": "invalidate"}, {"documentKey": {"_id": "d"}}]
+        assert bus.stats()["resets_total"] == 1
+
+
+class TestLauncher:
+    """Test cases for the multi worker launcher"""
+
+    def test_server_options(self):
+        """Test that the launcher passes the worker count and address to uvicorn"""
+        options = server_options(parse_args(["--workers", "4", "--host", "127.0.0.1", "--port", "9000"]))
+
+        assert options["workers"] == 4
+        assert options["host"] == "127.0.0.1"
+        assert options["port"] == 9000
+        assert options["loop"] in ("uvloop", "auto")
+        assert options["http"] in ("httptools", "auto")
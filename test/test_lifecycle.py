@@ -0,0 +1,209 @@
+import sys
+import os
+import asyncio
+import signal
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+from src.utils.broadcaster import ChangeBroadcaster
+from src.utils.container import Container, get_lifecycle
+from src.utils import events
+from src.utils.event_pipeline import ChangeEventPipeline
+from src.utils.events import EventHandler
+from src.utils.lifecycle import DrainMiddleware, HealthProbe, Lifecycle
+
+
+SETTINGS = {"warmup_timeout": 0.5, "warmup_product_ids": [], "probe_ttl": 60.0, "probe_timeout": 0.05,
+            "drain_timeout": 0.5}
+
+
+def probe(name, healthy=True, delay=0.0):
+    calls = []
+
+    async def check():
+        calls.append(name)
+        await asyncio.sleep(delay)
+        if not healthy:
+            raise ConnectionError(f"{name} unreachable")
+
+    health_probe = HealthProbe(name, check, SETTINGS["probe_ttl"], SETTINGS["probe_timeout"])
+    health_probe.calls = calls
+    return health_probe
+
+
+class TestHealthProbe:
+    """Test cases for the cached dependency probes"""
+
+    @pytest.mark.asyncio
+    async def test_result_is_cached(self):
+        """Test that concurrent and repeated health checks run the probe once"""
+        mongo = probe("mongo", delay=0.01)
+
+        results = await asyncio.gather(*(mongo.result() for _ in range(5)))
+        again = await mongo.result()
+
+        assert mongo.calls == ["mongo"]
+        assert all(result["status"] == "up" for result in results)
+        assert again is results[0]
+
+    @pytest.mark.asyncio
+    async def test_failures_and_timeouts_are_down(self):
+        """Test that errors and slow dependencies are reported as down"""
+        failing = await probe("mongo", healthy=False).result()
+        slow = await probe("ms_product", delay=1.0).result()
+
+        assert failing["status"] == "down"
+        assert failing["error"] == "mongo unreachable"
+        assert slow["status"] == "down"
+        assert "timed out" in slow["error"]
+
+
+class TestLifecycle:
+    """Test cases for the startup and shutdown lifecycle"""
+
+    @pytest.mark.asyncio
+    async def test_ready_only_after_warm_up(self):
+        """Test that readiness waits for warm-up, even when a warm-up step fails"""
+        lifecycle = Lifecycle(SETTINGS, [probe("mongo")])
+        ready, report = await lifecycle.readiness()
+        assert ready is False
+        assert report["state"] == "starting"
+
+        async def failing_step():
+            raise ConnectionError("ms-product unreachable")
+
+        await lifecycle.warm_up([("cache", failing_step())])
+        ready, report = await lifecycle.readiness()
+
+        assert ready is True
+        assert report["checks"]["mongo"]["status"] == "up"
+
+    @pytest.mark.asyncio
+    async def test_not_ready_when_a_dependency_is_down(self):
+        """Test that one failing probe makes the service not ready"""
+        lifecycle = Lifecycle(SETTINGS, [probe("mongo"), probe("ms_product", healthy=False)])
+        await lifecycle.warm_up([])
+
+        ready, report = await lifecycle.readiness()
+
+        assert ready is False
+        assert report["checks"]["ms_product"]["status"] == "down"
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_for_requests_in_flight(self):
+        """Test that draining rejects new requests and waits for the ones in flight"""
+        lifecycle = Lifecycle(SETTINGS)
+        await lifecycle.warm_up([])
+        release = asyncio.Event()
+        sent = []
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = DrainMiddleware(slow_app, lifecycle)
+        in_flight = asyncio.create_task(middleware({"type": "http"}, None, send))
+        await asyncio.sleep(0)
+        assert lifecycle.in_flight == 1
+
+        lifecycle.drain()
+        await middleware({"type": "http"}, None, send)
+        waiting = asyncio.create_task(lifecycle.wait_idle())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+
+        release.set()
+        await in_flight
+        await waiting
+
+        assert [message.get("status") for message in sent if "status" in message] == [503, 200]
+        assert lifecycle.in_flight == 0
+        assert lifecycle.rejected_total == 1
+        assert lifecycle.ready is False
+
+    @pytest.mark.asyncio
+    async def test_signal_starts_draining(self):
+        """Test that SIGTERM drains and closes the subscribers before uvicorn's own handler runs"""
+        lifecycle = Lifecycle(SETTINGS)
+        await lifecycle.warm_up([])
+        broadcaster = ChangeBroadcaster({"queue_size": 10, "slow_consumer": "drop", "heartbeat_interval": 15.0,
+                                         "max_subscribers": 10},
+                                        ChangeEventPipeline({"queue_size": 10, "batch_size": 10,
+                                                             "batch_window": 0.01, "workers": 1}))
+        subscriber = broadcaster.subscribe()
+        container = Container(lifecycle=lifecycle, broadcaster=broadcaster)
+        received = []
+        interrupt = signal.getsignal(signal.SIGINT)
+        original = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+        try:
+            container.install_signal_handlers()
+            signal.raise_signal(signal.SIGTERM)
+            await asyncio.sleep(0)
+        finally:
+            signal.signal(signal.SIGTERM, original)
+            signal.signal(signal.SIGINT, interrupt)
+
+        assert received == [signal.SIGTERM]
+        assert lifecycle.draining
+        assert subscriber.closed
+        assert broadcaster.stats()["subscribers"] == 0
+
+    @pytest.mark.asyncio
+    async def test_not_ready_until_indexes_exist(self, monkeypatch):
+        """Test that failed index creation is retried and keeps the indexes probe down meanwhile"""
+        attempts = []
+
+        class Repository:
+            async def ensure_indexes(self):
+                attempts.append(1)
+                if len(attempts) < 3:
+                    raise ConnectionError("mongo unreachable")
+
+        monkeypatch.setattr(events, "INDEX_RETRY_SECONDS", 0.01)
+        handler = EventHandler(repository=Repository())
+        indexes = HealthProbe("indexes", handler.check_indexes, ttl=0.0)
+
+        assert await handler.ensure_indexes() is False
+        assert (await indexes.result())["status"] == "down"
+        await asyncio.wait_for(handler.retry_indexes(), timeout=1)
+
+        assert len(attempts) == 3
+        assert (await indexes.result())["status"] == "up"
+
+
+class TestHealthEndpoints:
+    """Test cases for the liveness and readiness endpoints"""
+
+    def request(self, path, lifecycle):
+        app.dependency_overrides[get_lifecycle] = lambda: lifecycle
+        try:
+            return TestClient(app).get(path)
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_liveness(self):
+        """Test that liveness answers while the service is still starting"""
+        response = self.request("/api-inventory/health/live", Lifecycle(SETTINGS, [probe("mongo", healthy=False)]))
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "alive", "state": "starting"}
+
+    def test_readiness(self):
+        """Test that readiness is 503 until warm-up is done and every dependency is up"""
+        lifecycle = Lifecycle(SETTINGS, [probe("mongo")])
+
+        starting = self.request("/api-inventory/health/ready", lifecycle)
+        asyncio.run(lifecycle.warm_up([]))
+        ready = self.request("/api-inventory/health/ready", lifecycle)
+
+        assert starting.status_code == 503
+        assert starting.json()["status"] == "not_ready"
+        assert ready.status_code == 200
+        assert ready.json()["checks"]["mongo"]["status"] == "up"
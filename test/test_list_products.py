@@ -0,0 +1,130 @@
+import sys
+import os
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.controllers.list_products_controllers import ListProducts
+from src.repository.products_repository import ProductsRepository
+from src.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from test.conftest import FakeCollection
+
+
+SETTINGS = {"default_limit": 2, "max_limit": 3, "projection": []}
+
+
+class FakeRepository(ProductsRepository):
+    """The real listing queries run against a collection kept in a list"""
+
+    def __init__(self, documents):
+        super().__init__(client_manager=None)
+        self.documents = documents
+        self.collection = FakeCollection(documents)
+
+    def get_read_collection(self):
+        return self.collection
+
+
+def catalogue():
+    names = ["apple", "apricot", "banana", "avocado", "cherry", "almond"]
+    prices = [5, 3, 5, 8, 1, 3]
+    return [{"_id": ObjectId(), "name": name, "price": price} for name, price in zip(names, prices)]
+
+
+async def all_pages(controller, **filters):
+    pages = []
+    cursor = None
+    while True:
+        page = await controller.list_products(cursor=cursor, **filters)
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+class TestListProducts:
+    """Test cases for the keyset paginated product listing"""
+
+    def test_cursor_round_trip(self):
+        """Test that cursors keep the value types and are bound to their sort"""
+        object_id = ObjectId()
+        cursor = encode_cursor("price", 9.5, object_id)
+
+        assert decode_cursor(cursor, "price") == (9.5, object_id)
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor, "name")
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor", "price")
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_every_product_once(self):
+        """Test that pages sorted by price with ties on _id neither skip nor repeat products"""
+        documents = catalogue()
+        controller = ListProducts(FakeRepository(documents), SETTINGS)
+
+        pages = await all_pages(controller, sort="price")
+
+        listed = [item["_id"] for page in pages for item in page]
+        expected = sorted(documents, key=lambda document: (document["price"], document["_id"]))
+        assert listed == [str(document["_id"]) for document in expected]
+        assert [len(page) for page in pages] == [2, 2, 2]
+
+    @pytest.mark.asyncio
+    async def test_filters_by_name_prefix_and_price(self):
+        """Test that name prefix and price range filters combine"""
+        controller = ListProducts(FakeRepository(catalogue()), SETTINGS)
+
+        pages = await all_pages(controller, name_prefix="a", min_price=3, max_price=5, sort="name")
+
+        assert [item["name"] for page in pages for item in page] == ["almond", "apple", "apricot"]
+
+    @pytest.mark.asyncio
+    async def test_invalid_sort_and_limit(self):
+        """Test that unknown sorts are rejected and limits capped"""
+        repository = FakeRepository(catalogue())
+        controller = ListProducts(repository, SETTINGS)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await controller.list_products(sort="stock")
+        assert exc_info.value.status_code == 422
+        page = await controller.list_products(limit=100)
+        assert len(page["items"]) == 3
+
+    def test_keyset_query_uses_last_value(self):
+        """Test that the next page query starts after the last sort value and _id"""
+        object_id = ObjectId()
+
+        query = ProductsRepository.listing_query(sort_key="name", after=("b", object_id))
+
+        assert query == {"$and": [
+            {"name": {"$ne": None}},
+            {"$or": [{"name": {"$gt": "b"}}, {"name": "b", "_id": {"$gt": object_id}}]}
+        ]}
+
+    @pytest.mark.asyncio
+    async def test_products_without_sort_value_are_left_out(self):
+        """Test that null or missing sort values neither break the order nor repeat pages"""
+        documents = catalogue() + [{"_id": ObjectId(), "name": "durian", "price": None},
+                                   {"_id": ObjectId(), "name": "elderberry"}]
+        controller = ListProducts(FakeRepository(documents), SETTINGS)
+
+        pages = await all_pages(controller, sort="price")
+
+        names = [item["name"] for page in pages for item in page]
+        assert len(names) == len(set(names)) == 6
+        assert "durian" not in names and "elderberry" not in names
+
+    @pytest.mark.asyncio
+    async def test_projection_keeps_the_sort_key(self):
+        """Test that the repository adds the sort field to a projection so the next cursor can be built"""
+        repository = FakeRepository(catalogue())
+        controller = ListProducts(repository, SETTINGS)
+
+        page = await controller.list_products(sort="price", fields=["name"])
+
+        assert repository.collection.queries[0][1] == ["name", "price"]
+        assert set(page["items"][0]) == {"_id", "name", "price"}
+        assert page["next_cursor"] is not None
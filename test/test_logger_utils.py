@@ -0,0 +1,86 @@
+import sys
+import os
+import io
+import json
+import pytest
+import structlog
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils import logger_utils
+from src.utils.logger_utils import EventSampler, QueueLogger, ValueTruncator, configure_logging
+from src.utils.settings import config
+
+
+class Payload:
+    """Object counting how many times it is rendered"""
+
+    def __init__(self):
+        self.renders = 0
+
+    def __repr__(self):
+        self.renders += 1
+        return "payload"
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    yield stream, {**config["logging"], "level": "info", "format": "json", "sample_rate": 1.0}
+    configure_logging()
+
+
+class TestLogging:
+    """Test cases for the structured logging pipeline"""
+
+    def test_values_are_truncated(self):
+        """Test that long payloads are cut to the configured length"""
+        event = ValueTruncator(max_length=5)(None, "info", {"event": "x", "payload": {"a": "b" * 50}, "count": 3})
+
+        assert event["payload"].startswith("{'a':")
+        assert event["payload"].endswith("chars)")
+        assert event["count"] == 3
+
+    def test_tracebacks_are_not_truncated(self):
+        """Test that the trace of an error keeps the exception line at its end"""
+        trace = "Traceback (most recent call last):\n" + "  frame\n" * 100 + "ValueError: boom\n"
+        event = ValueTruncator(max_length=5)(None, "error", {"event": "x", "trace": trace, "error": "boom" * 10})
+
+        assert event["trace"] == trace
+        assert event["error"].endswith("chars)")
+
+    def test_sampler_only_drops_listed_info_events(self):
+        """Test that sampling applies to listed info events and never to errors"""
+        sampler = EventSampler(rate=0.0, events=["hot"])
+
+        with pytest.raises(structlog.DropEvent):
+            sampler(None, "info", {"event": "hot"})
+        assert sampler(None, "error", {"event": "hot"}) == {"event": "hot"}
+        assert sampler(None, "info", {"event": "cold"}) == {"event": "cold"}
+
+    def test_queue_logger_writes_in_background(self):
+        """Test that queued lines are written by the writer thread"""
+        stream = io.StringIO()
+        output = QueueLogger(stream)
+        output.info("first")
+        output.error("second")
+        output.close()
+
+        assert stream.getvalue() == "first\nsecond\n"
+
+    def test_filtered_events_are_not_rendered(self, log_stream):
+        """Test that payloads of events below the level are never formatted"""
+        stream, settings = log_stream
+        output = configure_logging(settings, stream)
+        logger = logger_utils.Log().logger
+        payload = Payload()
+
+        logger.debug("Dropped", payload=payload)
+        logger.info("Kept", payload=payload, size=3)
+        output.flush()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [line["event"] for line in lines] == ["Kept"]
+        assert lines[0]["payload"] == "payload"
+        assert payload.renders == 1
@@ -0,0 +1,62 @@
+import sys
+import os
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test cases for the Prometheus metrics registry"""
+
+    def test_counter_children_are_reused(self):
+        """Test that labels() returns the same child for the same labels"""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ("route",))
+        child = counter.labels("/products/")
+        child.inc()
+
+        assert counter.labels("/products/") is child
+        assert 'requests_total{route="/products/"} 1.0' in registry.render()
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test that histogram buckets are cumulative and include +Inf"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        child = histogram.labels("/products/")
+        child.observe(0.05)
+        child.observe(0.5)
+        child.observe(5)
+
+        output = registry.render()
+        assert 'latency_seconds_bucket{route="/products/",le="0.1"} 1.0' in output
+        assert 'latency_seconds_bucket{route="/products/",le="1.0"} 2.0' in output
+        assert 'latency_seconds_bucket{route="/products/",le="+Inf"} 3.0' in output
+        assert 'latency_seconds_count{route="/products/"} 3.0' in output
+        assert "# TYPE latency_seconds histogram" in output
+
+    def test_callback_metrics_are_read_at_render(self):
+        """Test that callback metrics read their value when rendered"""
+        registry = MetricsRegistry()
+        state = {"value": 1}
+        registry.callback("queue_depth", "Depth", "gauge", (), lambda: [((), state["value"])])
+        state["value"] = 7
+
+        assert "queue_depth 7.0" in registry.render()
+
+
+class TestMetricsEndpoint:
+    """Test cases for the /metrics endpoint"""
+
+    def test_route_metrics_are_exposed(self, client):
+        """Test that requests to instrumented routes show up in /metrics"""
+        client.get("/api-inventory/health/")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'inventory_http_requests_total{method="GET",route="/api-inventory/health/",status="200"}' in response.text
+        assert "inventory_http_request_duration_seconds_bucket" in response.text
+        assert "inventory_change_events_total" in response.text
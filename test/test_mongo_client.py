@@ -0,0 +1,64 @@
+import sys
+import os
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.repository.mongo_client import MongoClientManager, PoolMetricsListener
+
+
+SETTINGS = {
+    "connection": "mongodb://localhost:27017",
+    "max_pool_size": 50,
+    "min_pool_size": 5,
+    "max_idle_time_ms": 30000,
+    "read_preference": "secondaryPreferred",
+    "write_concern": "majority",
+    "write_concern_timeout_ms": 2000
+}
+
+
+class TestMongoClientManager:
+    """Test cases for the process-wide Motor client"""
+
+    @pytest.mark.asyncio
+    async def test_client_is_created_once_with_settings(self):
+        """Test that the manager builds one client with the configured pool"""
+        manager = MongoClientManager(SETTINGS)
+        await manager.start()
+        client = manager.get_client()
+
+        assert manager.get_client() is client
+        assert client.options.pool_options.max_pool_size == 50
+        assert client.options.pool_options.min_pool_size == 5
+        assert client.write_concern.document["w"] == "majority"
+        assert manager.read_preference.mongos_mode == "secondaryPreferred"
+
+        await manager.close()
+        assert manager.client is None
+
+    def test_numeric_write_concern(self):
+        """Test that numeric write concerns are passed as integers"""
+        manager = MongoClientManager({**SETTINGS, "write_concern": "1"})
+
+        assert manager.get_client().write_concern.document["w"] == 1
+
+
+class TestPoolMetricsListener:
+    """Test cases for pool checkout metrics"""
+
+    def test_checkouts_are_tracked(self):
+        """Test that checked out connections are counted as a gauge"""
+        listener = PoolMetricsListener()
+        listener.connection_created(None)
+        listener.connection_checked_out(None)
+        listener.connection_checked_out(None)
+        listener.connection_checked_in(None)
+        listener.connection_check_out_failed(None)
+
+        stats = listener.stats()
+        assert stats["checkouts"] == 2
+        assert stats["checked_out"] == 1
+        assert stats["checkout_failures"] == 1
+        assert stats["open_connections"] == 1
@@ -0,0 +1,97 @@
+import sys
+import os
+import pytest
+from datetime import datetime, timezone
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+from src.repository.products_repository import ProductsRepository
+from src.utils.cache import ProductCache
+from src.utils.serialization import to_json_compatible
+
+
+MONGO_SETTINGS = {"mode": "mongo", "projection": ["name", "price"]}
+
+
+class FakeRepository:
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = []
+
+    async def find_product(self, product_id, projection=None, primary=False):
+        self.calls.append((product_id, projection, primary))
+        return self.documents.get(product_id)
+
+
+class FailingClient:
+    async def post(self, path, payload):
+        raise AssertionError("ms-product must not be called in mongo read mode")
+
+
+class TestMongoReadPath:
+    """Test cases for the direct Mongo read path of GetProducts"""
+
+    @pytest.mark.asyncio
+    async def test_reads_product_from_repository(self):
+        """Test that mongo mode reads the collection and skips ms-product"""
+        object_id = ObjectId()
+        repository = FakeRepository({str(object_id): {"_id": object_id, "name": "pages", "price": 10}})
+        controller = GetProducts(
+            Product(product={"id": str(object_id)}),
+            client=FailingClient(),
+            cache=ProductCache(max_size=10, ttl_seconds=60, enabled=True),
+            repository=repository,
+            settings=MONGO_SETTINGS
+        )
+
+        result = await controller.get_products()
+
+        assert result == {"data": {"product": {"_id": str(object_id), "name": "pages", "price": 10}}}
+        assert repository.calls == [(str(object_id), ["name", "price"], True)]
+
+    @pytest.mark.asyncio
+    async def test_missing_product_is_not_found(self):
+        """Test that an unknown id answers 404 in mongo mode"""
+        controller = GetProducts(
+            Product(product={"id": "unknown"}),
+            client=FailingClient(),
+            cache=ProductCache(max_size=10, ttl_seconds=60, enabled=True),
+            repository=FakeRepository({}),
+            settings=MONGO_SETTINGS
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await controller.get_products()
+
+        assert exc_info.value.status_code == 404
+
+
+class TestProductsRepositoryQueries:
+    """Test cases for repository lookup filters"""
+
+    def test_object_id_matches_primary_key(self):
+        """Test that ObjectId strings are looked up by _id"""
+        object_id = ObjectId()
+        assert ProductsRepository.product_query(str(object_id)) == {"_id": object_id}
+
+    def test_other_ids_match_id_field(self):
+        """Test that other identifiers are looked up by the id field"""
+        assert ProductsRepository.product_query("sku-1") == {"id": "sku-1"}
+
+
+class TestSerialization:
+    """Test cases for Mongo to JSON conversion"""
+
+    def test_bson_types_are_converted(self):
+        """Test that ObjectId and datetime become strings"""
+        object_id = ObjectId()
+        moment = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        result = to_json_compatible({"_id": object_id, "tags": [{"at": moment}]})
+
+        assert result == {"_id": str(object_id), "tags": [{"at": moment.isoformat()}]}
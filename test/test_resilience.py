@@ -0,0 +1,229 @@
+import sys
+import os
+import asyncio
+import pytest
+import httpx
+from fastapi import HTTPException
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.resilience import CircuitBreaker, CircuitOpenError, RetryBudget, LatencyTracker
+from src.utils.http_client import UpstreamClient
+from src.utils.cache import ProductCache
+from src.utils.single_flight import SingleFlight
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    """Test cases for the circuit breaker state machine"""
+
+    def test_opens_after_threshold_and_probes_after_timeout(self):
+        """Test the closed -> open -> half-open -> closed cycle"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("product", failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_reopens(self):
+        """Test that a failing half-open probe opens the breaker again"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("product", failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.record_failure()
+        clock.now = 5
+        breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["opened_total"] == 2
+
+    def test_released_probe_frees_the_slot(self):
+        """Test that a probe ending without an outcome lets the next call probe"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("product", failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.record_failure()
+        clock.now = 5
+        assert breaker.allow()
+        breaker.release()
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+
+
+class TestRetryBudget:
+    """Test cases for the retry budget"""
+
+    def test_budget_is_exhausted_without_traffic(self):
+        """Test that retries stop once the tokens are spent"""
+        clock = FakeClock()
+        budget = RetryBudget(ratio=0.5, min_per_second=0.1, clock=clock)
+        allowed = sum(1 for _ in range(10) if budget.can_retry())
+
+        assert allowed == 1
+        budget.deposit()
+        budget.deposit()
+        assert budget.can_retry()
+
+
+class TestLatencyTracker:
+    """Test cases for the latency percentile tracker"""
+
+    def test_percentile_requires_samples(self):
+        """Test that no percentile is returned before min_samples"""
+        tracker = LatencyTracker(window=10, min_samples=3)
+        tracker.record(0.1)
+        assert tracker.percentile(0.95) is None
+        tracker.record(0.2)
+        tracker.record(0.3)
+        assert tracker.percentile(0.95) == 0.3
+
+
+class TestResilientUpstreamClient:
+    """Test cases for retries, breaker and hedging in UpstreamClient"""
+
+    @pytest.mark.asyncio
+    async def test_connect_errors_are_retried(self, upstream_settings):
+        """Test that a refused connection is retried even for writes"""
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise httpx.ConnectError("connection refused")
+            return httpx.Response(200, json={})
+
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+        response = await client.post("/api-products/delete-product/", {})
+
+        assert response.status_code == 200
+        assert len(attempts) == 2
+        assert client.stats()["retries_total"] == 1
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_server_errors_are_not_retried_for_writes(self, upstream_settings):
+        """Test that 5xx answers of non idempotent calls are returned as is"""
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            return httpx.Response(502, json={})
+
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+        response = await client.post("/api-products/delete-product/", {})
+
+        assert response.status_code == 502
+        assert len(attempts) == 1
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_rejects_calls(self, upstream_settings):
+        """Test that an open breaker short-circuits calls and shows in stats"""
+        settings = {**upstream_settings, "breaker_failure_threshold": 1, "max_retries": 0}
+        client = UpstreamClient(settings=settings, transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+        await client.post("/api-products/product/", {}, idempotent=True)
+
+        with pytest.raises(CircuitOpenError):
+            await client.post("/api-products/product/", {}, idempotent=True)
+        assert client.breaker_states() == {"/api-products/product/": "open"}
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_answers_service_unavailable(self, upstream_settings):
+        """Test that GetProducts maps an open breaker to a 503"""
+        settings = {**upstream_settings, "breaker_failure_threshold": 1, "max_retries": 0}
+        client = UpstreamClient(settings=settings, transport=httpx.MockTransport(lambda request: httpx.Response(500, json={})))
+        client.breaker_for("/api-products/product/").record_failure()
+        controller = GetProducts(
+            Product(product={"id": "1"}),
+            client=client,
+            cache=ProductCache(max_size=10, ttl_seconds=60, enabled=True),
+            single_flight=SingleFlight()
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await controller.get_products()
+
+        assert exc_info.value.status_code == 503
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_does_not_block_the_breaker(self, upstream_settings):
+        """Test that cancelling the half-open probe lets later calls through"""
+        async def handler(request):
+            await asyncio.sleep(1)
+            return httpx.Response(200, json={})
+
+        settings = {**upstream_settings, "breaker_reset_timeout": 0.0, "max_retries": 0}
+        client = UpstreamClient(settings=settings, transport=httpx.MockTransport(handler))
+        breaker = client.breaker_for("/api-products/product/")
+        breaker._open()
+        probe = asyncio.create_task(client.post("/api-products/product/", {}, idempotent=True))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_decoding_error_fails_the_probe(self, upstream_settings):
+        """Test that an error other than a transport error still settles the probe"""
+        def handler(request):
+            raise httpx.DecodingError("bad gzip")
+
+        settings = {**upstream_settings, "breaker_reset_timeout": 0.0, "max_retries": 0}
+        client = UpstreamClient(settings=settings, transport=httpx.MockTransport(handler))
+        breaker = client.breaker_for("/api-products/product/")
+        breaker._open()
+
+        with pytest.raises(httpx.DecodingError):
+            await client.post("/api-products/product/", {}, idempotent=True)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_read_is_hedged(self, upstream_settings):
+        """Test that a read slower than the tracked percentile sends a second request"""
+        attempts = []
+
+        async def handler(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                await asyncio.sleep(1)
+                return httpx.Response(200, json={"from": "slow"})
+            return httpx.Response(200, json={"from": "hedge"})
+
+        settings = {**upstream_settings, "hedge_enabled": True, "hedge_min_samples": 1}
+        client = UpstreamClient(settings=settings, transport=httpx.MockTransport(handler))
+        client.latency_for("/api-products/product/").record(0.01)
+
+        response = await client.post("/api-products/product/", {}, idempotent=True)
+
+        assert response.json() == {"from": "hedge"}
+        assert client.stats()["hedges_total"] == 1
+        await client.close()
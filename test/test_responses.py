@@ -0,0 +1,97 @@
+import sys
+import os
+import json
+import pytest
+import httpx
+from fastapi import HTTPException
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+from src.utils.cache import ProductCache
+from src.utils.http_client import UpstreamClient
+from src.utils.responses import FastJSONResponse, ProductBody, etag_matches, result_envelope
+from src.utils.single_flight import SingleFlight
+
+
+class TestResponses:
+    """Test cases for the JSON response helpers"""
+
+    def test_product_body_decodes_lazily(self):
+        """Test that the raw bytes are only parsed when the data is read"""
+        body = ProductBody(b'{"id": "1"}')
+
+        assert body._data is ProductBody._MISSING
+        assert body.data == {"id": "1"}
+
+    def test_result_envelope_is_valid_json(self):
+        """Test that spliced bytes form the same document as a dumped envelope"""
+        raw = json.dumps({"data": {"product": {"id": "1", "name": "ñandú"}}}).encode("utf-8")
+
+        assert json.loads(result_envelope(raw)) == {"result": json.loads(raw)}
+
+    def test_etag_depends_on_content(self):
+        """Test that equal bodies share an ETag and different bodies do not"""
+        etag = ProductBody(b'{"id": "1"}').etag
+
+        assert etag == ProductBody(b'{"id": "1"}').etag
+        assert etag != ProductBody(b'{"id": "2"}').etag
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+        assert etag_matches(f'{etag[:-1]}-gzip"', etag)
+        assert etag_matches(f'W/{etag[:-1]}-br"', etag)
+        assert not etag_matches(f'{etag[:-1]}-other"', etag)
+
+    def test_fast_json_response_content_type(self):
+        """Test that the fast response keeps the JSONResponse media type"""
+        response = FastJSONResponse(content={"result": [1, 2]})
+
+        assert json.loads(response.body) == {"result": [1, 2]}
+        assert response.headers["content-type"] == "application/json"
+
+    @pytest.mark.asyncio
+    async def test_upstream_bytes_are_kept(self, upstream_settings):
+        """Test that the controller keeps the upstream body bytes untouched"""
+        raw = b'{"data": {"product": {"id": "1"}}}'
+        client = UpstreamClient(
+            settings=upstream_settings,
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=raw, headers={"content-type": "application/json"}))
+        )
+        controller = GetProducts(Product(product={"id": "1"}), client=client, cache=ProductCache(10, 60, True),
+                                 single_flight=SingleFlight())
+
+        body = await controller.get_products_body()
+
+        assert body.raw == raw
+        assert controller.get_cached() is body
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_invalid_upstream_json_is_not_cached(self, upstream_settings):
+        """Test that an empty JSON body fails instead of being spliced and cached"""
+        client = UpstreamClient(
+            settings=upstream_settings,
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=b"", headers={"content-type": "application/json"}))
+        )
+        controller = GetProducts(Product(product={"id": "1"}), client=client, cache=ProductCache(10, 60, True),
+                                 single_flight=SingleFlight())
+
+        with pytest.raises(HTTPException):
+            await controller.get_products_body()
+
+        assert controller.get_cached() is None
+        await client.close()
+
+    def test_validate_keeps_data_lazy(self):
+        """Test that validating a body does not keep the decoded data"""
+        body = ProductBody(b'{"id": "1"}').validate()
+
+        assert body._data is ProductBody._MISSING
+        with pytest.raises(ValueError):
+            ProductBody(b'{"id":').validate()
@@ -0,0 +1,99 @@
+import sys
+import os
+import asyncio
+import pytest
+import httpx
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.utils.single_flight import SingleFlight
+from src.utils.cache import ProductCache
+from src.utils.http_client import UpstreamClient
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+
+
+class TestSingleFlight:
+    """Test cases for single-flight deduplication"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test that identical concurrent calls run the function once"""
+        single_flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(single_flight.do("key", fetch) for _ in range(5)))
+
+        assert results == ["value"] * 5
+        assert len(calls) == 1
+        assert single_flight.stats() == {"in_flight": 0, "leaders": 1, "shared": 4}
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        """Test that a failure is propagated to all waiting callers"""
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(single_flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert single_flight.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Test that cancelling the first caller keeps the shared call running"""
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        first = asyncio.create_task(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "value"
+        assert first.cancelled()
+
+    def test_key_is_independent_of_dict_order(self):
+        """Test that equal payloads produce the same key"""
+        assert SingleFlight.key_for({"a": 1, "b": 2}) == SingleFlight.key_for({"b": 2, "a": 1})
+
+
+class TestGetProductsSingleFlight:
+    """Test cases for single-flight in GetProducts"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_issue_one_upstream_call(self, upstream_settings):
+        """Test that concurrent identical lookups reach ms-product once"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"id": "1"})
+
+        client = UpstreamClient(settings=upstream_settings, transport=httpx.MockTransport(handler))
+        cache = ProductCache(max_size=10, ttl_seconds=60, enabled=False)
+        single_flight = SingleFlight()
+        product_id = Product(product={"id": "1"})
+
+        results = await asyncio.gather(*(
+            GetProducts(product_id, client=client, cache=cache, single_flight=single_flight).get_products()
+            for _ in range(10)
+        ))
+
+        assert results == [{"id": "1"}] * 10
+        assert len(calls) == 1
+        await client.close()
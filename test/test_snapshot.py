@@ -0,0 +1,447 @@
+import sys
+import os
+import asyncio
+import threading
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.controllers.get_products_controllers import GetProducts
+from src.entities.products_entities import Product
+from src.repository.products_repository import ProductsRepository
+from src.services.products_event_services import ProductsEventServices
+from src.utils.cache import ProductCache
+from src.utils.event_pipeline import ChangeEventPipeline
+from src.utils.responses import loads
+from src.utils.snapshot import CatalogueSnapshot, SnapshotFile, SnapshotWriter, product_body
+
+
+PIPELINE_SETTINGS = {"queue_size": 100, "batch_size": 10, "batch_window": 0.01, "workers": 2}
+
+STREAM_SETTINGS = {"resume_collection": "change_stream_resume_tokens", "token_flush_interval": 0.0,
+                   "backoff_initial": 0.001, "backoff_max": 0.002}
+
+
+class InMemoryProducts(ProductsRepository):
+    """Products collection kept in a list"""
+
+    def __init__(self, products):
+        super().__init__(client_manager=None)
+        self.products = products
+        self.scans = 0
+        self.primary_scans = 0
+
+    async def _iterate(self):
+        self.scans += 1
+        for product in self.products:
+            yield product
+
+    def iter_products(self, after=None, projection=None, batch_size=1000, primary=False):
+        self.primary_scans += primary
+        return self._iterate()
+
+
+class FakeSource:
+    """Watcher seen by the snapshot: connected, at a given stream position"""
+
+    def __init__(self, token=None):
+        self.connected = True
+        self.pipeline = ChangeEventPipeline(PIPELINE_SETTINGS)
+        self.pipeline.committed_token = token
+
+
+def build_snapshot(path, products=(), token=None, max_changes=100):
+    settings = {"enabled": True, "path": str(path), "interval": 0.01, "scan_batch_size": 100,
+                "watcher_timeout": 0.1, "max_changes": max_changes}
+    snapshot = CatalogueSnapshot(settings, ChangeEventPipeline(PIPELINE_SETTINGS), InMemoryProducts(list(products)))
+    snapshot.source = FakeSource(token)
+    return snapshot
+
+
+def product(product_id, name, **fields):
+    return {"_id": product_id, "name": name, **fields}
+
+
+def body_name(raw):
+    return loads(raw)["data"]["product"]["name"]
+
+
+class TestSnapshotFile:
+    """Test cases for the snapshot file format"""
+
+    def test_round_trip(self, tmp_path):
+        """Test that products are found by _id and alias with the resume token"""
+        path = tmp_path / "catalogue.snapshot"
+        writer = SnapshotWriter(str(path))
+        for index in range(200):
+            aliases = [f"sku-{index}"] if index % 2 == 0 else []
+            writer.add(str(index), aliases, product_body(product(str(index), f"Product {index}")))
+        writer.finish({"_data": "8263"})
+
+        snapshot_file = SnapshotFile(str(path))
+        try:
+            assert snapshot_file.products == 200
+            assert snapshot_file.resume_token == {"_data": "8263"}
+            primary, raw = snapshot_file.find("sku-42")
+            assert primary == "42"
+            assert body_name(raw) == "Product 42"
+            assert body_name(snapshot_file.find("199")[1]) == "Product 199"
+            assert snapshot_file.find("sku-43") is None
+            assert snapshot_file.find("missing") is None
+            records = {primary: (aliases, body_name(body)) for primary, aliases, body in snapshot_file.records()}
+            assert len(records) == 200
+            assert records["42"] == (["sku-42"], "Product 42")
+            assert records["43"] == ([], "Product 43")
+        finally:
+            snapshot_file.close()
+        assert not os.path.exists(writer.temp_path)
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that a file without the snapshot header is not mapped"""
+        path = tmp_path / "catalogue.snapshot"
+        path.write_bytes(b"not a snapshot" * 10)
+
+        with pytest.raises(ValueError):
+            SnapshotFile(str(path))
+
+
+class TestCatalogueSnapshot:
+    """Test cases for building, updating and reloading the catalogue snapshot"""
+
+    @pytest.mark.asyncio
+    async def test_build_and_warm_start(self, tmp_path):
+        """Test that a new process maps the file written by the leader"""
+        object_id = ObjectId()
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [
+            product(object_id, "Mouse", id="sku-1", price=10.5),
+            product("2", "Keyboard")
+        ], token={"_data": "a1"})
+
+        await snapshot.build()
+
+        assert snapshot.repository.primary_scans == 1
+        restarted = build_snapshot(tmp_path / "catalogue.snapshot")
+        assert restarted.load()
+        assert restarted.resume_token == {"_data": "a1"}
+        assert body_name(restarted.get(str(object_id))) == "Mouse"
+        assert loads(restarted.get("sku-1"))["data"]["product"]["_id"] == str(object_id)
+        assert body_name(restarted.get("2")) == "Keyboard"
+        assert restarted.get("3") is None
+        assert restarted.stats()["products"] == 2
+
+    @pytest.mark.asyncio
+    async def test_changes_override_the_file(self, tmp_path):
+        """Test that changes received after the file was written are applied on top of it"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [
+            product("1", "Mouse", id="sku-1"),
+            product("2", "Keyboard"),
+            product("3", "Monitor")
+        ])
+        await snapshot.build()
+
+        await snapshot.apply([
+            {"operationType": "update", "documentKey": {"_id": "1"},
+             "fullDocument": product("1", "Wireless mouse", id="sku-9")},
+            {"operationType": "update", "documentKey": {"_id": "2"}},
+            {"operationType": "delete", "documentKey": {"_id": "3"}},
+            {"operationType": "insert", "documentKey": {"_id": "4"}, "fullDocument": product("4", "Webcam")}
+        ])
+
+        assert body_name(snapshot.get("1")) == "Wireless mouse"
+        assert body_name(snapshot.get("sku-9")) == "Wireless mouse"
+        # Old alias of a changed product and a change without its document are not served
+        assert snapshot.get("sku-1") is None
+        assert snapshot.get("2") is None
+        assert snapshot.get("3") is None
+        assert body_name(snapshot.get("4")) == "Webcam"
+
+    @pytest.mark.asyncio
+    async def test_save_compacts_changes(self, tmp_path):
+        """Test that saving writes the changes and the stream position to the file"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [
+            product("1", "Mouse"),
+            product("2", "Keyboard")
+        ], token={"_data": "a1"})
+        await snapshot.build()
+        await snapshot.apply([
+            {"operationType": "update", "documentKey": {"_id": "1"}, "fullDocument": product("1", "Mouse v2")},
+            {"operationType": "delete", "documentKey": {"_id": "2"}}
+        ])
+        snapshot.source.pipeline.committed_token = {"_data": "b2"}
+
+        await snapshot.save()
+
+        assert snapshot.changed == {}
+        restarted = build_snapshot(tmp_path / "catalogue.snapshot")
+        restarted.load()
+        assert restarted.resume_token == {"_data": "b2"}
+        assert body_name(restarted.get("1")) == "Mouse v2"
+        assert restarted.get("2") is None
+        assert restarted.stats()["products"] == 1
+
+    @pytest.mark.asyncio
+    async def test_run_builds_once_then_saves(self, tmp_path):
+        """Test that the leader task scans the collection only when there is no snapshot"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")])
+
+        task = asyncio.create_task(snapshot.run())
+        await asyncio.sleep(0.05)
+        await snapshot.apply([
+            {"operationType": "update", "documentKey": {"_id": "1"}, "fullDocument": product("1", "Mouse v2")}
+        ])
+        await asyncio.sleep(0.05)
+        snapshot.stop()
+        await asyncio.wait_for(task, timeout=1)
+
+        assert snapshot.repository.scans == 1
+        assert snapshot.saves_total >= 2
+        assert snapshot.changed == {}
+        assert body_name(snapshot.get("1")) == "Mouse v2"
+
+    @pytest.mark.asyncio
+    async def test_reset_events_discard_the_snapshot(self, tmp_path):
+        """Test that a dropped collection stops the snapshot from answering"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")])
+        await snapshot.build()
+
+        await snapshot.apply([{"operationType": "drop"}])
+
+        assert snapshot.get("1") is None
+        assert snapshot.stats()["loaded"] is False
+
+    @pytest.mark.asyncio
+    async def test_discard_during_save_keeps_the_map_open(self, tmp_path):
+        """Test that a reset arriving while the file is rewritten does not close the map being read"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse"), product("2", "Keyboard")])
+        await snapshot.build()
+        await snapshot.apply([
+            {"operationType": "update", "documentKey": {"_id": "1"}, "fullDocument": product("1", "Mouse v2")}
+        ])
+        started, resume = threading.Event(), threading.Event()
+        rewrite = snapshot._rewrite
+
+        def paused_rewrite(current, changed, token):
+            started.set()
+            resume.wait(1)
+            rewrite(current, changed, token)
+
+        snapshot._rewrite = paused_rewrite
+        saves = snapshot.saves_total
+        task = asyncio.create_task(snapshot.save())
+        await asyncio.to_thread(started.wait, 1)
+        await snapshot.apply([{"operationType": "drop"}])
+        resume.set()
+        await task
+
+        assert snapshot.stats()["loaded"] is False
+        assert snapshot.saves_total == saves
+
+    @pytest.mark.asyncio
+    async def test_follower_reloads_the_rewritten_file(self, tmp_path):
+        """Test that a worker not writing the file maps it again and forgets the changes it holds"""
+        path = tmp_path / "catalogue.snapshot"
+        leader = build_snapshot(path, [product("1", "Mouse"), product("2", "Keyboard")])
+        await leader.build()
+        follower = build_snapshot(path)
+        follower.load()
+        changes = [{"operationType": "update", "documentKey": {"_id": "1"}, "fullDocument": product("1", "Mouse v2")}]
+        await follower.apply(changes)
+        await follower.apply([{"operationType": "update", "documentKey": {"_id": "2"},
+                               "fullDocument": product("2", "Keyboard v2")}])
+
+        assert follower.reload() is False
+        await leader.apply(changes)
+        await leader.save()
+
+        assert follower.reload() is True
+        # The change the leader has not written yet stays in memory
+        assert list(follower.changed) == ["2"]
+        assert body_name(follower.get("1")) == "Mouse v2"
+        assert body_name(follower.get("2")) == "Keyboard v2"
+        assert follower.stats()["reloads_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_follower_stops_using_a_file_not_rewritten(self, tmp_path):
+        """Test that a worker whose file is never rewritten drops it after max_changes"""
+        path = tmp_path / "catalogue.snapshot"
+        await build_snapshot(path, [product("1", "Mouse"), product("2", "Keyboard")]).build()
+        follower = build_snapshot(path, max_changes=1)
+        follower.load()
+
+        await follower.apply([
+            {"operationType": "update", "documentKey": {"_id": "1"}, "fullDocument": product("1", "Mouse v2")},
+            {"operationType": "update", "documentKey": {"_id": "2"}, "fullDocument": product("2", "Keyboard v2")}
+        ])
+        await follower.apply([{"operationType": "delete", "documentKey": {"_id": "1"}}])
+
+        assert follower.changed == {}
+        assert follower.get("2") is None
+        assert follower.stats()["loaded"] is False
+
+    def test_load_without_file(self, tmp_path):
+        """Test that a missing snapshot leaves the process cold"""
+        snapshot = build_snapshot(tmp_path / "missing.snapshot")
+
+        assert snapshot.load() is False
+        assert snapshot.get("1") is None
+
+
+class FakeStream:
+    """Change stream failing right away"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, streams, service):
+        self.streams = streams
+        self.service = service
+        self.watch_calls = []
+
+    def watch(self, **options):
+        self.watch_calls.append(options)
+        if not self.streams:
+            self.service.stop()
+            return FakeStream()
+        return self.streams.pop(0)
+
+
+class FakeTokens(ProductsRepository):
+    def __init__(self, token=None):
+        super().__init__(client_manager=None)
+        self.token = token
+        self.collection = None
+
+    def get_collection(self):
+        return self.collection
+
+    async def load_resume_token(self, watcher_name):
+        return self.token
+
+    async def save_resume_token(self, watcher_name, token):
+        self.token = token
+
+
+class TestSnapshotWarmStart:
+    """Test cases for the watcher and the read path with a snapshot"""
+
+    @pytest.mark.asyncio
+    async def test_watcher_resumes_from_snapshot_token(self, tmp_path):
+        """Test that the stream resumes where the snapshot was written, with full documents"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")], token={"_data": "a1"})
+        await snapshot.build()
+        repository = FakeTokens(token={"_data": "a0"})
+        service = ProductsEventServices(cache=ProductCache(10, 60, True), repository=repository,
+                                        settings=STREAM_SETTINGS, pipeline=ChangeEventPipeline(PIPELINE_SETTINGS),
+                                        snapshot=snapshot)
+        repository.collection = FakeCollection([], service)
+
+        await asyncio.wait_for(service.watch_changes(), timeout=2)
+        await service.pipeline.stop()
+
+        assert repository.collection.watch_calls[0] == {"resume_after": {"_data": "a1"}, "full_document": "updateLookup"}
+
+    @pytest.mark.asyncio
+    async def test_newer_stored_token_wins_over_snapshot(self, tmp_path):
+        """Test that a snapshot older than the stored position is discarded instead of replayed"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")], token={"_data": "a1"})
+        await snapshot.build()
+        repository = FakeTokens(token={"_data": "ff"})
+        service = ProductsEventServices(cache=ProductCache(10, 60, True), repository=repository,
+                                        settings=STREAM_SETTINGS, pipeline=ChangeEventPipeline(PIPELINE_SETTINGS),
+                                        snapshot=snapshot)
+        repository.collection = FakeCollection([], service)
+
+        await asyncio.wait_for(service.watch_changes(), timeout=2)
+        await service.pipeline.stop()
+
+        assert repository.collection.watch_calls[0] == {"resume_after": {"_data": "ff"}, "full_document": "updateLookup"}
+        assert snapshot.get("1") is None
+
+    @pytest.mark.asyncio
+    async def test_rejected_snapshot_token_falls_back_to_stored(self, tmp_path):
+        """Test that a rejected snapshot position resumes from the stored token and keeps the cache"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")], token={"_data": "a1"})
+        await snapshot.build()
+        cache = ProductCache(10, 60, True)
+        cache.set("2", "cached")
+        repository = FakeTokens(token={"_data": "a0"})
+        service = ProductsEventServices(cache=cache, repository=repository,
+                                        settings=STREAM_SETTINGS, pipeline=ChangeEventPipeline(PIPELINE_SETTINGS),
+                                        snapshot=snapshot)
+        repository.collection = FakeCollection([FakeStream(OperationFailure("invalid token", code=260))], service)
+
+        await asyncio.wait_for(service.watch_changes(), timeout=2)
+        await service.pipeline.stop()
+
+        assert repository.collection.watch_calls[1] == {"resume_after": {"_data": "a0"}, "full_document": "updateLookup"}
+        assert cache.get("2") == "cached"
+        assert snapshot.get("1") is None
+
+    @pytest.mark.asyncio
+    async def test_lost_history_discards_snapshot(self, tmp_path):
+        """Test that an expired snapshot token drops the snapshot so the leader rebuilds it"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")], token={"_data": "a1"})
+        await snapshot.build()
+        repository = FakeTokens()
+        service = ProductsEventServices(cache=ProductCache(10, 60, True), repository=repository,
+                                        settings=STREAM_SETTINGS, pipeline=ChangeEventPipeline(PIPELINE_SETTINGS),
+                                        snapshot=snapshot)
+        repository.collection = FakeCollection([FakeStream(OperationFailure("history lost", code=286))], service)
+
+        await asyncio.wait_for(service.watch_changes(), timeout=2)
+        await service.pipeline.stop()
+
+        assert repository.collection.watch_calls[1] == {"full_document": "updateLookup"}
+        assert snapshot.get("1") is None
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_served_from_snapshot(self, tmp_path):
+        """Test that a cache miss is answered from the snapshot without calling ms-product"""
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse", price=10.5)])
+        await snapshot.build()
+        cache = ProductCache(10, 60, True)
+        controller = GetProducts(client=object(), cache=cache, snapshot=snapshot)
+
+        data = await controller.get_products(Product(product={"id": "1"}))
+
+        assert data == {"data": {"product": {"_id": "1", "name": "Mouse", "price": 10.5}}}
+        assert cache.get("1") is not None
+        assert snapshot.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_refill_before_snapshot_change_is_dropped(self, tmp_path):
+        """Test that a cache miss filled from the previous snapshot body between handlers does not stay cached"""
+        cache = ProductCache(10, 60, True)
+        snapshot = build_snapshot(tmp_path / "catalogue.snapshot", [product("1", "Mouse")])
+        snapshot.cache = cache
+        await snapshot.build()
+        controller = GetProducts(client=object(), cache=cache, snapshot=snapshot)
+        change = {"operationType": "update", "documentKey": {"_id": "1"},
+                  "fullDocument": product("1", "Mouse v2")}
+
+        # Cache invalidation ran first and a read refilled the entry before the snapshot handler
+        cache.apply_change(change)
+        assert body_name(controller.get_cached(Product(product={"id": "1"})).raw) == "Mouse"
+        await snapshot.apply([change])
+
+        assert body_name(controller.get_cached(Product(product={"id": "1"})).raw) == "Mouse v2"
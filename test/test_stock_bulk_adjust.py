@@ -0,0 +1,143 @@
+import sys
+import os
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+from src.controllers.stock_controllers import StockLedger
+from src.repository.products_repository import ProductsRepository
+from src.utils.container import get_stock_controller
+from src.utils.settings import config
+from src.utils.streaming import StreamFormatError, iter_json_array, iter_ndjson
+
+
+SETTINGS = {**config["inventory"], "adjust_chunk_size": 2, "adjust_max_errors": 2}
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def stream(rows):
+    for row in rows:
+        yield row
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+class FakeRepository(ProductsRepository):
+    """Records each bulk write and rejects removals below zero"""
+
+    def __init__(self, stock=None):
+        super().__init__(client_manager=None)
+        self.stock = dict(stock or {})
+        self.chunks = []
+
+    async def bulk_adjust_stock(self, operations):
+        self.chunks.append(len(operations))
+        errors = []
+        for index, operation in enumerate(operations):
+            sku = operation._filter["_id"]
+            update = operation._doc
+            if "$inc" in update:
+                value = self.stock.get(sku, 0) + update["$inc"]["available"]
+                if value < 0:
+                    errors.append((index, 121, "Document failed validation"))
+                    continue
+                self.stock[sku] = value
+            else:
+                self.stock[sku] = update["$set"]["available"]
+        return errors
+
+
+class TestStreaming:
+    """Test cases for the streamed body parsers"""
+
+    @pytest.mark.asyncio
+    async def test_ndjson_rows_split_across_chunks(self):
+        """Test that NDJSON lines are rebuilt whatever the chunk boundaries"""
+        body = b'{"sku": "a", "delta": 1}\n\n{"sku": "b", "delta": 2}\n{"sku": "c", "delta": 3}'
+
+        rows = await collect(iter_ndjson(chunked(body, 7), 1024))
+
+        assert [json.loads(row)["sku"] for row in rows] == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_json_array_items_split_across_chunks(self):
+        """Test that array items are decoded incrementally, including split utf-8"""
+        items = [{"sku": "ñandú", "delta": 1}, {"sku": "b", "available": 4}]
+        body = json.dumps(items, ensure_ascii=False).encode("utf-8")
+
+        rows = await collect(iter_json_array(chunked(body, 3), 1024))
+
+        assert rows == items
+
+    @pytest.mark.asyncio
+    async def test_oversized_and_broken_bodies(self):
+        """Test that rows over the limit and unterminated arrays are rejected"""
+        with pytest.raises(StreamFormatError):
+            await collect(iter_ndjson(chunked(b"x" * 100, 10), 50))
+        with pytest.raises(StreamFormatError):
+            await collect(iter_json_array(chunked(b'[{"sku": "a"}', 4), 1024))
+        with pytest.raises(StreamFormatError):
+            await collect(iter_json_array(chunked(b'{"sku": "a"}', 4), 1024))
+
+
+class TestBulkAdjust:
+    """Test cases for bulk stock adjustments"""
+
+    @pytest.mark.asyncio
+    async def test_rows_are_applied_in_chunks(self):
+        """Test that valid rows are written in chunks and invalid ones reported"""
+        repository = FakeRepository({"a": 5})
+        rows = [
+            b'{"sku": "a", "delta": -2}',
+            b'{"sku": "b", "available": 10}',
+            b'{"sku": "a"}',
+            b'not json',
+            b'{"sku": "a", "delta": -9}',
+        ]
+
+        report = await StockLedger(repository=repository, settings=SETTINGS).bulk_adjust(stream(rows))
+
+        assert repository.chunks == [2, 1]
+        assert repository.stock == {"a": 3, "b": 10}
+        assert report["received"] == 5
+        assert report["applied"] == 2
+        assert report["failed"] == 3
+        # Only adjust_max_errors errors are kept
+        assert [error["row"] for error in report["errors"]] == [2, 3]
+
+    def test_endpoint_accepts_ndjson_and_json(self):
+        """Test that the endpoint streams both body formats"""
+        repository = FakeRepository()
+        app.dependency_overrides[get_stock_controller] = lambda: StockLedger(repository=repository, settings=SETTINGS)
+        try:
+            client = TestClient(app)
+            ndjson = client.post(
+                "/api-inventory/stock/bulk-adjust/",
+                content=b'{"sku": "a", "delta": 3}\n{"sku": "b", "available": 1}\n',
+                headers={"content-type": "application/x-ndjson"}
+            )
+            array = client.post("/api-inventory/stock/bulk-adjust/", json=[{"sku": "a", "delta": -1}])
+            broken = client.post(
+                "/api-inventory/stock/bulk-adjust/",
+                content=b'[{"sku": "a", "delta": 1}',
+                headers={"content-type": "application/json"}
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert ndjson.status_code == 200
+        assert ndjson.json()["result"]["applied"] == 2
+        assert array.json()["result"]["applied"] == 1
+        assert broken.status_code == 422
+        # The row read before the body broke off is still applied
+        assert repository.stock == {"a": 3, "b": 1}
@@ -0,0 +1,173 @@
+import sys
+import os
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.controllers.stock_controllers import StockLedger
+from src.entities.products_entities import Reservation, StockLevel
+from src.repository.products_repository import ProductsRepository
+from src.services.reservation_reaper_services import ReservationReaper
+from src.utils.settings import config
+from test.conftest import FakeCollection
+
+
+class FakeRepository(ProductsRepository):
+    def __init__(self):
+        super().__init__(client_manager=None)
+        self.stock = FakeCollection()
+        self.reservations = FakeCollection()
+
+    def get_stock_collection(self):
+        return self.stock
+
+    def get_reservations_collection(self):
+        return self.reservations
+
+
+async def run_reaper_once(repository):
+    reaper = ReservationReaper(repository, {**config["inventory"], "reaper_interval": 0.001})
+    task = asyncio.create_task(reaper.run())
+    while reaper.runs == 0:
+        await asyncio.sleep(0.001)
+    reaper.stop()
+    await task
+    return reaper
+
+
+class TestStockLedger:
+    """Test cases for the stock ledger and its reservations"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reservations_never_oversell(self):
+        """Test that concurrent reservations of the same sku stop at the available stock"""
+        ledger = StockLedger(repository=FakeRepository())
+        await ledger.set_stock("sku", StockLevel(available=100))
+
+        results = await asyncio.gather(
+            *(ledger.reserve(Reservation(sku="sku", quantity=1)) for _ in range(1000)),
+            return_exceptions=True
+        )
+
+        reserved = [result for result in results if isinstance(result, dict)]
+        conflicts = [result for result in results if isinstance(result, HTTPException) and result.status_code == 409]
+        assert len(reserved) == 100
+        assert len(conflicts) == 900
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 0, "reserved": 100}
+
+    @pytest.mark.asyncio
+    async def test_commit_and_release(self):
+        """Test that commits consume reserved units and releases return them"""
+        ledger = StockLedger(repository=FakeRepository())
+        await ledger.set_stock("sku", StockLevel(available=10))
+        first = await ledger.reserve(Reservation(sku="sku", quantity=3))
+        second = await ledger.reserve(Reservation(sku="sku", quantity=2))
+
+        await ledger.commit(first["reservation_id"])
+        await ledger.release(second["reservation_id"])
+
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 7, "reserved": 0}
+        with pytest.raises(HTTPException) as exc_info:
+            await ledger.release(first["reservation_id"])
+        assert exc_info.value.status_code == 409
+
+    @pytest.mark.asyncio
+    async def test_unknown_sku_and_reservation(self):
+        """Test that unknown skus and reservations answer 404"""
+        ledger = StockLedger(repository=FakeRepository())
+
+        with pytest.raises(HTTPException) as exc_info:
+            await ledger.reserve(Reservation(sku="missing", quantity=1))
+        assert exc_info.value.status_code == 404
+        with pytest.raises(HTTPException) as exc_info:
+            await ledger.commit("not-an-id")
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_reaper_returns_expired_reservations(self):
+        """Test that expired reservations give their units back and cannot be committed"""
+        repository = FakeRepository()
+        ledger = StockLedger(repository=repository)
+        await ledger.set_stock("sku", StockLevel(available=5))
+        reservation = await ledger.reserve(Reservation(sku="sku", quantity=4))
+        for document in repository.reservations.documents.values():
+            document["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await ledger.commit(reservation["reservation_id"])
+        assert exc_info.value.status_code == 409
+
+        reaper = await run_reaper_once(repository)
+
+        assert reaper.expired_total == 1
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 5, "reserved": 0}
+        assert "purge_at" in next(iter(repository.reservations.documents.values()))
+
+    @pytest.mark.asyncio
+    async def test_failed_reservation_leaves_stock_untouched(self):
+        """Test that the stock is not touched when the reservation can not be recorded"""
+        repository = FakeRepository()
+        ledger = StockLedger(repository=repository)
+        await ledger.set_stock("sku", StockLevel(available=5))
+
+        async def crash(document):
+            raise RuntimeError("connection lost")
+
+        repository.reservations.insert_one = crash
+        with pytest.raises(Exception):
+            await ledger.reserve(Reservation(sku="sku", quantity=2))
+
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 5, "reserved": 0}
+        assert repository.reservations.documents == {}
+
+    @pytest.mark.asyncio
+    async def test_reservation_without_stock_update_expires_harmlessly(self):
+        """Test that a reservation recorded before a crash of the stock update expires without changing the stock"""
+        repository = FakeRepository()
+        ledger = StockLedger(repository=repository)
+        await ledger.set_stock("sku", StockLevel(available=5))
+
+        async def crash(query, update, **kwargs):
+            raise RuntimeError("connection lost")
+
+        repository.stock.find_one_and_update = crash
+        with pytest.raises(Exception):
+            await ledger.reserve(Reservation(sku="sku", quantity=2))
+        del repository.stock.find_one_and_update
+        for document in repository.reservations.documents.values():
+            document["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        reaper = await run_reaper_once(repository)
+
+        assert reaper.expired_total == 1
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 5, "reserved": 0}
+
+    @pytest.mark.asyncio
+    async def test_reaper_settles_an_interrupted_finish(self):
+        """Test that a reservation claimed before a crash of the stock update is settled once by the reaper"""
+        repository = FakeRepository()
+        ledger = StockLedger(repository=repository)
+        await ledger.set_stock("sku", StockLevel(available=5))
+        reservation = await ledger.reserve(Reservation(sku="sku", quantity=2))
+
+        async def crash(reservation):
+            raise RuntimeError("connection lost")
+
+        repository.settle_reservation = crash
+        with pytest.raises(HTTPException):
+            await ledger.release(reservation["reservation_id"])
+        del repository.settle_reservation
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 3, "reserved": 2}
+        for document in repository.reservations.documents.values():
+            document["finished_at"] -= timedelta(seconds=1)
+
+        reaper = await run_reaper_once(repository)
+        await repository.settle_reservations(10, 0)
+
+        assert reaper.settled_total == 1
+        assert await ledger.get_stock("sku") == {"sku": "sku", "available": 5, "reserved": 0}
+        assert next(iter(repository.reservations.documents.values()))["settled"] is True
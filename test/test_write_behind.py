@@ -0,0 +1,268 @@
+import sys
+import os
+import json
+import asyncio
+import pytest
+import httpx
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from src.main import app
+from src.controllers.update_products_controllers import UpdateProducts
+from src.repository.products_repository import ProductsRepository
+from src.services.write_behind_services import WriteBehindFlusher
+from src.utils.container import get_update_products_controller
+from src.utils.http_client import UpstreamClient
+
+
+SETTINGS = {"enabled": True, "coalesce": "merge", "window": 0.0, "batch_size": 10, "max_concurrency": 2,
+            "flush_interval": 0.01, "retry_delay": 60.0, "claim_timeout": 30.0}
+
+
+class InMemoryPendingWrites(ProductsRepository):
+    """Pending writes collection kept in a dict"""
+
+    def __init__(self):
+        super().__init__(client_manager=None)
+        self.pending = {}
+
+    async def enqueue_write(self, product_id, fields, window_seconds, merge=True):
+        now = datetime.now(timezone.utc)
+        pending = self.pending.get(product_id)
+        if pending is None:
+            pending = self.pending[product_id] = {
+                "_id": product_id, "fields": {}, "version": 0, "updates": 0, "enqueued_at": now,
+                "not_before": now + timedelta(seconds=window_seconds)}
+        pending["fields"] = {**pending["fields"], **fields} if merge else dict(fields)
+        pending["version"] += 1
+        pending["updates"] += 1
+        return dict(pending)
+
+    async def find_pending_write(self, product_id):
+        pending = self.pending.get(product_id)
+        return dict(pending) if pending else None
+
+    @staticmethod
+    def _unclaimed(pending, now):
+        return pending.get("claimed_until") is None or pending["claimed_until"] <= now
+
+    async def due_pending_writes(self, limit):
+        now = datetime.now(timezone.utc)
+        due = sorted((p for p in self.pending.values() if p["not_before"] <= now and self._unclaimed(p, now)),
+                     key=lambda p: p["not_before"])
+        return [dict(pending) for pending in due[:limit]]
+
+    async def claim_pending_write(self, product_id, claim_seconds):
+        now = datetime.now(timezone.utc)
+        pending = self.pending.get(product_id)
+        if pending is None or not self._unclaimed(pending, now):
+            return None
+        pending["claimed_until"] = now + timedelta(seconds=claim_seconds)
+        return dict(pending)
+
+    async def complete_pending_write(self, product_id, version):
+        pending = self.pending.get(product_id)
+        if pending is not None and pending["version"] == version:
+            del self.pending[product_id]
+            return True
+        await self.release_pending_write(product_id)
+        return False
+
+    async def release_pending_write(self, product_id):
+        if product_id in self.pending:
+            self.pending[product_id].pop("claimed_until", None)
+
+    async def retry_pending_write(self, product_id, error, delay_seconds):
+        pending = self.pending[product_id]
+        pending["not_before"] = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+        pending["last_error"] = error
+        pending["attempts"] = pending.get("attempts", 0) + 1
+        pending.pop("claimed_until", None)
+
+    async def count_pending_writes(self):
+        return len(self.pending)
+
+
+def updates(upstream_settings, handler, **settings):
+    client = UpstreamClient(settings={**upstream_settings, "max_retries": 0}, transport=httpx.MockTransport(handler))
+    return UpdateProducts(client=client, repository=InMemoryPendingWrites(), settings={**SETTINGS, **settings})
+
+
+class TestWriteBehind:
+    """Test cases for the write-behind product updates"""
+
+    @pytest.mark.asyncio
+    async def test_updates_of_a_product_are_coalesced(self, upstream_settings):
+        """Test that successive updates merge into one pending write"""
+        controller = updates(upstream_settings, lambda request: httpx.Response(200, json={}))
+
+        await controller.enqueue_update({"product": {"id": "1", "price": 10}})
+        await controller.enqueue_update({"product": {"id": "1", "stock": 3}})
+        result = await controller.enqueue_update({"product": {"id": "1", "price": 12}})
+
+        assert result == {"status": "queued", "id": "1", "version": 3}
+        assert controller.repository.pending["1"]["fields"] == {"id": "1", "price": 12, "stock": 3}
+        assert controller.queued_total == 3
+        assert controller.coalesced_total == 2
+
+    @pytest.mark.asyncio
+    async def test_replace_keeps_the_last_write(self, upstream_settings):
+        """Test that the replace mode only keeps the fields of the last update"""
+        controller = updates(upstream_settings, lambda request: httpx.Response(200, json={}), coalesce="replace")
+
+        await controller.enqueue_update({"product": {"id": "1", "price": 10}})
+        await controller.enqueue_update({"product": {"id": "1", "stock": 3}})
+
+        assert controller.repository.pending["1"]["fields"] == {"id": "1", "stock": 3}
+
+    @pytest.mark.asyncio
+    async def test_flusher_sends_one_call_per_product(self, upstream_settings):
+        """Test that the flusher sends every coalesced write once and removes it"""
+        sent = []
+
+        def handler(request):
+            sent.append(json.loads(request.content))
+            return httpx.Response(200, json={})
+
+        controller = updates(upstream_settings, handler)
+        for price in (10, 11, 12):
+            await controller.enqueue_update({"product": {"id": "1", "price": price}})
+        await controller.enqueue_update({"product": {"id": "2", "price": 5}})
+        flusher = WriteBehindFlusher(controller, controller.repository, SETTINGS)
+
+        task = asyncio.create_task(flusher.run())
+        await asyncio.sleep(0.05)
+        flusher.stop()
+        await task
+
+        assert sorted(sent, key=lambda body: body["product"]["id"]) == [
+            {"product": {"id": "1", "price": 12}}, {"product": {"id": "2", "price": 5}}]
+        assert controller.repository.pending == {}
+        assert flusher.flushed_total == 2
+        assert flusher.queue_depth == 0
+        assert flusher.latency.count >= 2
+
+    @pytest.mark.asyncio
+    async def test_update_during_flush_stays_queued(self, upstream_settings):
+        """Test that a write updated while being flushed is not removed"""
+        async def handler(request):
+            # Updated again while the flush is on its way to ms-product
+            await controller.enqueue_update({"product": {"id": "1", "price": 11}})
+            return httpx.Response(200, json={})
+
+        controller = updates(upstream_settings, handler)
+        await controller.enqueue_update({"product": {"id": "1", "price": 10}})
+        flusher = WriteBehindFlusher(controller, controller.repository, SETTINGS)
+        pending = (await controller.repository.due_pending_writes(10))[0]
+
+        await flusher.flush(pending, asyncio.Semaphore(1))
+
+        assert controller.repository.pending["1"]["fields"]["price"] == 11
+        assert await controller.repository.due_pending_writes(10) != []
+
+    @pytest.mark.asyncio
+    async def test_sync_update_waits_for_flush_in_flight(self, upstream_settings):
+        """Test that a flush already sent can not reach ms-product after a synchronous update"""
+        sent = []
+        flush_started = asyncio.Event()
+        release_flush = asyncio.Event()
+
+        async def handler(request):
+            body = json.loads(request.content)
+            if not sent:
+                sent.append(body)
+                flush_started.set()
+                await release_flush.wait()
+            else:
+                sent.append(body)
+            return httpx.Response(200, json={"data": "ok"})
+
+        controller = updates(upstream_settings, handler)
+        await controller.enqueue_update({"product": {"id": "1", "price": 10}})
+        flusher = WriteBehindFlusher(controller, controller.repository, SETTINGS)
+        pending = (await controller.repository.due_pending_writes(10))[0]
+        flush = asyncio.create_task(flusher.flush(pending, asyncio.Semaphore(1)))
+        await flush_started.wait()
+
+        sync = asyncio.create_task(controller.update_product({"product": {"id": "1", "price": 12}}))
+        await asyncio.sleep(0.05)
+        assert len(sent) == 1
+        release_flush.set()
+        await flush
+        await sync
+
+        assert sent == [{"product": {"id": "1", "price": 10}}, {"product": {"id": "1", "price": 12}}]
+        assert controller.repository.pending == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_flushes(self, upstream_settings):
+        """Test that 5xx answers are retried later and 4xx answers are dropped"""
+        def handler(request):
+            product_id = json.loads(request.content)["product"]["id"]
+            return httpx.Response(503 if product_id == "1" else 400, json={})
+
+        controller = updates(upstream_settings, handler)
+        await controller.enqueue_update({"product": {"id": "1", "price": 10}})
+        await controller.enqueue_update({"product": {"id": "2", "price": 10}})
+        flusher = WriteBehindFlusher(controller, controller.repository, SETTINGS)
+
+        for pending in await controller.repository.due_pending_writes(10):
+            await flusher.flush(pending, asyncio.Semaphore(1))
+
+        assert list(controller.repository.pending) == ["1"]
+        assert controller.repository.pending["1"]["attempts"] == 1
+        assert await controller.repository.due_pending_writes(10) == []
+        assert flusher.failed_total == 1
+        assert flusher.rejected_total == 1
+
+    @pytest.mark.asyncio
+    async def test_sync_update_includes_queued_fields(self, upstream_settings):
+        """Test that a synchronous update sends the queued fields and clears them"""
+        sent = []
+
+        def handler(request):
+            sent.append(json.loads(request.content))
+            return httpx.Response(200, json={"data": "ok"})
+
+        controller = updates(upstream_settings, handler)
+        await controller.enqueue_update({"product": {"id": "1", "stock": 3, "price": 10}})
+
+        result = await controller.update_product({"product": {"id": "1", "price": 12}})
+
+        assert result == {"data": "ok"}
+        assert sent == [{"product": {"id": "1", "stock": 3, "price": 12}}]
+        assert controller.repository.pending == {}
+
+    def test_route_queues_unless_sync(self, upstream_settings):
+        """Test that the route answers 202 when queueing and 200 for a sync call"""
+        controller = updates(upstream_settings, lambda request: httpx.Response(200, json={"data": "ok"}))
+        app.dependency_overrides[get_update_products_controller] = lambda: controller
+        try:
+            client = TestClient(app)
+            queued = client.post("/api-inventory/update-product/", json={"product": {"id": "1", "price": 10}})
+            synced = client.post("/api-inventory/update-product/?sync=true", json={"product": {"id": "1", "price": 11}})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert queued.status_code == 202
+        assert queued.json() == {"result": {"status": "queued", "id": "1", "version": 1}}
+        assert synced.status_code == 200
+        assert synced.json() == {"result": {"data": "ok"}}
+        assert controller.repository.pending == {}
+
+    def test_route_sends_right_away_when_disabled(self, upstream_settings):
+        """Test that sync=false does not queue updates nobody would flush"""
+        controller = updates(upstream_settings, lambda request: httpx.Response(200, json={"data": "ok"}), enabled=False)
+        app.dependency_overrides[get_update_products_controller] = lambda: controller
+        try:
+            client = TestClient(app)
+            response = client.post("/api-inventory/update-product/?sync=false", json={"product": {"id": "1", "price": 10}})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.json() == {"result": {"data": "ok"}}
+        assert controller.repository.pending == {}